@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .routes import ask, auth, docs, health, upload
+from .routes import ask, auth, chat, docs, health, upload
 
 api_router = APIRouter()
 
@@ -9,3 +9,4 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(upload.router, prefix="/upload", tags=["documents"])
 api_router.include_router(docs.router, prefix="/docs", tags=["documents"])
 api_router.include_router(ask.router, prefix="/ask", tags=["chat"])
+api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from ...core.config import get_settings
-from ...schemas import AskRequest, AskResponse, TitleRequest, TitleResponse
-from ...services.llm import build_llm_service
+from ...schemas import AskRequest, AskResponse, BatchAskRequest, TitleRequest, TitleResponse
+from ...services.chat_history import ChatSessionNotFound
 from ...services.rag import build_rag_service
 from .auth import get_current_user_id
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 rag_service = build_rag_service()
-llm_service = build_llm_service(get_settings())
+# Shared with the RAG service so title and answer generations coalesce in one place.
+llm_service = rag_service.llm_service
 
 
 @router.post("/", response_model=AskResponse, summary="Ask a question against uploaded docs.")
@@ -18,10 +25,90 @@ async def ask_question(payload: AskRequest, user_id: str = Depends(get_current_u
     if not payload.question.strip():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Question cannot be empty.")
 
-    return await rag_service.answer_question(payload.question, user_id)
+    try:
+        return await rag_service.answer_question(
+            payload.question, user_id, top_k=payload.top_k, chat_session_id=payload.chat_session_id
+        )
+    except ChatSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found.")
+
+
+@router.post("/stream", summary="Ask a question and stream the answer as server-sent events.")
+async def ask_question_stream(
+    payload: AskRequest, request: Request, user_id: str = Depends(get_current_user_id)
+) -> StreamingResponse:
+    """Emits a ``sources`` event, then ``token`` events with answer fragments, then ``done``.
+
+    A failure after the stream has started is reported as an ``error`` event. When the client
+    disconnects, the generation is abandoned and the upstream model call closed.
+    """
+    if not payload.question.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Question cannot be empty.")
+    # Checked up front so a foreign session is a 404 rather than an error event.
+    if payload.chat_session_id and not await run_in_threadpool(
+        rag_service.chat_history.is_accessible, user_id, payload.chat_session_id
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found.")
+
+    async def events():
+        stream = rag_service.stream_answer(
+            payload.question, user_id, top_k=payload.top_k, chat_session_id=payload.chat_session_id
+        )
+        try:
+            async for event, data in stream:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; stopping answer stream for user %s", user_id)
+                    break
+                yield _sse(event, data)
+        except Exception as exc:
+            logger.exception("Answer stream failed for user %s", user_id)
+            yield _sse("error", {"detail": str(exc) or exc.__class__.__name__})
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies such as nginx from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch", summary="Answer many questions; results stream back as NDJSON as they complete.")
+async def ask_batch(
+    payload: BatchAskRequest, request: Request, user_id: str = Depends(get_current_user_id)
+) -> StreamingResponse:
+    """Each line is a ``BatchAskResult``; ``index`` maps it back to the question, since lines arrive out of order."""
+    limit = get_settings().batch_ask_max_questions
+    if len(payload.questions) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"A batch may contain at most {limit} questions."
+        )
+    if any(not question.strip() for question in payload.questions):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Questions cannot be empty.")
+
+    async def lines():
+        results = rag_service.answer_batch(payload.questions, user_id, top_k=payload.top_k)
+        try:
+            async for result in results:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; cancelling batch for user %s", user_id)
+                    break
+                yield result.model_dump_json() + "\n"
+        except Exception as exc:
+            logger.exception("Batch ask failed for user %s", user_id)
+            yield json.dumps({"error": str(exc) or exc.__class__.__name__}) + "\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.post("/title", response_model=TitleResponse, summary="Generate a chat title.")
 async def generate_title(payload: TitleRequest) -> TitleResponse:
-    title = await run_in_threadpool(llm_service.generate_title, payload.context)
+    title = await llm_service.agenerate_title(payload.context)
     return TitleResponse(title=title or "Chat session")
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from ...db.deps import get_db
+from ...schemas import ChatSessionDetail, ChatSessionListResponse, ChatSessionSummary
+from ...services.rag import build_rag_service
+from .auth import get_current_user_id
+
+router = APIRouter()
+
+chat_history = build_rag_service().chat_history
+
+
+@router.get("/sessions", response_model=ChatSessionListResponse, summary="List chat sessions, most recent first.")
+async def list_sessions(
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user_id),
+) -> ChatSessionListResponse:
+    sessions = chat_history.list_sessions(db, user_id)
+    return ChatSessionListResponse(sessions=[ChatSessionSummary.model_validate(session) for session in sessions])
+
+
+@router.get("/sessions/{session_id}", response_model=ChatSessionDetail, summary="A chat session with its messages.")
+async def get_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user_id),
+) -> ChatSessionDetail:
+    session = chat_history.get_session(db, user_id, session_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found.")
+    return ChatSessionDetail.model_validate(session)
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a chat session.")
+async def delete_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user_id),
+) -> None:
+    if not chat_history.delete_session(db, user_id, session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found.")
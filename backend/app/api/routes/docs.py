@@ -3,12 +3,14 @@ from sqlalchemy.orm import Session
 
 from ...db.deps import get_db
 from ...schemas import DocumentListResponse, DocumentSummary
+from ...services.ingestion_queue import build_ingestion_queue
 from ...services.rag import build_rag_service
 from .auth import get_current_user_id
 
 router = APIRouter()
 
 rag_service = build_rag_service()
+ingestion_queue = build_ingestion_queue()
 
 
 @router.get("/", response_model=DocumentListResponse, summary="List uploaded documents.")
@@ -30,3 +32,17 @@ async def delete_document(
     deleted = rag_service.delete_document(db, document_id, user_id)
     if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found.")
+
+
+@router.post("/{document_id}/retry", response_model=DocumentSummary, summary="Retry ingestion of a document.")
+async def retry_document(
+    document_id: str,
+    db: Session = Depends(get_db),
+    user_id: str = Depends(get_current_user_id),
+) -> DocumentSummary:
+    document = rag_service.retry_document(db, document_id, user_id)
+    if not document:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found.")
+
+    ingestion_queue.notify()
+    return DocumentSummary.model_validate(document)
@@ -2,6 +2,8 @@ from datetime import datetime
 
 from fastapi import APIRouter
 
+from ...services.rag import build_rag_service
+
 router = APIRouter()
 
 
@@ -11,3 +13,17 @@ async def health_check() -> dict[str, str]:
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
+
+
+@router.get("/metrics", summary="Cache and pipeline counters")
+async def metrics() -> dict[str, dict]:
+    rag_service = build_rag_service()
+    return {
+        "embeddings": rag_service.embedding_service.stats(),
+        "answers": rag_service.answer_cache.stats() if rag_service.answer_cache else {"enabled": False},
+        "retrieval": rag_service.retriever.stats(),
+        "single_flight": {
+            flights.name: flights.stats()
+            for flights in (rag_service.flights, rag_service.retriever.flights, rag_service.llm_service.flights)
+        },
+    }
@@ -1,11 +1,10 @@
 import logging
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
 
-from ...db.deps import get_db
 from ...schemas import UploadResponse
 from ...api.routes.auth import get_current_user_id
+from ...services.ingestion_queue import build_ingestion_queue
 from ...services.rag import build_rag_service
 from ...services.text_processing import TextExtractionError
 
@@ -13,22 +12,22 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 rag_service = build_rag_service()
+ingestion_queue = build_ingestion_queue()
 
 
 @router.post(
     "/",
     response_model=UploadResponse,
-    status_code=status.HTTP_201_CREATED,
-    summary="Upload and ingest multiple documents.",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Upload multiple documents and queue them for ingestion.",
 )
 async def upload_documents(
     files: list[UploadFile] = File(..., description="List of .txt or .pdf files."),
-    db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user_id),
 ) -> UploadResponse:
     logger.info("Uploading %d file(s) for user %s: %s", len(files), user_id, [f.filename for f in files])
     try:
-        return await rag_service.ingest_uploads(files, db, user_id)
+        response = await rag_service.ingest_uploads(files, user_id)
     except (TextExtractionError, ValueError) as exc:
         print(exc)
         logger.warning("Upload rejected for user %s: %s", user_id, exc)
@@ -37,3 +36,6 @@ async def upload_documents(
         print(exc)
         logger.exception("Unexpected failure during upload for user %s", user_id)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
+
+    ingestion_queue.notify()
+    return response
@@ -0,0 +1 @@
+"""Command-line entrypoints run with ``python -m app.cli.<name>``."""
@@ -0,0 +1,92 @@
+"""Measure recall@k and latency of quantized vector search against exact float32 search.
+
+Run with ``python -m app.cli.benchmark_quantization``. By default the vectors are a synthetic
+clustered set. Pass ``--embeddings vectors.npy`` to use real embeddings instead, e.g. ones
+exported from a production index. Each codec gets its own temporary ``NumpyVectorStore``. Queries are
+perturbed copies of stored vectors, and recall compares every codec's top k with the exact top k.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from ..models.document import Document
+from ..services.chunk_writer import ChunkRecord
+from ..services.numpy_vector_store import NumpyVectorStore
+
+USER_ID = "benchmark"
+INSERT_BATCH = 5000
+
+
+def synthetic_vectors(rows: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    return centres[assignment] + 0.6 * rng.standard_normal((rows, dimension)).astype(np.float32)
+
+
+def build_store(directory: str, vectors: np.ndarray, codec: str, rerank: int, subvectors: int) -> tuple[NumpyVectorStore, float]:
+    store = NumpyVectorStore(directory, quantization=codec, rerank_candidates=rerank, pq_subvectors=subvectors)
+    document = Document(id="benchmark", filename="benchmark")
+    started = time.perf_counter()
+    for start in range(0, len(vectors), INSERT_BATCH):
+        batch = vectors[start : start + INSERT_BATCH]
+        records = [ChunkRecord(document.id, start + offset, "", id=str(start + offset)) for offset in range(len(batch))]
+        store.add_document_chunks(document, records, batch, USER_ID)
+    return store, time.perf_counter() - started
+
+
+def run_queries(store: NumpyVectorStore, queries: np.ndarray, k: int) -> tuple[list[set[str]], float]:
+    store.query(USER_ID, queries[0].tolist(), k)  # load the snapshot outside the timing
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append({source.chunk_id for source in store.query(USER_ID, query.tolist(), k)})
+    return results, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.benchmark_quantization", description=__doc__.splitlines()[0])
+    parser.add_argument("--embeddings", help="A .npy file of shape (rows, dimension) to benchmark instead of synthetic data.")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic vectors to index.")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension.")
+    parser.add_argument("--clusters", type=int, default=200, help="Topics in the synthetic data.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10, help="Results per query (the k of recall@k).")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[50, 100, 200], help="Rerank candidate counts to try.")
+    parser.add_argument("--pq-subvectors", type=int, default=64)
+    parser.add_argument("--codecs", nargs="+", default=["int8", "pq"], choices=["int8", "pq"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.rows, args.dimension, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picked = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = picked + 0.3 * np.std(vectors) * rng.standard_normal(picked.shape).astype(np.float32)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}")
+
+    print(f"{'codec':<6} {'rerank':>6} {'bytes/vec':>9} {f'recall@{args.k}':>9} {'ms/query':>9} {'build s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        store, build_seconds = build_store(f"{directory}/none", vectors, "none", 0, args.pq_subvectors)
+        exact, latency = run_queries(store, queries, args.k)
+        print(f"{'none':<6} {'-':>6} {vectors.shape[1] * 4:>9} {1.0:>9.3f} {latency:>9.2f} {build_seconds:>8.1f}")
+
+        for codec in args.codecs:
+            store, build_seconds = build_store(f"{directory}/{codec}", vectors, codec, 0, args.pq_subvectors)
+            snapshot = store._load(USER_ID)
+            code_size = snapshot.quantizer.code_size if snapshot.codes is not None else vectors.shape[1] * 4
+            for rerank in args.rerank:
+                store.rerank_candidates = rerank
+                found, latency = run_queries(store, queries, args.k)
+                recall = np.mean([len(hit & truth) / max(1, len(truth)) for hit, truth in zip(found, exact)])
+                print(f"{codec:<6} {rerank:>6} {code_size:>9} {recall:>9.3f} {latency:>9.2f} {build_seconds:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,45 @@
+"""Build the BM25 lexical index from chunks already stored in the database.
+
+Run once with ``python -m app.cli.lexical_index`` after upgrading, so documents indexed before
+hybrid retrieval existed become searchable by keyword. Documents are replaced one at a time,
+so the command is safe to rerun.
+"""
+
+import argparse
+import logging
+
+from .. import models as _  # noqa: F401
+from ..core.config import get_settings
+from ..db.session import SessionLocal, init_db
+from ..models.document import Document, DocumentChunk, DocumentStatus
+from ..services.lexical_index import LexicalIndexService
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.lexical_index", description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", help="Only rebuild the index of this user.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("app.cli.lexical_index")
+    init_db()
+    lexical_index = LexicalIndexService(get_settings().lexical_index_dir)
+
+    with SessionLocal() as db:
+        query = db.query(Document).filter(Document.status == DocumentStatus.INDEXED.value)
+        if args.user_id:
+            query = query.filter(Document.user_id == args.user_id)
+        for document in query.order_by(Document.created_at):
+            chunks = (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == document.id)
+                .order_by(DocumentChunk.chunk_index)
+                .all()
+            )
+            lexical_index.replace_document_chunks(document, chunks, document.user_id)
+            logger.info("Indexed %d chunk(s) of %s", len(chunks), document.id)
+            db.expunge_all()
+
+
+if __name__ == "__main__":
+    main()
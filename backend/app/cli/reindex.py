@@ -0,0 +1,62 @@
+"""Rebuild chunks and embeddings of indexed documents from their stored files.
+
+Run with ``python -m app.cli.reindex`` after changing the splitter settings or the embedding
+provider/model. Progress is checkpointed, so rerunning the command after an interruption
+continues where it stopped; ``--restart`` ignores the checkpoint.
+"""
+
+import argparse
+import logging
+import sys
+
+from .. import models as _  # noqa: F401
+from ..core.config import get_settings
+from ..db.session import init_db
+from ..services.rag import build_rag_service
+from ..services.reindex import Reindexer, ReindexCheckpoint, settings_fingerprint
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="python -m app.cli.reindex", description=__doc__.splitlines()[0])
+    parser.add_argument("document_ids", nargs="*", help="Only reindex these documents.")
+    parser.add_argument("--user-id", help="Only reindex documents of this user.")
+    parser.add_argument("--workers", type=int, default=settings.ingestion_workers, help="Documents processed in parallel.")
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=None,
+        help="Maximum embedding batches sent per second across all workers.",
+    )
+    parser.add_argument("--checkpoint", default="./storage/reindex_checkpoint.json", help="Checkpoint file path.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+
+    rag_service = build_rag_service()
+    checkpoint = ReindexCheckpoint(args.checkpoint, settings_fingerprint(settings, rag_service.embedding_service))
+    if not args.restart:
+        checkpoint.load()
+
+    reindexer = Reindexer(
+        rag_service,
+        settings,
+        checkpoint,
+        workers=args.workers,
+        requests_per_second=args.max_rps,
+    )
+    try:
+        report = reindexer.run(args.document_ids or None, user_id=args.user_id)
+    finally:
+        rag_service.text_extractor.close()
+
+    print(f"Reindexed {report.reindexed}, skipped {report.skipped}, failed {len(report.failed)}")
+    for document_id, error in report.failed.items():
+        print(f"  {document_id}: {error}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Move vectors from the shared Chroma ``documents`` collection into per-user shards.
+
+Run with ``python -m app.cli.shard_chroma`` after switching ``CHROMA_SHARD_MODE`` to ``user`` or
+``bucket``. Vectors are copied page by page and removed from the shared collection once their
+shard holds them, so an interrupted run can simply be restarted. The emptied shared
+collection is dropped at the end.
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+
+from ..core.config import get_settings
+from ..services.embedding import EmbeddingService
+from ..services.vector_store import STAGED_USER_PREFIX, ChromaVectorStore
+
+logger = logging.getLogger("app.cli.shard_chroma")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.shard_chroma", description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500, help="Vectors moved per page.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the vectors per shard.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    if settings.chroma_shard_mode == "none":
+        parser.error("CHROMA_SHARD_MODE is 'none'; set it to 'user' or 'bucket' before migrating.")
+
+    store = ChromaVectorStore(settings, EmbeddingService(settings).namespace)
+    client = store._client
+    names = {getattr(entry, "name", entry) for entry in client.list_collections()}
+    if store.shared_collection not in names:
+        print("Nothing to migrate: no shared collection.")
+        return 0
+    source = client.get_collection(store.shared_collection)
+
+    include = ["metadatas"] if args.dry_run else ["embeddings", "documents", "metadatas"]
+    moved = 0
+    unowned = 0
+    per_shard: dict[str, int] = defaultdict(int)
+    while True:
+        # Moved vectors are deleted from the source, so only skipped ones shift the offset.
+        offset = unowned + (moved if args.dry_run else 0)
+        page = source.get(limit=args.batch_size, offset=offset, include=include)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+
+        groups: dict[str, list[int]] = defaultdict(list)
+        for position, metadata in enumerate(page.get("metadatas") or []):
+            owner = str((metadata or {}).get("user_id") or "")
+            owner = owner.removeprefix(STAGED_USER_PREFIX)
+            if not owner:
+                unowned += 1
+                continue
+            groups[owner].append(position)
+
+        for owner, positions in groups.items():
+            shard = store.collection_name(owner)
+            per_shard[shard] += len(positions)
+            if args.dry_run:
+                continue
+            store.collection(shard).upsert(
+                ids=[ids[position] for position in positions],
+                embeddings=[page["embeddings"][position] for position in positions],
+                documents=[page["documents"][position] for position in positions],
+                metadatas=[page["metadatas"][position] for position in positions],
+            )
+            source.delete(ids=[ids[position] for position in positions])
+
+        moved += sum(len(positions) for positions in groups.values())
+        logger.info("%s %d vector(s)", "Counted" if args.dry_run else "Moved", moved)
+
+    if not args.dry_run and unowned == 0 and source.count() == 0:
+        client.delete_collection(store.shared_collection)
+
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {moved} vector(s) into {len(per_shard)} shard(s); {unowned} without an owner left in place")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,22 @@
+"""Standalone ingestion worker.
+
+Run with ``python -m app.cli.worker`` next to an API started with ``INGESTION_MODE=external``
+to keep extraction and embedding off the web workers.
+"""
+
+import asyncio
+import logging
+
+from .. import models as _  # noqa: F401
+from ..db.session import init_db
+from ..services.ingestion_queue import build_ingestion_queue
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    asyncio.run(build_ingestion_queue().run_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from functools import lru_cache
 from json import loads
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -18,6 +18,37 @@ class Settings(BaseSettings):
         description="SQLAlchemy-compatible connection URL.",
         alias="DATABASE_URL",
     )
+    threadpool_size: int = Field(
+        default=40,
+        description="Threads for blocking work in the API (database, SQLite indexes, local embeddings).",
+        alias="THREADPOOL_SIZE",
+    )
+    vector_store_backend: str = Field(
+        default="chroma",
+        description="chroma, or numpy for exact search over per-user memory-mapped matrices.",
+        alias="VECTOR_STORE_BACKEND",
+    )
+    numpy_index_dir: str = Field(default="./storage/vectors", alias="NUMPY_INDEX_DIR")
+    numpy_index_compaction_threshold: float = Field(
+        default=0.3,
+        description="Fraction of deleted rows in a user's matrix that triggers compaction.",
+        alias="NUMPY_INDEX_COMPACTION_THRESHOLD",
+    )
+    numpy_index_quantization: str = Field(
+        default="none",
+        description="Compressed codes scanned for candidates before a float32 rerank: none, int8 or pq.",
+        alias="NUMPY_INDEX_QUANTIZATION",
+    )
+    numpy_index_rerank_candidates: int = Field(
+        default=100,
+        description="Candidates picked from the quantized codes and rescored at full precision.",
+        alias="NUMPY_INDEX_RERANK_CANDIDATES",
+    )
+    numpy_index_pq_subvectors: int = Field(
+        default=64,
+        description="Bytes per vector with product quantization (one per subvector).",
+        alias="NUMPY_INDEX_PQ_SUBVECTORS",
+    )
     chroma_persist_dir: str = Field(default="./storage/chroma", alias="CHROMA_PERSIST_DIR")
     chroma_server_host: Optional[str] = Field(
         default=None,
@@ -25,18 +56,202 @@ class Settings(BaseSettings):
         alias="CHROMA_SERVER_HOST",
     )
     chroma_server_port: int = Field(default=8000, alias="CHROMA_SERVER_PORT")
+    chroma_shard_mode: str = Field(
+        default="none",
+        description="none (one shared collection), user (a collection per user) or bucket (users hashed into CHROMA_SHARD_BUCKETS collections). Run python -m app.cli.shard_chroma when switching an existing install.",
+        alias="CHROMA_SHARD_MODE",
+    )
+    chroma_shard_buckets: int = Field(default=64, alias="CHROMA_SHARD_BUCKETS")
     chroma_server_ssl: bool = Field(default=False, alias="CHROMA_SERVER_SSL")
     uploads_dir: str = Field(default="./storage/uploads", alias="UPLOADS_DIR")
+    upload_max_file_mb: int = Field(default=50, alias="UPLOAD_MAX_FILE_MB")
+    upload_max_request_mb: int = Field(
+        default=200,
+        description="Combined size of all files in one upload request.",
+        alias="UPLOAD_MAX_REQUEST_MB",
+    )
     default_user_id: str = Field(default="demo-user", alias="DEFAULT_USER_ID")
 
+    ingestion_mode: str = Field(
+        default="inline",
+        description="inline runs ingestion workers in the API process; external leaves them to `python -m app.cli.worker`.",
+        alias="INGESTION_MODE",
+    )
+    ingestion_workers: int = Field(default=2, alias="INGESTION_WORKERS")
+    ingestion_upload_concurrency: int = Field(
+        default=4,
+        description="Files of one upload request that are stored and queued concurrently.",
+        alias="INGESTION_UPLOAD_CONCURRENCY",
+    )
+    ingestion_poll_interval_seconds: float = Field(default=2.0, alias="INGESTION_POLL_INTERVAL_SECONDS")
+    ingestion_max_attempts: int = Field(default=3, alias="INGESTION_MAX_ATTEMPTS")
+    ingestion_stale_after_seconds: int = Field(
+        default=60,
+        description="In-progress jobs without a heartbeat for this long are assumed crashed and requeued.",
+        alias="INGESTION_STALE_AFTER_SECONDS",
+    )
+
+    pdf_extraction_workers: int = Field(
+        default=2,
+        description="Processes used to parse PDFs; 0 parses in the calling thread.",
+        alias="PDF_EXTRACTION_WORKERS",
+    )
+    pdf_pages_per_task: int = Field(default=16, alias="PDF_PAGES_PER_TASK")
+    pdf_extraction_timeout_seconds: float = Field(
+        default=120.0,
+        description="Maximum time a single PDF may spend waiting on extraction before its workers are killed.",
+        alias="PDF_EXTRACTION_TIMEOUT_SECONDS",
+    )
+
     text_splitter_chunk_size: int = Field(default=800, alias="TEXT_SPLITTER_CHUNK_SIZE")
     text_splitter_chunk_overlap: int = Field(default=200, alias="TEXT_SPLITTER_CHUNK_OVERLAP")
+    text_splitter_mode: str = Field(
+        default="chars",
+        description="chars sizes chunks in characters; tokens sizes chunks and overlap in tokenizer tokens.",
+        alias="TEXT_SPLITTER_MODE",
+    )
+    tokenizer_encoding: str = Field(default="cl100k_base", alias="TOKENIZER_ENCODING")
+    embedding_batch_size: int = Field(
+        default=64,
+        description="Chunks embedded and indexed together while a document streams through ingestion.",
+        alias="EMBEDDING_BATCH_SIZE",
+    )
     embedding_provider: str = Field(
         default="auto",
         description="Preferred embedding provider: auto|openai|gemini|local.",
         alias="EMBEDDING_PROVIDER",
     )
     embedding_model: str = Field(default="text-embedding-3-small", alias="EMBEDDING_MODEL")
+    embedding_cache_enabled: bool = Field(
+        default=True,
+        description="Cache chunk embeddings from remote providers on disk, keyed by model and text hash.",
+        alias="EMBEDDING_CACHE_ENABLED",
+    )
+    embedding_cache_path: str = Field(default="./storage/embedding_cache.sqlite3", alias="EMBEDDING_CACHE_PATH")
+    embedding_cache_max_mb: int = Field(default=512, alias="EMBEDDING_CACHE_MAX_MB")
+    query_embedding_cache_size: int = Field(
+        default=1024,
+        description="Query embeddings kept in memory per process; 0 disables the query cache.",
+        alias="QUERY_EMBEDDING_CACHE_SIZE",
+    )
+    query_embedding_cache_ttl_seconds: float = Field(default=3600.0, alias="QUERY_EMBEDDING_CACHE_TTL_SECONDS")
+    query_embedding_cache_shared: bool = Field(
+        default=False,
+        description="Also store query embeddings on disk so all workers on the host share them.",
+        alias="QUERY_EMBEDDING_CACHE_SHARED",
+    )
+    query_embedding_cache_path: str = Field(
+        default="./storage/query_embedding_cache.sqlite3", alias="QUERY_EMBEDDING_CACHE_PATH"
+    )
+    query_embedding_cache_max_mb: int = Field(default=64, alias="QUERY_EMBEDDING_CACHE_MAX_MB")
+    batch_ask_max_questions: int = Field(
+        default=200,
+        description="Most questions accepted by one /api/ask/batch request.",
+        alias="BATCH_ASK_MAX_QUESTIONS",
+    )
+    batch_ask_concurrency: int = Field(
+        default=8,
+        description="LLM generations in flight at once for one batch request.",
+        alias="BATCH_ASK_CONCURRENCY",
+    )
+    context_token_budget: int = Field(
+        default=3000,
+        description="Tokens of retrieved context placed in the prompt when the chat model has no own budget.",
+        alias="CONTEXT_TOKEN_BUDGET",
+    )
+    context_token_budgets: Dict[str, int] = Field(
+        default_factory=dict,
+        description='Per-model context budgets as JSON, e.g. {"gpt-4o-mini": 6000}.',
+        alias="CONTEXT_TOKEN_BUDGETS",
+    )
+    context_mmr_lambda: float = Field(
+        default=0.7,
+        description="Weight of retrieval rank against novelty when ordering context passages (1 = rank only).",
+        alias="CONTEXT_MMR_LAMBDA",
+    )
+    context_duplicate_threshold: float = Field(
+        default=0.8,
+        description="Word-bigram Jaccard similarity above which a passage is dropped as a near-duplicate.",
+        alias="CONTEXT_DUPLICATE_THRESHOLD",
+    )
+    retrieval_mode: str = Field(
+        default="hybrid",
+        description="dense (Chroma only), lexical (BM25 only) or hybrid (both, merged by reciprocal rank fusion).",
+        alias="RETRIEVAL_MODE",
+    )
+    retrieval_candidates: int = Field(
+        default=20,
+        description="Results fetched from each retriever before fusion in hybrid mode.",
+        alias="RETRIEVAL_CANDIDATES",
+    )
+    retrieval_rrf_k: int = Field(default=60, alias="RETRIEVAL_RRF_K")
+    retrieval_top_k: int = Field(
+        default=4,
+        description="Chunks handed to the context packer when a request does not set top_k.",
+        alias="RETRIEVAL_TOP_K",
+    )
+    rerank_mode: str = Field(
+        default="none",
+        description="none, lexical (query-term overlap) or cross-encoder (needs sentence-transformers).",
+        alias="RERANK_MODE",
+    )
+    rerank_model: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2", alias="RERANK_MODEL")
+    rerank_candidates: int = Field(
+        default=20, description="First-stage results rescored by the reranker.", alias="RERANK_CANDIDATES"
+    )
+    rerank_latency_budget_ms: float = Field(
+        default=300.0,
+        description="Keep the first-stage order when reranking takes longer than this; 0 waits indefinitely.",
+        alias="RERANK_LATENCY_BUDGET_MS",
+    )
+    rerank_min_score: float = Field(
+        default=0.0,
+        description="Drop chunks the reranker scores below this (scores are in [0, 1]); 0 keeps every chunk.",
+        alias="RERANK_MIN_SCORE",
+    )
+    rerank_workers: int = Field(default=2, description="Threads scoring rerank requests.", alias="RERANK_WORKERS")
+    lexical_index_dir: str = Field(default="./storage/lexical", alias="LEXICAL_INDEX_DIR")
+    answer_cache_size: int = Field(
+        default=512,
+        description="Answers kept in memory per process; 0 disables the answer cache.",
+        alias="ANSWER_CACHE_SIZE",
+    )
+    answer_cache_ttl_seconds: float = Field(default=3600.0, alias="ANSWER_CACHE_TTL_SECONDS")
+    answer_cache_similarity_threshold: float = Field(
+        default=0.0,
+        description="Serve cached answers to questions with at least this query-embedding cosine similarity; 0 matches exact questions only.",
+        alias="ANSWER_CACHE_SIMILARITY_THRESHOLD",
+    )
+    chat_history_token_budget: int = Field(
+        default=1000,
+        description="Tokens of conversation history (rolling summary plus recent turns) sent with each question.",
+        alias="CHAT_HISTORY_TOKEN_BUDGET",
+    )
+    chat_summary_token_budget: int = Field(
+        default=300,
+        description="Upper bound on the rolling summary older turns are compacted into.",
+        alias="CHAT_SUMMARY_TOKEN_BUDGET",
+    )
+    chat_condense_questions: bool = Field(
+        default=True,
+        description="Rewrite follow-up questions into standalone ones before retrieval.",
+        alias="CHAT_CONDENSE_QUESTIONS",
+    )
+    single_flight_enabled: bool = Field(
+        default=True,
+        description="Let concurrent identical asks, query embeddings, retrievals and generations share one in-flight computation.",
+        alias="SINGLE_FLIGHT_ENABLED",
+    )
+    embedding_max_batch_tokens: int = Field(
+        default=8000,
+        description="Upper bound on estimated tokens per embedding request; halved while rate-limited.",
+        alias="EMBEDDING_MAX_BATCH_TOKENS",
+    )
+    embedding_max_batch_size: int = Field(default=128, alias="EMBEDDING_MAX_BATCH_SIZE")
+    embedding_concurrency: int = Field(
+        default=4, description="Embedding requests in flight at once per process.", alias="EMBEDDING_CONCURRENCY"
+    )
+    embedding_max_retries: int = Field(default=6, alias="EMBEDDING_MAX_RETRIES")
     gemini_embedding_model: str = Field(
         default="models/embedding-001",
         description="Gemini embedding model identifier.",
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from ..core.config import get_settings
@@ -18,3 +18,33 @@ def _build_engine():
 
 engine = _build_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def init_db() -> None:
+    """Create missing tables and add columns introduced after a table was first created.
+
+    There is no migration tool in this project, so new columns are added as nullable and,
+    when a column declares ``info={"backfill": value}``, existing rows are set to that value.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            added = False
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                if "backfill" in column.info:
+                    connection.execute(
+                        text(f"UPDATE {table.name} SET {column.name} = :value"),
+                        {"value": column.info["backfill"]},
+                    )
+                added = True
+
+            if added:
+                for index in table.indexes:
+                    index.create(bind=connection, checkfirst=True)
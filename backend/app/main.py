@@ -3,7 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .api.router import api_router
 from .core.config import get_settings
-from .db.session import Base, engine
+from .db.session import init_db
+from .services.concurrency import configure_threadpool
+from .services.ingestion_queue import build_ingestion_queue
+from .services.rag import build_rag_service
 
 # Ensure SQLAlchemy models are registered before metadata creation.
 from . import models as _  # noqa: F401
@@ -24,7 +27,15 @@ def create_application() -> FastAPI:
 
     @app.on_event("startup")
     async def startup_event() -> None:
-        Base.metadata.create_all(bind=engine)
+        configure_threadpool(settings.threadpool_size)
+        init_db()
+        if settings.ingestion_mode == "inline":
+            await build_ingestion_queue().start()
+
+    @app.on_event("shutdown")
+    async def shutdown_event() -> None:
+        await build_ingestion_queue().stop()
+        build_rag_service().text_extractor.close()
 
     app.include_router(api_router, prefix="/api")
 
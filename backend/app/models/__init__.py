@@ -1,4 +1,5 @@
-from .document import Document, DocumentChunk
+from .chat import ChatMessage, ChatSession
+from .document import Document, DocumentChunk, DocumentStatus
 from .user import User
 
-__all__ = ["Document", "DocumentChunk", "User"]
+__all__ = ["ChatMessage", "ChatSession", "Document", "DocumentChunk", "DocumentStatus", "User"]
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from ..db.session import Base
+
+
+class ChatSession(Base):
+    """A conversation; turns older than ``summarized_through`` live on only in ``summary``."""
+
+    __tablename__ = "chat_sessions"
+
+    # Clients may pick the id (the web app generates a UUID per session).
+    id: Mapped[str] = mapped_column(String(64), primary_key=True, default=lambda: str(uuid4()))
+    user_id: Mapped[str] = mapped_column(String(128), index=True)
+    title: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Messages with ``position`` below this are folded into ``summary``.
+    summarized_through: Mapped[int] = mapped_column(Integer, default=0, info={"backfill": 0})
+    message_count: Mapped[int] = mapped_column(Integer, default=0, info={"backfill": 0})
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True
+    )
+
+    messages: Mapped[list["ChatMessage"]] = relationship(
+        back_populates="session",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="ChatMessage.position",
+    )
+
+
+class ChatMessage(Base):
+    """One user question or assistant answer within a chat session."""
+
+    __tablename__ = "chat_messages"
+    # Two turns appended concurrently must not share a position.
+    __table_args__ = (Index("ix_chat_messages_session_position", "session_id", "position", unique=True),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
+    session_id: Mapped[str] = mapped_column(String(64), ForeignKey("chat_sessions.id", ondelete="CASCADE"), index=True)
+    position: Mapped[int] = mapped_column(Integer)
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    token_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    session: Mapped[ChatSession] = relationship(back_populates="messages")
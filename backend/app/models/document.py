@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+from enum import Enum
 from uuid import uuid4
 
 from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
@@ -9,6 +10,16 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from ..db.session import Base
 
 
+class DocumentStatus(str, Enum):
+    """Lifecycle of a document moving through the ingestion queue."""
+
+    QUEUED = "queued"
+    EXTRACTING = "extracting"
+    EMBEDDING = "embedding"
+    INDEXED = "indexed"
+    FAILED = "failed"
+
+
 class Document(Base):
     """Represents a single uploaded document."""
 
@@ -20,9 +31,20 @@ class Document(Base):
     content_type: Mapped[str] = mapped_column(String(128))
     stored_path: Mapped[str] = mapped_column(String(512))
     size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     chunk_count: Mapped[int] = mapped_column(Integer, default=0)
     embedding_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Documents stored before the ingestion queue existed were indexed synchronously.
+    status: Mapped[str] = mapped_column(
+        String(32), default=DocumentStatus.QUEUED.value, index=True, info={"backfill": DocumentStatus.INDEXED.value}
+    )
+    progress: Mapped[int] = mapped_column(Integer, default=0, info={"backfill": 100})
+    attempts: Mapped[int] = mapped_column(Integer, default=0, info={"backfill": 0})
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True
+    )
 
     chunks: Mapped[list["DocumentChunk"]] = relationship(
         back_populates="document", cascade="all, delete-orphan", passive_deletes=True
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import DateTime, String, func
+from sqlalchemy import DateTime, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..db.session import Base
@@ -20,4 +20,6 @@ class User(Base):
     refresher_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     refresh_token_hash: Mapped[str | None] = mapped_column(String(255), nullable=True)
     refresh_token_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Bumped whenever the user's indexed chunks change; cached answers of older versions are stale.
+    corpus_version: Mapped[int] = mapped_column(Integer, default=0, info={"backfill": 0})
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,17 @@
 from .auth import RefreshRequest, Token, UserCreate, UserLogin, UserRead
 from .title import TitleRequest, TitleResponse
-from .chat import AskRequest, AskResponse, SourceInfo
-from .documents import DocumentListResponse, DocumentSummary, UploadResponse
+from .chat import (
+    AskRequest,
+    AskResponse,
+    BatchAskRequest,
+    BatchAskResult,
+    ChatMessageRead,
+    ChatSessionDetail,
+    ChatSessionListResponse,
+    ChatSessionSummary,
+    SourceInfo,
+)
+from .documents import DocumentListResponse, DocumentSummary, UploadResponse, UploadResult
 
 __all__ = [
     "UserCreate",
@@ -13,8 +23,15 @@ __all__ = [
     "TitleResponse",
     "AskRequest",
     "AskResponse",
+    "BatchAskRequest",
+    "BatchAskResult",
+    "ChatMessageRead",
+    "ChatSessionDetail",
+    "ChatSessionListResponse",
+    "ChatSessionSummary",
     "SourceInfo",
     "DocumentListResponse",
     "DocumentSummary",
     "UploadResponse",
+    "UploadResult",
 ]
@@ -1,10 +1,18 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class AskRequest(BaseModel):
     question: str = Field(..., min_length=3)
+    top_k: int | None = Field(
+        default=None, ge=1, le=50, description="Chunks to answer from; defaults to RETRIEVAL_TOP_K."
+    )
     chat_session_id: str | None = Field(
-        default=None, description="Optional session identifier for future multi-turn chat support."
+        default=None,
+        max_length=64,
+        description="Chat session to continue; created on first use. Follow-ups then see the earlier turns.",
     )
 
 
@@ -14,9 +22,60 @@ class SourceInfo(BaseModel):
     document_name: str
     chunk_index: int
     score: float | None = None
+    score_kind: str | None = Field(
+        default=None,
+        description=(
+            "How to read score: distance (lower is better), or bm25, rrf or rerank (in [0, 1]), "
+            "where higher is better. Depends on RETRIEVAL_MODE and RERANK_MODE."
+        ),
+    )
     snippet: str
 
 
 class AskResponse(BaseModel):
     answer: str
     sources: list[SourceInfo]
+    cached: bool = False
+
+
+class BatchAskRequest(BaseModel):
+    questions: list[Annotated[str, Field(min_length=3)]] = Field(..., min_length=1)
+    top_k: int | None = Field(default=None, ge=1, le=50)
+
+
+class BatchAskResult(BaseModel):
+    """One NDJSON line of ``/ask/batch``; ``index`` is the question's position in the request."""
+
+    index: int
+    question: str
+    answer: str | None = None
+    sources: list[SourceInfo] = Field(default_factory=list)
+    cached: bool = False
+    error: str | None = None
+
+
+class ChatMessageRead(BaseModel):
+    role: str = Field(..., description="user|assistant")
+    content: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatSessionSummary(BaseModel):
+    id: str
+    title: str | None = None
+    message_count: int = 0
+    created_at: datetime
+    updated_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatSessionDetail(ChatSessionSummary):
+    summary: str | None = Field(default=None, description="Rolling summary of the turns compacted so far.")
+    messages: list[ChatMessageRead] = Field(default_factory=list)
+
+
+class ChatSessionListResponse(BaseModel):
+    sessions: list[ChatSessionSummary]
@@ -9,6 +9,10 @@ class DocumentSummary(BaseModel):
     content_type: str = Field(..., description="MIME type detected for the document.")
     chunk_count: int = Field(..., description="Number of text chunks for this document.")
     embedding_count: int = Field(..., description="Number of embeddings stored for this document.")
+    status: str = Field(..., description="Ingestion status: queued|extracting|embedding|indexed|failed.")
+    progress: int = Field(0, description="Ingestion progress percentage for the current attempt.")
+    attempts: int = Field(0, description="Number of ingestion attempts made so far.")
+    error: str | None = Field(default=None, description="Last ingestion error, if any.")
     created_at: datetime = Field(..., description="Upload timestamp.")
 
     model_config = ConfigDict(from_attributes=True)
@@ -18,6 +22,17 @@ class DocumentListResponse(BaseModel):
     documents: list[DocumentSummary]
 
 
+class UploadResult(BaseModel):
+    filename: str = Field(..., description="Original filename as sent by the client.")
+    accepted: bool = Field(..., description="Whether the file was stored and queued for ingestion.")
+    document: DocumentSummary | None = Field(default=None, description="Queued document, when accepted.")
+    deduplicated: bool = Field(
+        default=False, description="True when an identical file was already uploaded and its document is reused."
+    )
+    error: str | None = Field(default=None, description="Reason the file was rejected.")
+
+
 class UploadResponse(BaseModel):
     documents: list[DocumentSummary]
     count: int
+    results: list[UploadResult] = Field(default_factory=list, description="Per-file outcome in request order.")
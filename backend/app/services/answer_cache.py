@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from ..schemas import AskResponse
+from .embedding_cache import normalize_query
+
+
+@dataclass(slots=True)
+class _Entry:
+    expires_at: float
+    response: AskResponse
+    vector: np.ndarray | None
+
+
+class AnswerCache:
+    """In-process LRU of answers keyed by user, corpus version, ``top_k`` and normalised question.
+
+    The corpus version is bumped in the database whenever a user's indexed chunks change, so
+    entries of older versions can never be served again and are dropped on the next write for
+    that user. With ``similarity_threshold`` set, a question whose embedding has at least that
+    cosine similarity to a cached question of the same user, version and ``top_k`` is answered
+    from the cache as well.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float | None = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold or None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, int, int, str], _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, corpus_version: int, top_k: int, question: str) -> AskResponse | None:
+        key = (user_id, corpus_version, top_k, normalize_query(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def get_similar(
+        self, user_id: str, corpus_version: int, top_k: int, query_embedding: List[float] | None
+    ) -> AskResponse | None:
+        """Near-duplicate lookup; also counts the miss when nothing matches."""
+        if self.similarity_threshold is None or query_embedding is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if key[:3] == (user_id, corpus_version, top_k) and entry.vector is not None and entry.expires_at > now
+            ]
+            if candidates:
+                query = _unit(query_embedding)
+                scores = np.stack([entry.vector for _, entry in candidates]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.similar_hits += 1
+                    return entry.response
+            self.misses += 1
+        return None
+
+    def put(
+        self,
+        user_id: str,
+        corpus_version: int,
+        top_k: int,
+        question: str,
+        response: AskResponse,
+        query_embedding: List[float] | None = None,
+    ) -> None:
+        vector = _unit(query_embedding) if self.similarity_threshold is not None and query_embedding else None
+        key = (user_id, corpus_version, top_k, normalize_query(question))
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == user_id and k[1] != corpus_version]:
+                del self._entries[stale]
+            self._entries[key] = _Entry(time.monotonic() + self.ttl_seconds, response, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, float | int | None]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+        }
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db.session import SessionLocal
+from ..models.chat import ChatMessage, ChatSession
+from .concurrency import SingleFlight
+from .llm import LLMService
+from .tokenizer import Tokenizer
+
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_CHARS = 80
+# Compaction folds old turns until the unsummarised ones fill at most this share of the budget,
+# so a long conversation is summarised every few turns rather than on every turn.
+COMPACTION_TARGET = 0.5
+# Attempts at storing a turn when a concurrent turn in the same session took its positions.
+APPEND_ATTEMPTS = 3
+
+
+class ChatSessionNotFound(LookupError):
+    """Raised when a chat session id belongs to another user."""
+
+
+@dataclass
+class ChatTurn:
+    """What a new question in a session needs from the conversation so far."""
+
+    session_id: str
+    history: str  # summary plus recent turns, within the history token budget
+    standalone_question: str  # the question rewritten for retrieval
+
+
+class ChatHistoryService:
+    """Store chat sessions and keep the history sent to the model within a fixed token budget.
+
+    The prompt gets the session's rolling summary followed by as many recent turns as fit
+    ``token_budget``. Once the turns not yet summarised exceed the budget, the oldest are folded
+    into the summary (at most ``summary_token_budget`` tokens) in the background. The summary is
+    stored on the session, so it is computed once rather than on every turn.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        tokenizer: Tokenizer,
+        session_factory: Callable[[], Session] = SessionLocal,
+        token_budget: int = 1000,
+        summary_token_budget: int = 300,
+        condense_questions: bool = True,
+    ) -> None:
+        self.llm_service = llm_service
+        self.tokenizer = tokenizer
+        self.session_factory = session_factory
+        self.token_budget = token_budget
+        self.summary_token_budget = min(summary_token_budget, token_budget)
+        self.condense_questions = condense_questions
+        self._compactions = SingleFlight("chat compaction")
+        self._background: set[asyncio.Task] = set()
+
+    async def prepare(self, user_id: str, session_id: str, question: str) -> ChatTurn:
+        history = await run_in_threadpool(self._load_history, user_id, session_id)
+        standalone = question
+        if history and self.condense_questions:
+            standalone = await self.llm_service.acondense_question(question, history)
+        return ChatTurn(session_id=session_id, history=history, standalone_question=standalone)
+
+    async def record(self, user_id: str, turn: ChatTurn, question: str, answer: str) -> None:
+        """Append the question and answer, then compact the session in the background if needed."""
+        needs_compaction = await run_in_threadpool(self._append, user_id, turn.session_id, question, answer)
+        if needs_compaction:
+            task = asyncio.create_task(self._compactions.do(turn.session_id, lambda: self.compact(turn.session_id)))
+            self._background.add(task)
+            task.add_done_callback(self._finish_background)
+
+    def _finish_background(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Chat history compaction failed: %s", task.exception())
+
+    async def compact(self, session_id: str) -> None:
+        """Fold the oldest unsummarised turns into the session summary."""
+        pending = await run_in_threadpool(self._turns_to_fold, session_id)
+        if pending is None:
+            return
+        start, end, summary, transcript = pending
+
+        # ~0.75 words per token for English text.
+        max_words = max(20, int(self.summary_token_budget * 0.75))
+        summary = await self.llm_service.asummarize_history(summary, transcript, max_words)
+        summary = self._keep_tail(summary, self.summary_token_budget)
+        if await run_in_threadpool(self._store_summary, session_id, start, end, summary):
+            logger.info("Compacted messages %d-%d of chat session %s", start, end - 1, session_id)
+
+    def _turns_to_fold(self, session_id: str) -> tuple[int, int, str, str] | None:
+        with self.session_factory() as db:
+            session = db.get(ChatSession, session_id)
+            if session is None:
+                return None
+            messages = (
+                db.query(ChatMessage)
+                .filter(ChatMessage.session_id == session_id, ChatMessage.position >= session.summarized_through)
+                .order_by(ChatMessage.position)
+                .all()
+            )
+            folded = self._messages_to_fold(messages)
+            if not folded:
+                return None
+            return session.summarized_through, folded[-1].position + 1, session.summary or "", self._transcript(folded)
+
+    def _store_summary(self, session_id: str, start: int, end: int, summary: str) -> bool:
+        with self.session_factory() as db:
+            # Another worker may have compacted the same turns meanwhile; only one update wins.
+            updated = (
+                db.query(ChatSession)
+                .filter(ChatSession.id == session_id, ChatSession.summarized_through == start)
+                .update({ChatSession.summary: summary, ChatSession.summarized_through: end}, synchronize_session=False)
+            )
+            db.commit()
+        return bool(updated)
+
+    def _messages_to_fold(self, messages: Sequence[ChatMessage]) -> list[ChatMessage]:
+        total = sum(message.token_count for message in messages)
+        if total <= self.token_budget:
+            return []
+        target = int(self.token_budget * COMPACTION_TARGET)
+        folded: list[ChatMessage] = []
+        for message in messages[:-1]:  # the latest message always stays verbatim
+            if total <= target:
+                break
+            folded.append(message)
+            total -= message.token_count
+        return folded
+
+    def _load_history(self, user_id: str, session_id: str) -> str:
+        with self.session_factory() as db:
+            session = db.get(ChatSession, session_id)
+            if session is None:
+                return ""
+            if session.user_id != user_id:
+                raise ChatSessionNotFound(session_id)
+
+            summary = session.summary or ""
+            remaining = self.token_budget - (self.tokenizer.count(summary) if summary else 0)
+            recent: list[ChatMessage] = []
+            # Newest first, until the budget is spent; older turns not yet summarised are left out.
+            query = (
+                db.query(ChatMessage)
+                .filter(ChatMessage.session_id == session_id, ChatMessage.position >= session.summarized_through)
+                .order_by(ChatMessage.position.desc())
+            )
+            for message in query.yield_per(50):
+                if message.token_count > remaining:
+                    break
+                recent.append(message)
+                remaining -= message.token_count
+
+        parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+        if recent:
+            parts.append(self._transcript(reversed(recent)))
+        return "\n".join(parts)
+
+    def _append(self, user_id: str, session_id: str, question: str, answer: str) -> bool:
+        """Store a turn; returns whether the unsummarised history now exceeds the budget.
+
+        The session row is locked where the database supports it. Elsewhere (SQLite) the unique
+        ``(session_id, position)`` index rejects a turn that raced another, and it is retried.
+        """
+        for _ in range(APPEND_ATTEMPTS - 1):
+            try:
+                return self._try_append(user_id, session_id, question, answer)
+            except IntegrityError:
+                logger.info("Concurrent turn in chat session %s; retrying", session_id)
+        return self._try_append(user_id, session_id, question, answer)
+
+    def _try_append(self, user_id: str, session_id: str, question: str, answer: str) -> bool:
+        with self.session_factory() as db:
+            try:
+                session = db.get(ChatSession, session_id, with_for_update=True)
+                if session is None:
+                    session = ChatSession(id=session_id, user_id=user_id, title=question.strip()[:TITLE_MAX_CHARS])
+                    db.add(session)
+                    db.flush()
+                elif session.user_id != user_id:
+                    raise ChatSessionNotFound(session_id)
+
+                # Stored messages keep at most one budget's worth of tokens; the full answer is
+                # still returned to the client.
+                for offset, (role, content) in enumerate((("user", question), ("assistant", answer))):
+                    db.add(
+                        ChatMessage(
+                            session_id=session_id,
+                            position=(session.message_count or 0) + offset,
+                            role=role,
+                            content=content,
+                            token_count=min(self.tokenizer.count(content), self.token_budget),
+                        )
+                    )
+                session.message_count = (session.message_count or 0) + 2
+                db.flush()
+
+                pending = (
+                    db.query(func.coalesce(func.sum(ChatMessage.token_count), 0))
+                    .filter(ChatMessage.session_id == session_id, ChatMessage.position >= session.summarized_through)
+                    .scalar()
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        return pending > self.token_budget
+
+    def _transcript(self, messages: Iterable[ChatMessage]) -> str:
+        lines = []
+        for message in messages:
+            speaker = "User" if message.role == "user" else "Assistant"
+            content = message.content
+            if message.token_count >= self.token_budget:
+                content = self._keep_tail(content, self.token_budget - 1)
+            lines.append(f"{speaker}: {content}")
+        return "\n".join(lines)
+
+    def _keep_tail(self, text: str, budget: int) -> str:
+        tokens = self.tokenizer.encode(text)
+        if len(tokens) <= budget:
+            return text
+        return self.tokenizer.decode(tokens[-budget:]).lstrip()
+
+    def is_accessible(self, user_id: str, session_id: str) -> bool:
+        """True when the session is the user's or does not exist yet."""
+        with self.session_factory() as db:
+            owner = db.query(ChatSession.user_id).filter(ChatSession.id == session_id).scalar()
+        return owner is None or owner == user_id
+
+    def list_sessions(self, db: Session, user_id: str) -> list[ChatSession]:
+        return (
+            db.query(ChatSession)
+            .filter(ChatSession.user_id == user_id)
+            .order_by(ChatSession.updated_at.desc(), ChatSession.created_at.desc())
+            .all()
+        )
+
+    def get_session(self, db: Session, user_id: str, session_id: str) -> ChatSession | None:
+        session = db.get(ChatSession, session_id)
+        if not session or session.user_id != user_id:
+            return None
+        return session
+
+    def delete_session(self, db: Session, user_id: str, session_id: str) -> bool:
+        session = self.get_session(db, user_id, session_id)
+        if session is None:
+            return False
+        # SQLite does not enforce the foreign key cascade unless asked to.
+        db.query(ChatMessage).filter(ChatMessage.session_id == session_id).delete(synchronize_session=False)
+        db.delete(session)
+        db.commit()
+        return True
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Sequence
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..models.document import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 1000
+COPY_COLUMNS = ("id", "document_id", "chunk_index", "content", "token_count")
+
+
+@dataclass(slots=True)
+class ChunkRecord:
+    """Plain chunk row, written in bulk instead of through ORM objects.
+
+    ``id`` is generated client-side so the same id can be used for the vector store entry
+    before the row exists in the database.
+    """
+
+    document_id: str
+    chunk_index: int
+    content: str
+    token_count: int = 0
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+def write_chunks(db: Session, records: Sequence[ChunkRecord]) -> None:
+    """Insert chunk rows in bulk within the session's current transaction.
+
+    On PostgreSQL with the psycopg 3 driver the rows are streamed with ``COPY``; other
+    backends use a Core ``INSERT`` executed as executemany in batches of
+    ``INSERT_BATCH_SIZE``. The caller commits.
+    """
+    if not records:
+        return
+
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg":
+        _copy_chunks(db, records)
+        return
+
+    statement = insert(DocumentChunk)
+    for start in range(0, len(records), INSERT_BATCH_SIZE):
+        db.execute(statement, [asdict(record) for record in records[start : start + INSERT_BATCH_SIZE]])
+
+
+def _copy_chunks(db: Session, records: Sequence[ChunkRecord]) -> None:
+    connection = db.connection().connection.driver_connection
+    columns = ", ".join(COPY_COLUMNS)
+    with connection.cursor() as cursor:
+        with cursor.copy(f"COPY {DocumentChunk.__tablename__} ({columns}) FROM STDIN") as copy:
+            for record in records:
+                copy.write_row(tuple(getattr(record, column) for column in COPY_COLUMNS))
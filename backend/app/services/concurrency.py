@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+import anyio.to_thread
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def configure_threadpool(size: int) -> None:
+    """Resize the thread pool behind ``run_in_threadpool``; call from inside the running event loop."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = max(1, size)
+
+
+async def call_async(target: Any, method: str, *args: Any) -> Any:
+    """Await ``target.a<method>(*args)`` when the target has a native coroutine version of the method.
+
+    Otherwise ``target.<method>`` runs in a worker thread. Only genuinely synchronous
+    providers then occupy one of the event loop's limited threads.
+    """
+    native = getattr(target, f"a{method}", None)
+    if native is not None:
+        return await native(*args)
+    return await run_in_threadpool(getattr(target, method), *args)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight computation.
+
+    The first caller (the leader) starts ``factory()`` in its own task, and later callers with
+    the same key await that task. They all get its result or exception. A cancelled caller only
+    stops waiting, so followers are unaffected when the leader disconnects. The computation is
+    cancelled once every caller has gone. Nothing is kept after it finishes: this deduplicates
+    concurrent work only, and caching stays with the caches.
+    """
+
+    def __init__(self, name: str, enabled: bool = True) -> None:
+        self.name = name
+        self.enabled = enabled
+        self.started = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await factory()
+
+        flight = self._flights.get(key)
+        # A flight left over from another event loop (e.g. a closed test client) cannot be awaited.
+        if flight is None or flight.task.get_loop() is not asyncio.get_running_loop():
+            flight = _Flight(asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                logger.debug("Cancelling %s computation; every caller has gone", self.name)
+                # Forget it now so a new caller starts afresh instead of joining a cancelled task.
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self._flights)}
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Mapping, Sequence
+
+from .tokenizer import Tokenizer
+from .vector_store import SourceChunk
+
+# Shorter overlaps are too likely to be coincidental to stitch on.
+MIN_STITCH_OVERLAP = 16
+# A passage is only cut to fit the budget if this many tokens of it would remain.
+MIN_PARTIAL_TOKENS = 64
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class Passage:
+    """Consecutive chunks of one document, stitched into a single span of text."""
+
+    document_id: str
+    document_name: str
+    chunk_indexes: List[int]
+    chunk_ids: List[str]
+    text: str
+    rank: int  # best retrieval rank among the chunks, 0 = most relevant
+
+
+@dataclass
+class PackedContext:
+    text: str
+    token_count: int
+    chunk_ids: set[str] = field(default_factory=set)
+    passages: int = 0
+    duplicates_dropped: int = 0
+    truncated: bool = False
+
+
+def stitch(left: str, right: str) -> str | None:
+    """Join two neighbouring chunks without repeating the text they share, or None if they share none."""
+    probe = right[:MIN_STITCH_OVERLAP]
+    if len(probe) < MIN_STITCH_OVERLAP:
+        return None
+    # Leftmost match first, so the longest overlap wins.
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return left + right[len(left) - start :]
+        start = left.find(probe, start + 1)
+    return None
+
+
+def merge_neighbours(chunks: Sequence[SourceChunk]) -> List[Passage]:
+    """Group hits with consecutive ``chunk_index`` in the same document into passages."""
+    ranks = {chunk.chunk_id: rank for rank, chunk in enumerate(chunks)}
+    unique = {chunk.chunk_id: chunk for chunk in chunks}.values()
+    ordered = sorted(unique, key=lambda chunk: (chunk.document_id, chunk.chunk_index))
+
+    passages: List[Passage] = []
+    for chunk in ordered:
+        previous = passages[-1] if passages else None
+        if (
+            previous is not None
+            and previous.document_id == chunk.document_id
+            and previous.chunk_indexes[-1] + 1 == chunk.chunk_index
+        ):
+            previous.text = stitch(previous.text, chunk.content) or f"{previous.text}\n{chunk.content}"
+            previous.chunk_indexes.append(chunk.chunk_index)
+            previous.chunk_ids.append(chunk.chunk_id)
+            previous.rank = min(previous.rank, ranks[chunk.chunk_id])
+            continue
+        passages.append(
+            Passage(
+                document_id=chunk.document_id,
+                document_name=chunk.document_name,
+                chunk_indexes=[chunk.chunk_index],
+                chunk_ids=[chunk.chunk_id],
+                text=chunk.content,
+                rank=ranks[chunk.chunk_id],
+            )
+        )
+    return passages
+
+
+def _shingles(text: str) -> set[tuple[str, str]]:
+    words = _WORD_PATTERN.findall(text.casefold())
+    return set(zip(words, words[1:])) or {(word, "") for word in words}
+
+
+def _jaccard(left: set, right: set) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class ContextPacker:
+    """Assemble the prompt context from retrieved chunks within a per-model token budget.
+
+    Neighbouring hits are stitched into passages without their overlap. Passages are then
+    picked by maximal marginal relevance (retrieval rank against word-bigram similarity to
+    those already picked), and ones at least ``duplicate_threshold`` similar are dropped. The
+    picked passages fill the budget in that order. The text keeps the previous layout:
+    a document name followed by its passages.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Tokenizer,
+        token_budget: int = 3000,
+        model_budgets: Mapping[str, int] | None = None,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.8,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.token_budget = token_budget
+        self.model_budgets = dict(model_budgets or {})
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def budget_for(self, model_name: str | None) -> int:
+        return self.model_budgets.get(model_name or "", self.token_budget)
+
+    def pack(self, chunks: Sequence[SourceChunk], model_name: str | None = None) -> PackedContext:
+        passages = merge_neighbours(chunks)
+        selected, dropped = self._select(passages, len(chunks))
+
+        budget = self.budget_for(model_name)
+        used = 0
+        truncated = False
+        packed: List[Passage] = []
+        headers: set[str] = set()
+        for passage in selected:
+            header_cost = 0 if passage.document_name in headers else self.tokenizer.count(passage.document_name + "\n")
+            cost = header_cost + self.tokenizer.count(passage.text)
+            if used + cost > budget:
+                room = budget - used - header_cost
+                if packed or room < MIN_PARTIAL_TOKENS:
+                    continue  # a later, shorter passage may still fit
+                passage.text = self.tokenizer.decode(self.tokenizer.encode(passage.text)[:room])
+                cost = header_cost + room
+                truncated = True
+            used += cost
+            headers.add(passage.document_name)
+            packed.append(passage)
+
+        return PackedContext(
+            text=self._render(packed),
+            token_count=used,
+            chunk_ids={chunk_id for passage in packed for chunk_id in passage.chunk_ids},
+            passages=len(packed),
+            duplicates_dropped=dropped,
+            truncated=truncated,
+        )
+
+    def _select(self, passages: List[Passage], total: int) -> tuple[List[Passage], int]:
+        shingles = [_shingles(passage.text) for passage in passages]
+        remaining = list(range(len(passages)))
+        chosen: List[int] = []
+        dropped = 0
+        while remaining:
+            best, best_score, best_similarity = remaining[0], float("-inf"), 0.0
+            for index in remaining:
+                similarity = max((_jaccard(shingles[index], shingles[other]) for other in chosen), default=0.0)
+                relevance = 1.0 - passages[index].rank / max(1, total)
+                score = self.mmr_lambda * relevance - (1.0 - self.mmr_lambda) * similarity
+                if score > best_score:
+                    best, best_score, best_similarity = index, score, similarity
+            remaining.remove(best)
+            if best_similarity >= self.duplicate_threshold:
+                dropped += 1
+                continue
+            chosen.append(best)
+        return [passages[index] for index in chosen], dropped
+
+    @staticmethod
+    def _render(passages: Sequence[Passage]) -> str:
+        # Documents in order of their best passage; passages in reading order within each.
+        by_document: dict[str, List[Passage]] = {}
+        for passage in passages:
+            by_document.setdefault(passage.document_name, []).append(passage)
+        return "\n\n".join(
+            f"{name}\n" + "\n".join(p.text for p in sorted(group, key=lambda p: p.chunk_indexes[0]))
+            for name, group in by_document.items()
+        )
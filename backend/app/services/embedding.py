@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-import hashlib
-import random
+import asyncio
+import re
+import zlib
 from typing import List, Protocol, Sequence
 
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
 from langchain_core.embeddings import Embeddings
 
 from ..core.config import Settings
+from .concurrency import SingleFlight, call_async
+from .embedding_cache import CachedEmbeddingProvider, EmbeddingCache, QueryEmbeddingCache, normalize_query
+from .embedding_dispatcher import EmbeddingDispatcher
 
 try:
     from langchain_openai import OpenAIEmbeddings
@@ -27,23 +33,124 @@ class EmbeddingProvider(Protocol):
         ...
 
 
+_NON_WORD = re.compile(r"\W+", re.UNICODE)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_ROLL = np.uint64(1_000_003)
+
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """64-bit finaliser (MurmurHash3 fmix64) so low bits are usable as bucket indices."""
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * _MIX_1
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * _MIX_2
+    return hashes ^ (hashes >> np.uint64(33))
+
+
 class LocalHashEmbeddingProvider:
-    """Deterministic pseudo-embeddings when no API key is available."""
+    """Offline embeddings from feature hashing of word and character n-grams.
+
+    Each text is a signed, log-scaled bag of word unigrams, word bigrams and character 3-5-grams
+    hashed into ``dimension`` buckets and L2-normalised, so texts sharing vocabulary land close
+    together. A whole batch is turned into one float32 matrix with vectorised NumPy operations.
+    """
+
+    CHAR_NGRAMS = (3, 4, 5)
+    WORD_WEIGHT = 1.0
+    BIGRAM_WEIGHT = 0.5
+    CHAR_WEIGHT = 0.25
 
     def __init__(self, dimension: int = 256) -> None:
         self.dimension = dimension
 
     def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
-        return [self._vectorize(text) for text in texts]
+        return self.embed_matrix(texts).tolist()
 
     def embed_query(self, text: str) -> List[float]:
-        return self._vectorize(text)
-
-    def _vectorize(self, text: str) -> List[float]:
-        digest = hashlib.sha256(text.encode("utf-8")).digest()
-        seed = int.from_bytes(digest, "big")
-        rng = random.Random(seed)
-        return [rng.uniform(-1, 1) for _ in range(self.dimension)]
+        return self.embed_matrix([text])[0].tolist()
+
+    def embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an ``(len(texts), dimension)`` float32 matrix of unit-length rows."""
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not len(texts):
+            return matrix
+
+        normalized = [" " + _NON_WORD.sub(" ", text.lower()).strip() + " " for text in texts]
+        rows: list[np.ndarray] = []
+        hashes: list[np.ndarray] = []
+        weights: list[np.ndarray] = []
+
+        for feature_rows, feature_hashes, weight in (
+            *self._word_features(normalized),
+            *self._char_features(normalized),
+        ):
+            rows.append(feature_rows)
+            hashes.append(feature_hashes)
+            weights.append(np.full(len(feature_rows), weight, dtype=np.float32))
+
+        all_rows = np.concatenate(rows)
+        if not len(all_rows):
+            return matrix
+        mixed = _mix(np.concatenate(hashes))
+        buckets = (mixed % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where((mixed >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+
+        flat = np.bincount(
+            all_rows * self.dimension + buckets,
+            weights=np.concatenate(weights) * signs,
+            minlength=len(texts) * self.dimension,
+        )
+        matrix = flat.reshape(len(texts), self.dimension).astype(np.float32)
+        np.copysign(np.log1p(np.abs(matrix)), matrix, out=matrix)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def _word_features(self, normalized: list[str]) -> list[tuple[np.ndarray, np.ndarray, float]]:
+        unigram_rows: list[int] = []
+        unigram_hashes: list[int] = []
+        bigram_rows: list[int] = []
+        bigram_hashes: list[int] = []
+        for row, text in enumerate(normalized):
+            words = text.split()
+            unigram_rows.extend([row] * len(words))
+            unigram_hashes.extend(zlib.crc32(word.encode("utf-8")) for word in words)
+            pairs = [f"{first} {second}" for first, second in zip(words, words[1:])]
+            bigram_rows.extend([row] * len(pairs))
+            bigram_hashes.extend(zlib.crc32(pair.encode("utf-8")) for pair in pairs)
+
+        # Salt the 32-bit CRCs per feature family so unigrams and bigrams use different buckets.
+        return [
+            (np.array(unigram_rows, dtype=np.int64), np.array(unigram_hashes, dtype=np.uint64), self.WORD_WEIGHT),
+            (
+                np.array(bigram_rows, dtype=np.int64),
+                np.array(bigram_hashes, dtype=np.uint64) + np.uint64(1 << 40),
+                self.BIGRAM_WEIGHT,
+            ),
+        ]
+
+    def _char_features(self, normalized: list[str]) -> list[tuple[np.ndarray, np.ndarray, float]]:
+        # All texts are joined with NUL separators and hashed with a vectorised rolling hash;
+        # windows that span a separator are discarded.
+        joined = "\0".join(normalized)
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lengths = np.array([len(text) + 1 for text in normalized], dtype=np.int64)
+        row_of = np.repeat(np.arange(len(normalized), dtype=np.int64), lengths)[: len(codes)]
+        separators = np.concatenate(([0], np.cumsum(codes == 0)))
+
+        features = []
+        for n in self.CHAR_NGRAMS:
+            windows = len(codes) - n + 1
+            if windows <= 0:
+                continue
+            rolled = np.full(windows, np.uint64(n) << np.uint64(48), dtype=np.uint64)
+            for offset in range(n):
+                rolled = rolled * _ROLL + codes[offset : offset + windows]
+            valid = separators[n : n + windows] == separators[:windows]
+            features.append((row_of[:windows][valid], rolled[valid], self.CHAR_WEIGHT))
+        return features
 
 
 class LangChainEmbeddingProvider:
@@ -58,6 +165,13 @@ class LangChainEmbeddingProvider:
     def embed_query(self, text: str) -> List[float]:
         return self.embeddings.embed_query(text)
 
+    async def aembed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        # LangChain models use their SDK's async client where they have one.
+        return await self.embeddings.aembed_documents(list(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
 
 def build_embeddings(settings: Settings) -> EmbeddingProvider:
     provider = (settings.embedding_provider or "auto").lower()
@@ -120,14 +234,116 @@ def _infer_embedding_dimension(settings: Settings, provider: str) -> int:
     return dim_for_model(settings.embedding_model, default=768)
 
 
+def _cache_namespace(provider: EmbeddingProvider, settings: Settings) -> str:
+    if not isinstance(provider, LangChainEmbeddingProvider):
+        return f"{type(provider).__name__}:{getattr(provider, 'dimension', '')}"
+    embeddings = provider.embeddings
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or ""
+    dimension = getattr(embeddings, "dimensions", None) or _infer_embedding_dimension(
+        settings, settings.embedding_provider
+    )
+    return f"{type(embeddings).__name__}:{model}:{dimension}"
+
+
 class EmbeddingService:
     """High-level helper that picks the appropriate provider."""
 
     def __init__(self, settings: Settings) -> None:
-        self.provider: EmbeddingProvider = build_embeddings(settings)
+        provider = build_embeddings(settings)
+        self.cache: EmbeddingCache | None = None
+        self.dispatcher: EmbeddingDispatcher | None = None
+        self.query_cache: QueryEmbeddingCache | None = None
+        self.flights = SingleFlight("query embedding", enabled=settings.single_flight_enabled)
+        self.query_concurrency = max(1, settings.embedding_concurrency)
+        cache_namespace = _cache_namespace(provider, settings)
+        # The resolved provider class, model and dimension, e.g. for "auto".
+        self.namespace = cache_namespace
+        # Local hash embeddings are cheaper to recompute than to batch or look up.
+        remote = isinstance(provider, LangChainEmbeddingProvider)
+        if remote:
+            self.dispatcher = EmbeddingDispatcher(
+                provider,
+                max_batch_tokens=settings.embedding_max_batch_tokens,
+                max_batch_size=settings.embedding_max_batch_size,
+                concurrency=settings.embedding_concurrency,
+                max_retries=settings.embedding_max_retries,
+            )
+            provider = self.dispatcher
+        if settings.embedding_cache_enabled and remote:
+            self.cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                namespace=cache_namespace,
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+            )
+            provider = CachedEmbeddingProvider(provider, self.cache)
+        if settings.query_embedding_cache_size > 0:
+            shared = None
+            if settings.query_embedding_cache_shared:
+                shared = EmbeddingCache(
+                    settings.query_embedding_cache_path,
+                    namespace=f"query:{cache_namespace}",
+                    max_bytes=settings.query_embedding_cache_max_mb * 1024 * 1024,
+                    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+                )
+            self.query_cache = QueryEmbeddingCache(
+                settings.query_embedding_cache_size,
+                ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+                namespace=cache_namespace,
+                shared=shared,
+            )
+        self.provider: EmbeddingProvider = provider
 
     def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
         return self.provider.embed_documents(texts)
 
     def embed_query(self, text: str) -> List[float]:
-        return self.provider.embed_query(text)
+        if self.query_cache is None:
+            return self.provider.embed_query(text)
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = self.provider.embed_query(text)
+            self.query_cache.put(text, vector)
+        return vector
+
+    async def aembed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return await call_async(self.provider, "embed_documents", texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Keyed like the query cache, so concurrent misses for the same question embed it once.
+        return await self.flights.do(normalize_query(text), lambda: self._aembed_query(text))
+
+    async def _aembed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return await call_async(self.provider, "embed_query", text)
+        # Only the shared cache touches disk; the in-process LRU is cheap enough to call inline.
+        shared = self.query_cache.shared is not None
+        vector = await run_in_threadpool(self.query_cache.get, text) if shared else self.query_cache.get(text)
+        if vector is None:
+            vector = await call_async(self.provider, "embed_query", text)
+            if shared:
+                await run_in_threadpool(self.query_cache.put, text, vector)
+            else:
+                self.query_cache.put(text, vector)
+        return vector
+
+    async def aembed_queries(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed many questions concurrently, ``EMBEDDING_CONCURRENCY`` at a time.
+
+        Each goes through ``aembed_query``, and so through the query cache. Questions are
+        embedded query-typed: providers such as Gemini embed documents differently.
+        """
+        slots = asyncio.Semaphore(self.query_concurrency)
+
+        async def embed(text: str) -> List[float]:
+            async with slots:
+                return await self.aembed_query(text)
+
+        return list(await asyncio.gather(*(embed(text) for text in texts)))
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            "document_cache": self.cache.stats() if self.cache else {"enabled": False},
+            "dispatcher": self.dispatcher.stats() if self.dispatcher else {"enabled": False},
+            "query_cache": self.query_cache.stats() if self.query_cache else {"enabled": False},
+            "single_flight": self.flights.stats(),
+        }
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+
+from .concurrency import call_async
+
+if TYPE_CHECKING:
+    from .embedding import EmbeddingProvider
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Disk-backed LRU cache of embedding vectors, stored as packed float32 blobs in SQLite.
+
+    Keys are a SHA-256 of ``namespace`` (provider/model/dimension) plus the text, so switching
+    models never serves stale vectors. The file can be shared by several worker processes.
+    With ``ttl_seconds``, entries not used for that long are treated as misses.
+    """
+
+    def __init__(self, path: str | Path, namespace: str, max_bytes: int, ttl_seconds: float | None = None) -> None:
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> list[List[float] | None]:
+        keys = [self._key(text) for text in texts]
+        found: dict[str, bytes] = {}
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND last_used >= ?",
+                    [*batch, oldest],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return [_unpack(found[key]) if key in found else None for key in keys]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = _pack(vector)
+            rows.append((self._key(text), blob, len(blob), now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._total_bytes += sum(row[2] for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used vectors until the cache is at 90% of its size cap."""
+        # Other processes may have written to the same file; recount before evicting.
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used LIMIT 1000").fetchall()
+            if not rows:
+                break
+            freed = 0
+            evicted = []
+            for key, size in rows:
+                evicted.append((key,))
+                freed += size
+                if self._total_bytes - freed <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self._conn.commit()
+            self._total_bytes -= freed
+            self.evictions += len(evicted)
+
+    def stats(self) -> dict[str, float | int | str]:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class CachedEmbeddingProvider:
+    """EmbeddingProvider that only sends cache misses to the wrapped provider."""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache) -> None:
+        self.provider = provider
+        self.cache = cache
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.provider.embed_documents([texts[index] for index in missing])
+            self.cache.put_many([texts[index] for index in missing], fresh)
+            for index, vector in zip(missing, fresh):
+                vectors[index] = vector
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.provider.embed_query(text)
+
+    async def aembed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = await run_in_threadpool(self.cache.get_many, texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = await call_async(self.provider, "embed_documents", [texts[index] for index in missing])
+            await run_in_threadpool(self.cache.put_many, [texts[index] for index in missing], fresh)
+            for index, vector in zip(missing, fresh):
+                vectors[index] = vector
+        return vectors  # type: ignore[return-value]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await call_async(self.provider, "embed_query", text)
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Fold case, Unicode forms and whitespace so trivially different questions share an entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+class QueryEmbeddingCache:
+    """In-process LRU of query embeddings with a per-entry TTL.
+
+    Keys are the normalised question text. When ``shared`` is given, misses fall through to
+    that on-disk cache so API workers on the same host reuse each other's query embeddings.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        namespace: str,
+        shared: EmbeddingCache | None = None,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, List[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> List[float] | None:
+        key = normalize_query(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        vector = self.shared.get_many([key])[0] if self.shared else None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._remember(key, vector)
+        return vector
+
+    def put(self, text: str, vector: List[float]) -> None:
+        key = normalize_query(text)
+        self._remember(key, vector)
+        if self.shared:
+            self.shared.put_many([key], [vector])
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, float | int | str]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "shared": self.shared is not None,
+        }
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Sequence
+
+from .concurrency import call_async
+
+if TYPE_CHECKING:
+    from .embedding import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+MIN_BATCH_TOKENS = 256
+
+
+class RateLimitError(Exception):
+    """Raised when an embedding provider throttles requests (HTTP 429)."""
+
+    def __init__(self, message: str = "Rate limited", retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Recognise throttling errors from the OpenAI, Google and Anthropic SDKs without importing them."""
+    if isinstance(exc, RateLimitError):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None) or getattr(exc, "code", None)
+    if status == 429:
+        return True
+    name = type(exc).__name__.lower()
+    return "ratelimit" in name or "resourceexhausted" in name
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    if isinstance(exc, RateLimitError):
+        return exc.retry_after
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingDispatcher:
+    """EmbeddingProvider that splits work into token-bounded batches and embeds them concurrently.
+
+    When the provider rate-limits, every batch pauses for an exponential backoff (or the
+    server's ``Retry-After``), the batch token limit is halved, and the failing batch is split
+    before it is retried. The limit grows back gradually after successful calls. Results are
+    always returned in input order.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        max_batch_tokens: int = 8000,
+        max_batch_size: int = 128,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ) -> None:
+        self.provider = provider
+        self.max_batch_tokens = max(MIN_BATCH_TOKENS, max_batch_tokens)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.token_counter = token_counter
+
+        self.batch_token_limit = self.max_batch_tokens
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="embed")
+        self._async_slots = asyncio.Semaphore(max(1, concurrency))
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        batches = self._make_batches(list(texts))
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        futures = [self._executor.submit(self._embed_batch, batch) for batch in batches]
+        vectors: List[List[float]] = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_backoff(lambda: self.provider.embed_query(text))
+
+    async def aembed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        """Async ``embed_documents``: batches run as concurrent coroutines, ``concurrency`` at a time."""
+        if not texts:
+            return []
+        batches = self._make_batches(list(texts))
+        results = await asyncio.gather(*(self._aembed_batch(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall_with_backoff(lambda: call_async(self.provider, "embed_query", text))
+
+    def _make_batches(self, texts: List[str]) -> list[list[str]]:
+        limit = self.batch_token_limit
+        batches: list[list[str]] = []
+        current: list[str] = []
+        current_tokens = 0
+        for text in texts:
+            tokens = self.token_counter(text)
+            if current and (current_tokens + tokens > limit or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts: list[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._wait_if_paused()
+            try:
+                vectors = self.provider.embed_documents(texts)
+            except Exception as exc:
+                if not is_rate_limit_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._register_rate_limit(exc, attempt)
+                # Retry smaller pieces when the shrunken limit no longer fits this batch.
+                if len(texts) > 1 and sum(map(self.token_counter, texts)) > self.batch_token_limit:
+                    middle = len(texts) // 2
+                    return self._embed_batch(texts[:middle]) + self._embed_batch(texts[middle:])
+                continue
+
+            self._register_success()
+            return vectors
+
+    def _call_with_backoff(self, call: Callable[[], List[float]]) -> List[float]:
+        attempt = 0
+        while True:
+            self._wait_if_paused()
+            try:
+                return call()
+            except Exception as exc:
+                if not is_rate_limit_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._register_rate_limit(exc, attempt)
+
+    async def _aembed_batch(self, texts: list[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            await self._await_if_paused()
+            try:
+                async with self._async_slots:
+                    vectors = await call_async(self.provider, "embed_documents", texts)
+            except Exception as exc:
+                if not is_rate_limit_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._register_rate_limit(exc, attempt)
+                if len(texts) > 1 and sum(map(self.token_counter, texts)) > self.batch_token_limit:
+                    middle = len(texts) // 2
+                    halves = await asyncio.gather(self._aembed_batch(texts[:middle]), self._aembed_batch(texts[middle:]))
+                    return halves[0] + halves[1]
+                continue
+
+            self._register_success()
+            return vectors
+
+    async def _acall_with_backoff(self, call: Callable[[], Awaitable[List[float]]]) -> List[float]:
+        attempt = 0
+        while True:
+            await self._await_if_paused()
+            try:
+                return await call()
+            except Exception as exc:
+                if not is_rate_limit_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._register_rate_limit(exc, attempt)
+
+    def _register_rate_limit(self, exc: BaseException, attempt: int) -> None:
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** (attempt - 1))
+            delay *= random.uniform(0.5, 1.0)
+        with self._lock:
+            self.rate_limited += 1
+            self.batch_token_limit = max(MIN_BATCH_TOKENS, self.batch_token_limit // 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(
+            "Embedding provider rate-limited (attempt %d); backing off %.1fs, batch limit %d tokens",
+            attempt,
+            delay,
+            self.batch_token_limit,
+        )
+
+    def _register_success(self) -> None:
+        with self._lock:
+            if self.batch_token_limit < self.max_batch_tokens:
+                self.batch_token_limit = min(self.max_batch_tokens, int(self.batch_token_limit * 1.25) + 1)
+
+    def _wait_if_paused(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def _await_if_paused(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, int]:
+        return {"rate_limited": self.rate_limited, "batch_token_limit": self.batch_token_limit}
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-import shutil
+import codecs
+import hashlib
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Any
@@ -9,35 +12,135 @@ from uuid import uuid4
 from fastapi import UploadFile
 from fastapi.concurrency import run_in_threadpool
 
+COPY_BUFFER_SIZE = 1024 * 1024
+SNIFF_SIZE = 8 * 1024
+
+# Detected type -> (stored suffix, content type).
+DETECTED_TYPES = {
+    "pdf": (".pdf", "application/pdf"),
+    "text": (".txt", "text/plain"),
+}
+
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload exceeds a size limit or its content is not a supported type."""
+
+
+class UploadBudget:
+    """Byte allowance shared by all files of one upload request."""
+
+    def __init__(self, max_bytes: int | None) -> None:
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        with self._lock:
+            self.used += size
+            if self.max_bytes is not None and self.used > self.max_bytes:
+                raise UploadRejectedError(f"Upload request exceeds the {_format_mb(self.max_bytes)} limit")
+
+
+def sniff_type(head: bytes) -> str | None:
+    """Classify content by its leading bytes: ``"pdf"``, ``"text"`` (UTF-8 without NULs) or None."""
+    if head.lstrip(b"\r\n\t ")[:5] == b"%PDF-":
+        return "pdf"
+    if b"\x00" in head:
+        return None
+    try:
+        # A multi-byte character may be cut off at the end of the sniffed block.
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return None
+    return "text"
+
+
+def _format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):g} MB"
+
 
 class FileStorageService:
-    """Persist uploaded files to disk and return metadata."""
+    """Persist uploaded files to disk and return metadata.
+
+    Files are content-addressed: they are stored as ``<sha256[:2]>/<sha256><suffix>`` so identical
+    uploads share one copy on disk and can be matched against existing documents by hash. The
+    suffix and content type come from the file's magic bytes, not from what the client claimed.
+    """
 
-    def __init__(self, base_directory: str | Path) -> None:
+    def __init__(self, base_directory: str | Path, max_file_bytes: int | None = None) -> None:
         base_path = Path(base_directory).expanduser()
         base_path.mkdir(parents=True, exist_ok=True)
         self.base_directory = base_path.resolve()
+        self.temp_directory = self.base_directory / ".incoming"
+        self.temp_directory.mkdir(exist_ok=True)
+        self.max_file_bytes = max_file_bytes
 
-    async def save_upload(self, upload: UploadFile) -> dict[str, Any]:
+    async def save_upload(self, upload: UploadFile, budget: UploadBudget | None = None) -> dict[str, Any]:
         safe_name = Path(upload.filename or "upload").name.replace(" ", "_")
-        stored_name = f"{uuid4().hex}_{safe_name}"
-        destination = self.base_directory / stored_name
+        # The declared size is known once the multipart body is parsed; reject early when possible.
+        if self.max_file_bytes is not None and (upload.size or 0) > self.max_file_bytes:
+            raise UploadRejectedError(f"{safe_name} exceeds the {_format_mb(self.max_file_bytes)} file limit")
 
+        temp_path = self.temp_directory / uuid4().hex
         await upload.seek(0)
-        size_bytes = await run_in_threadpool(self._copy_to_disk, upload, destination)
+        try:
+            size_bytes, sha256, detected = await run_in_threadpool(
+                self._copy_to_disk, upload, temp_path, safe_name, budget
+            )
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        suffix, content_type = DETECTED_TYPES[detected]
+        destination = self.base_directory / sha256[:2] / f"{sha256}{suffix}"
+        await run_in_threadpool(self._commit_file, temp_path, destination)
 
         return {
-            "original_name": upload.filename or stored_name,
-            "stored_name": stored_name,
-            "content_type": upload.content_type or "application/octet-stream",
+            "original_name": upload.filename or safe_name,
+            "stored_name": destination.name,
+            "content_type": content_type,
+            "detected_type": detected,
             "size_bytes": size_bytes,
+            "sha256": sha256,
             "storage_path": str(destination),
             "uploaded_at": datetime.utcnow(),
         }
 
-    @staticmethod
-    def _copy_to_disk(upload: UploadFile, destination: Path) -> int:
+    def _copy_to_disk(
+        self, upload: UploadFile, destination: Path, name: str, budget: UploadBudget | None
+    ) -> tuple[int, str, str]:
+        """Copy the upload to ``destination`` in one pass, hashing, sizing and sniffing it on the way.
+
+        The copy stops as soon as the file or request limit is exceeded.
+        """
         upload.file.seek(0)
+        digest = hashlib.sha256()
+        size_bytes = 0
+        detected: str | None = None
         with destination.open("wb") as out_file:
-            shutil.copyfileobj(upload.file, out_file)
-        return destination.stat().st_size
+            while block := upload.file.read(COPY_BUFFER_SIZE):
+                if detected is None:
+                    detected = sniff_type(block[:SNIFF_SIZE])
+                    if detected is None:
+                        raise UploadRejectedError(f"{name} is not a PDF or UTF-8 text file")
+
+                size_bytes += len(block)
+                if self.max_file_bytes is not None and size_bytes > self.max_file_bytes:
+                    raise UploadRejectedError(f"{name} exceeds the {_format_mb(self.max_file_bytes)} file limit")
+                if budget is not None:
+                    budget.consume(len(block))
+
+                digest.update(block)
+                out_file.write(block)
+
+        if detected is None:
+            raise UploadRejectedError(f"{name} is empty")
+        return size_bytes, digest.hexdigest(), detected
+
+    @staticmethod
+    def _commit_file(temp_path: Path, destination: Path) -> None:
+        if destination.exists():
+            temp_path.unlink(missing_ok=True)
+            return
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, destination)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from ..core.config import Settings, get_settings
+from ..db.session import SessionLocal
+from ..models.document import Document, DocumentStatus
+from .rag import RAGService, build_rag_service
+from .text_processing import ExtractionInterruptedError
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS_STATUSES = (DocumentStatus.EXTRACTING.value, DocumentStatus.EMBEDDING.value)
+
+
+class IngestionQueue:
+    """Bounded worker pool that drains queued documents from the database.
+
+    The ``documents`` table is the queue: jobs survive restarts, several processes can share
+    it (claims are a conditional UPDATE), and in-flight jobs keep a heartbeat on
+    ``updated_at`` so jobs orphaned by a crashed process are requeued, or failed once they
+    have used up ``INGESTION_MAX_ATTEMPTS``. All database work runs in worker threads, since
+    inline workers share the API's event loop.
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        settings: Settings,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.rag_service = rag_service
+        self.session_factory = session_factory
+        self.workers = max(1, settings.ingestion_workers)
+        self.poll_interval = settings.ingestion_poll_interval_seconds
+        self.max_attempts = max(1, settings.ingestion_max_attempts)
+        self.stale_after = timedelta(seconds=settings.ingestion_stale_after_seconds)
+
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight: set[str] = set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info("Started %d ingestion worker(s)", self.workers)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        await self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    def notify(self) -> None:
+        """Wake idle workers after new documents were queued in this process."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                document_id = await run_in_threadpool(self._claim_next, list(self._in_flight))
+            except Exception:  # pragma: no cover - database hiccups should not kill the worker
+                logger.exception("Ingestion worker %d failed to claim a job", index)
+                document_id = None
+
+            if document_id is None:
+                await self._wait_for_work()
+                continue
+
+            self._in_flight.add(document_id)
+            await self._run_job(document_id)
+
+    async def _wait_for_work(self) -> None:
+        assert self._wakeup is not None
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _claim_next(self, in_flight: Sequence[str]) -> str | None:
+        """Claim the oldest queued document; ``in_flight`` are this process's running jobs."""
+        with self.session_factory() as db:
+            self._requeue_stale(db, in_flight)
+
+            candidates = (
+                db.query(Document.id)
+                .filter(Document.status == DocumentStatus.QUEUED.value)
+                .order_by(Document.created_at)
+                .limit(self.workers * 2)
+                .all()
+            )
+            for (document_id,) in candidates:
+                claimed = (
+                    db.query(Document)
+                    .filter(Document.id == document_id, Document.status == DocumentStatus.QUEUED.value)
+                    .update(
+                        {
+                            Document.status: DocumentStatus.EXTRACTING.value,
+                            Document.progress: 0,
+                            Document.attempts: Document.attempts + 1,
+                            Document.updated_at: func.now(),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return document_id
+        return None
+
+    def _requeue_stale(self, db: Session, in_flight: Sequence[str]) -> None:
+        cutoff = datetime.now(timezone.utc) - self.stale_after
+        stale = db.query(Document).filter(
+            Document.status.in_(IN_PROGRESS_STATUSES),
+            or_(Document.updated_at.is_(None), Document.updated_at < cutoff),
+        )
+        if in_flight:
+            stale = stale.filter(Document.id.notin_(list(in_flight)))
+        # A document that keeps killing its worker (e.g. a PDF exhausting memory) must not loop forever.
+        exhausted = [row.id for row in stale.filter(Document.attempts >= self.max_attempts).with_entities(Document.id)]
+        failed = 0
+        if exhausted:
+            failed = stale.filter(Document.id.in_(exhausted)).update(
+                {
+                    Document.status: DocumentStatus.FAILED.value,
+                    Document.error: f"Ingestion was interrupted {self.max_attempts} time(s); giving up.",
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            for document in db.query(Document).filter(
+                Document.id.in_(exhausted), Document.status == DocumentStatus.FAILED.value
+            ):
+                self._discard_index(db, document)
+        requeued = stale.filter(Document.attempts < self.max_attempts).update(
+            {
+                Document.status: DocumentStatus.QUEUED.value,
+                Document.error: "Ingestion was interrupted; retrying.",
+            },
+            synchronize_session=False,
+        )
+        if failed:
+            logger.warning("Failed %d ingestion job(s) interrupted too often", failed)
+        if requeued:
+            logger.warning("Requeued %d interrupted ingestion job(s)", requeued)
+        db.commit()
+
+    async def _run_job(self, document_id: str) -> None:
+        try:
+            with self.session_factory() as db:
+                # Attributes stay loaded across commits, so reading them never queries from the event loop.
+                db.expire_on_commit = False
+                try:
+                    await self.rag_service.process_document(db, document_id)
+                except Exception as exc:
+                    logger.exception("Ingestion failed for document %s", document_id)
+                    await run_in_threadpool(self._record_failure, db, document_id, exc)
+        finally:
+            self._in_flight.discard(document_id)
+
+    def _record_failure(self, db: Session, document_id: str, exc: Exception) -> None:
+        db.rollback()
+        document = db.get(Document, document_id)
+        if not document:
+            return
+
+        # The batches stored before the failure are searchable; a retry starts over anyway.
+        self._discard_index(db, document)
+        if isinstance(exc, ExtractionInterruptedError):
+            # Another document's timeout killed the shared PDF pool; this attempt does not count.
+            document.attempts = max(0, document.attempts - 1)
+        if document.attempts >= self.max_attempts:
+            document.status = DocumentStatus.FAILED.value
+        else:
+            document.status = DocumentStatus.QUEUED.value
+        document.error = str(exc) or exc.__class__.__name__
+        db.commit()
+
+    async def _heartbeat(self) -> None:
+        interval = max(1.0, self.stale_after.total_seconds() / 4)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._in_flight:
+                continue
+            try:
+                await run_in_threadpool(self._touch, list(self._in_flight))
+            except Exception:  # pragma: no cover - a missed heartbeat is retried next tick
+                logger.exception("Failed to record ingestion heartbeat")
+
+    def _discard_index(self, db: Session, document: Document) -> None:
+        try:
+            self.rag_service.discard_index(db, document)
+        except Exception:  # pragma: no cover - the status must still be recorded
+            logger.exception("Failed to discard the partial index of document %s", document.id)
+
+    def _touch(self, document_ids: Sequence[str]) -> None:
+        with self.session_factory() as db:
+            db.query(Document).filter(Document.id.in_(list(document_ids))).update(
+                {Document.updated_at: func.now()}, synchronize_session=False
+            )
+            db.commit()
+
+
+@lru_cache
+def build_ingestion_queue() -> IngestionQueue:
+    """Process-wide ingestion queue bound to the shared RAG service."""
+    return IngestionQueue(build_rag_service(), get_settings())
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+from ..models.document import Document, DocumentChunk
+from .chunk_writer import ChunkRecord
+from .vector_store import SourceChunk
+
+# Hyphens and underscores are part of a term so identifiers such as ``ERR-1042`` or
+# ``part_no`` match as a whole.
+_TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '-_'"
+_TERM_PATTERN = re.compile(r"[\w][\w\-]*")
+MAX_QUERY_TERMS = 32
+
+
+def build_match_query(text: str) -> str:
+    """Turn free text into an FTS5 query that ORs its quoted terms (BM25 ranks the matches)."""
+    terms: list[str] = []
+    for term in _TERM_PATTERN.findall(text.lower()):
+        term = term.strip("-")
+        if term and term not in terms:
+            terms.append(term)
+    return " OR ".join(f'"{term}"' for term in terms[:MAX_QUERY_TERMS])
+
+
+class LexicalIndexService:
+    """BM25 keyword index over chunk text, one SQLite FTS5 file per user.
+
+    It complements dense retrieval for exact identifiers, error codes and rare terms.
+    Connections are opened per call, so the service can be used from any thread or process.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, user_id: str) -> Path:
+        return self.directory / f"{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]}.sqlite3"
+
+    def _connect(self, user_id: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self._path(user_id)), timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "content, chunk_id UNINDEXED, document_id UNINDEXED, document_name UNINDEXED, chunk_index UNINDEXED, "
+            f'tokenize="{_TOKENIZER}")'
+        )
+        return connection
+
+    def add_document_chunks(
+        self, document: Document, chunks: Sequence[DocumentChunk | ChunkRecord], user_id: str
+    ) -> None:
+        if not chunks:
+            return
+        with closing(self._connect(user_id)) as connection, connection:
+            self._insert(connection, document, chunks)
+
+    def replace_document_chunks(
+        self, document: Document, chunks: Sequence[DocumentChunk | ChunkRecord], user_id: str
+    ) -> None:
+        """Swap all indexed chunks of a document in one transaction."""
+        with closing(self._connect(user_id)) as connection, connection:
+            connection.execute("DELETE FROM chunks WHERE document_id = ?", (document.id,))
+            self._insert(connection, document, chunks)
+
+    def delete_document(self, document_id: str, user_id: str) -> None:
+        if not self._path(user_id).exists():
+            return
+        with closing(self._connect(user_id)) as connection, connection:
+            connection.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+
+    def query(self, user_id: str, text: str, limit: int = 4) -> List[SourceChunk]:
+        match = build_match_query(text)
+        if not match or not self._path(user_id).exists():
+            return []
+
+        with closing(self._connect(user_id)) as connection:
+            rows = connection.execute(
+                "SELECT chunk_id, document_id, document_name, chunk_index, content, bm25(chunks) AS rank "
+                "FROM chunks WHERE chunks MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+
+        # FTS5's bm25() is negative with better matches lower; flip it so higher is better.
+        return [
+            SourceChunk(
+                chunk_id=chunk_id,
+                document_id=document_id,
+                document_name=document_name,
+                chunk_index=int(chunk_index),
+                content=content,
+                score=-rank,
+                score_kind="bm25",
+            )
+            for chunk_id, document_id, document_name, chunk_index, content, rank in rows
+        ]
+
+    @staticmethod
+    def _insert(
+        connection: sqlite3.Connection, document: Document, chunks: Iterable[DocumentChunk | ChunkRecord]
+    ) -> None:
+        connection.executemany(
+            "INSERT INTO chunks (content, chunk_id, document_id, document_name, chunk_index) VALUES (?, ?, ?, ?, ?)",
+            [(chunk.content, chunk.id, document.id, document.filename, chunk.chunk_index) for chunk in chunks],
+        )
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from typing import Any, Literal
+import asyncio
+import re
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Literal
 from textwrap import dedent
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
 
 from ..core.config import Settings
+from .concurrency import SingleFlight
+from .embedding_cache import normalize_query
 
 try:
     from langchain_openai import ChatOpenAI
@@ -26,13 +31,25 @@ except ImportError:  # pragma: no cover
 
 ProviderName = Literal["openai", "gemini", "anthropic", "local"]
 
+# Words with their trailing whitespace, used to replay the local answer as a stream.
+_STREAM_PIECE_PATTERN = re.compile(r"\S+\s*|\s+")
+
 
 class LLMService:
     """Generate answers using an injected LangChain chat model."""
 
-    def __init__(self, llm: BaseChatModel | None, provider_name: ProviderName = "local") -> None:
+    def __init__(
+        self,
+        llm: BaseChatModel | None,
+        provider_name: ProviderName = "local",
+        model_name: str = "local",
+        coalesce: bool = True,
+    ) -> None:
         self.llm = llm
         self.provider_name = provider_name
+        self.model_name = model_name
+        # The output depends only on the prompt, so identical prompts can share a call across users.
+        self.flights = SingleFlight("generation", enabled=coalesce)
 
         self.answer_prompt = ChatPromptTemplate.from_messages(
             [
@@ -51,7 +68,7 @@ class LLMService:
                         - don't mention 'context' or 'files' unless necessary.
                         - If you add anything beyond the files, briefly note that this part is not covered in them.
 
-                        Info:
+                        {history}Info:
                         {context}
 
                         Question:
@@ -76,22 +93,103 @@ class LLMService:
                 ),
             ]
         )
+        self.condense_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", "You rewrite follow-up questions so they can be understood without the conversation."),
+                (
+                    "human",
+                    dedent(
+                        """
+                        Rewrite the follow-up question as one standalone question, resolving references such as "it" or "that one" from the conversation. Reply with the question only; if it already stands alone, repeat it unchanged.
+
+                        Conversation:
+                        {history}
+
+                        Follow-up question:
+                        {question}
+                        """
+                    ).strip(),
+                ),
+            ]
+        )
+        self.summary_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", "You keep running summaries of conversations."),
+                (
+                    "human",
+                    dedent(
+                        """
+                        Extend the summary with the new turns. Keep facts, names, numbers and open questions the user may refer back to; drop pleasantries. Stay under {max_words} words and reply with the summary only.
+
+                        Summary so far:
+                        {summary}
+
+                        New turns:
+                        {transcript}
+                        """
+                    ).strip(),
+                ),
+            ]
+        )
 
-    def generate_answer(self, question: str, context: str) -> str:
+    def generate_answer(self, question: str, context: str, history: str = "") -> str:
         if not self.llm:
-            return dedent(
-                f"""
-                No live LLM credentials were detected, so this answer is generated locally.
+            return self._local_answer(question, context)
 
-                Question: {question}
+        prompt_value = self._answer_prompt_value(question, context, history)
+        return self._answer_or_notice(self.llm.invoke(prompt_value.to_messages()))
 
-                Context excerpts:
-                {context}
-                """
-            ).strip()
+    async def agenerate_answer(self, question: str, context: str, history: str = "") -> str:
+        """Async ``generate_answer`` using the model's ``ainvoke`` (native async for the bundled providers)."""
+        if not self.llm:
+            return self._local_answer(question, context)
 
-        prompt_value = self.answer_prompt.format_prompt(context=context, question=question)
-        response = self._extract_content(self.llm.invoke(prompt_value.to_messages()))
+        key = ("answer", normalize_query(question), context, history)
+        return await self.flights.do(key, lambda: self._agenerate_answer(question, context, history))
+
+    async def _agenerate_answer(self, question: str, context: str, history: str) -> str:
+        prompt_value = self._answer_prompt_value(question, context, history)
+        return self._answer_or_notice(await self.llm.ainvoke(prompt_value.to_messages()))
+
+    def _answer_prompt_value(self, question: str, context: str, history: str) -> Any:
+        # Without history the prompt is exactly the single-turn one.
+        history_block = f"Conversation so far:\n{history}\n\n" if history else ""
+        return self.answer_prompt.format_prompt(context=context, question=question, history=history_block)
+
+    async def acondense_question(self, question: str, history: str) -> str:
+        """Rewrite a follow-up into a standalone question for retrieval; unchanged without a model or history."""
+        if not self.llm or not history:
+            return question
+
+        prompt_value = self.condense_prompt.format_prompt(history=history, question=question)
+        return self._extract_content(await self.llm.ainvoke(prompt_value.to_messages())) or question
+
+    async def asummarize_history(self, summary: str, transcript: str, max_words: int) -> str:
+        """Fold ``transcript`` into ``summary``. Without a model the texts are concatenated and the
+        caller keeps only what fits its budget."""
+        if not self.llm:
+            return f"{summary}\n{transcript}".strip()
+
+        prompt_value = self.summary_prompt.format_prompt(
+            summary=summary or "(none)", transcript=transcript, max_words=max_words
+        )
+        return self._extract_content(await self.llm.ainvoke(prompt_value.to_messages())) or summary
+
+    @staticmethod
+    def _local_answer(question: str, context: str) -> str:
+        return dedent(
+            f"""
+            No live LLM credentials were detected, so this answer is generated locally.
+
+            Question: {question}
+
+            Context excerpts:
+            {context}
+            """
+        ).strip()
+
+    def _answer_or_notice(self, message: Any) -> str:
+        response = self._extract_content(message)
         if response:
             return response
 
@@ -101,6 +199,30 @@ class LLMService:
             """
         ).strip()
 
+    async def astream_answer(self, question: str, context: str, history: str = "") -> AsyncIterator[str]:
+        """Yield the answer in fragments as the model produces them.
+
+        Without a configured model the local answer is replayed word by word, so clients handle
+        both cases the same way.
+        """
+        if not self.llm:
+            for piece in _STREAM_PIECE_PATTERN.findall(self._local_answer(question, context)):
+                yield piece
+                await asyncio.sleep(0)
+            return
+
+        prompt_value = self._answer_prompt_value(question, context, history)
+        produced = False
+        # Closing explicitly aborts the upstream request as soon as the consumer stops.
+        async with aclosing(self.llm.astream(prompt_value.to_messages())) as chunks:
+            async for chunk in chunks:
+                text = self._chunk_text(chunk)
+                if text:
+                    produced = True
+                    yield text
+        if not produced:
+            yield f"The configured LLM provider ({self.provider_name}) did not return content."
+
     def generate_title(self, context: str) -> str:
         if not self.llm:
             return "Chat session"
@@ -112,6 +234,29 @@ class LLMService:
 
         return "Chat session"
 
+    async def agenerate_title(self, context: str) -> str:
+        if not self.llm:
+            return "Chat session"
+
+        return await self.flights.do(("title", context.strip()), lambda: self._agenerate_title(context))
+
+    async def _agenerate_title(self, context: str) -> str:
+        prompt_value = self.title_prompt.format_prompt(context=context)
+        return self._extract_content(await self.llm.ainvoke(prompt_value.to_messages())) or "Chat session"
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        """Text of one streamed message chunk; whitespace is kept since it separates fragments."""
+        content = getattr(chunk, "content", None)
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                item if isinstance(item, str) else str(item.get("text", "")) if isinstance(item, dict) else ""
+                for item in content
+            )
+        return ""
+
     @staticmethod
     def _extract_content(message: Any) -> str:
         """Return concatenated text content from LangChain chat responses."""
@@ -200,4 +345,14 @@ def _build_anthropic_llm(settings: Settings) -> BaseChatModel | None:
 
 def build_llm_service(settings: Settings) -> LLMService:
     llm, provider_name = build_llm(settings)
-    return LLMService(llm=llm, provider_name=provider_name)
+    model_names = {
+        "openai": settings.chat_model,
+        "gemini": settings.gemini_chat_model,
+        "anthropic": settings.anthropic_chat_model,
+    }
+    return LLMService(
+        llm=llm,
+        provider_name=provider_name,
+        model_name=model_names.get(provider_name, "local"),
+        coalesce=settings.single_flight_enabled,
+    )
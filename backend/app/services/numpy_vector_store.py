@@ -0,0 +1,532 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+from ..models.document import Document
+from .quantization import TRAIN_SAMPLE_ROWS, Quantizer, build_quantizer
+from .vector_store import ChunkLike, SourceChunk, VectorStoreService, namespace_suffix
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_MIN_ROWS = 1024
+COMPACTION_COPY_ROWS = 4096
+SQLITE_BATCH = 500
+# Below this many rows exact search is cheap and too little data exists to train a quantizer.
+QUANTIZATION_MIN_ROWS = 1024
+
+
+@dataclass
+class _UserMatrix:
+    """Read-side snapshot of one user's index, valid while ``version`` is current."""
+
+    version: int
+    matrix: np.ndarray
+    live: np.ndarray
+    chunk_ids: np.ndarray
+    live_count: int
+    codes: np.ndarray | None = None
+    quantizer: Quantizer | None = None
+
+
+class NumpyVectorStore(VectorStoreService):
+    """Exact nearest-neighbour search over per-user float32 matrices in memory-mapped files.
+
+    Each user's vectors are L2-normalised and appended as rows to ``<user>-<generation>.f32``.
+    Chunk metadata and the row each chunk occupies live in one SQLite file. A query is a single
+    matrix-vector product plus ``argpartition``. Deleting only removes the metadata row and
+    leaves a tombstone in the matrix. Once tombstones exceed ``compaction_threshold`` of the
+    rows, the live rows are copied to the next generation's file. The swap is one metadata
+    commit, so readers holding the old mapping are never affected.
+
+    With ``quantization`` set to ``int8`` or ``pq``, compact codes of every row are kept in a
+    side file (``<user>-<generation>.<codec>``). Queries scan the codes to pick
+    ``rerank_candidates`` rows, then rescore only those against the float32 matrix. The float32
+    rows stay on disk for that rerank and are paged in on demand. Matrices smaller than
+    ``QUANTIZATION_MIN_ROWS`` rows are searched exactly.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        compaction_threshold: float = 0.3,
+        quantization: str = "none",
+        rerank_candidates: int = 100,
+        pq_subvectors: int = 64,
+        namespace: str = "",
+    ) -> None:
+        build_quantizer(quantization, 1)  # reject unknown codecs up front
+        self.directory = self._namespace_directory(Path(directory).expanduser(), namespace)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.metadata_path = self.directory / "index.sqlite3"
+        self.compaction_threshold = compaction_threshold
+        self.quantization = quantization
+        self.rerank_candidates = rerank_candidates
+        self.pq_subvectors = pq_subvectors
+        self._cache: dict[str, _UserMatrix] = {}
+        self._thread_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, dimension INTEGER NOT NULL, rows INTEGER NOT NULL DEFAULT 0, "
+                "dead INTEGER NOT NULL DEFAULT 0, generation INTEGER NOT NULL DEFAULT 0, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "chunk_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, row INTEGER NOT NULL, document_id TEXT NOT NULL, "
+                "document_name TEXT, chunk_index INTEGER, content TEXT, staged INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_chunks_user_row ON chunks (user_id, row)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_chunks_document ON chunks (document_id)")
+            columns = {column[1] for column in connection.execute("PRAGMA table_info(users)")}
+            if "coded" not in columns:
+                # Rows [0, coded) have codes of the ``codec`` quantizer in the side file.
+                connection.execute("ALTER TABLE users ADD COLUMN coded INTEGER NOT NULL DEFAULT 0")
+                connection.execute("ALTER TABLE users ADD COLUMN codec TEXT")
+
+    @staticmethod
+    def _namespace_directory(directory: Path, namespace: str) -> Path:
+        """``directory`` for the namespace that first used it, a subdirectory for any other."""
+        if not namespace:
+            return directory
+        directory.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(str(directory / "index.sqlite3"), timeout=30)) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('namespace', ?)", (namespace,))
+            (owner,) = connection.execute("SELECT value FROM meta WHERE key = 'namespace'").fetchone()
+        return directory if owner == namespace else directory / namespace_suffix(namespace).lstrip("_")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.metadata_path), timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _user_prefix(self, user_id: str) -> str:
+        return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+
+    def _matrix_path(self, user_id: str, generation: int) -> Path:
+        return self.directory / f"{self._user_prefix(user_id)}-{generation}.f32"
+
+    def _codes_path(self, user_id: str, generation: int) -> Path:
+        return self.directory / f"{self._user_prefix(user_id)}-{generation}.{self.quantization}"
+
+    def _quantizer_path(self, user_id: str, generation: int) -> Path:
+        return self.directory / f"{self._user_prefix(user_id)}-{generation}.{self.quantization}.npz"
+
+    def _quantizer(self, user_id: str, dimension: int, generation: int) -> Quantizer:
+        quantizer = build_quantizer(self.quantization, dimension, self.pq_subvectors)
+        quantizer.load(self._quantizer_path(user_id, generation))
+        return quantizer
+
+    @contextmanager
+    def _user_lock(self, user_id: str) -> Iterator[None]:
+        """Serialise writers of one user across threads and, where supported, processes."""
+        with self._locks_guard:
+            thread_lock = self._thread_locks[user_id]
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = self.directory / f"{self._user_prefix(user_id)}.lock"
+            with lock_path.open("a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def add_document_chunks(
+        self,
+        document: Document,
+        chunks: Sequence[ChunkLike],
+        embeddings: Sequence[List[float]],
+        user_id: str,
+        staged: bool = False,
+    ) -> None:
+        if not len(chunks) or not len(embeddings):
+            return
+
+        if len(chunks) != len(embeddings):
+            raise ValueError("Chunks and embeddings length mismatch")
+
+        vectors = _normalise(np.asarray(embeddings, dtype=np.float32))
+        dimension = vectors.shape[1]
+
+        with self._user_lock(user_id), closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT dimension, rows, generation FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                connection.execute("INSERT INTO users (user_id, dimension) VALUES (?, ?)", (user_id, dimension))
+                row = (dimension, 0, 0)
+            stored_dimension, rows, generation = row
+            if stored_dimension != dimension:
+                raise ValueError(f"Embedding dimension {dimension} does not match the index ({stored_dimension})")
+
+            path = self._matrix_path(user_id, generation)
+            with path.open("ab") as handle:
+                # Drop bytes of an append whose metadata was never committed (e.g. after a crash).
+                handle.truncate(rows * dimension * 4)
+                handle.write(vectors.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            connection.executemany(
+                "INSERT INTO chunks (chunk_id, user_id, row, document_id, document_name, chunk_index, content, staged) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (chunk.id, user_id, rows + offset, document.id, document.filename, chunk.chunk_index, chunk.content, int(staged))
+                    for offset, chunk in enumerate(chunks)
+                ],
+            )
+            connection.execute(
+                "UPDATE users SET rows = rows + ?, version = version + 1 WHERE user_id = ?", (len(chunks), user_id)
+            )
+            self._encode_pending(connection, user_id)
+
+    def publish_chunks(self, document: Document, chunks: Sequence[ChunkLike], user_id: str) -> None:
+        if not chunks:
+            return
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "UPDATE chunks SET staged = 0, document_name = ?, chunk_index = ? WHERE chunk_id = ?",
+                [(document.filename, chunk.chunk_index, chunk.id) for chunk in chunks],
+            )
+            connection.execute("UPDATE users SET version = version + 1 WHERE user_id = ?", (user_id,))
+
+    def replace_chunks(
+        self, document: Document, old_ids: Sequence[str], chunks: Sequence[ChunkLike], user_id: str
+    ) -> None:
+        with self._user_lock(user_id), closing(self._connect()) as connection:
+            with connection:
+                deleted = 0
+                if old_ids:
+                    deleted = connection.executemany(
+                        "DELETE FROM chunks WHERE chunk_id = ? AND user_id = ?",
+                        [(chunk_id, user_id) for chunk_id in old_ids],
+                    ).rowcount
+                connection.executemany(
+                    "UPDATE chunks SET staged = 0, document_name = ?, chunk_index = ? WHERE chunk_id = ?",
+                    [(document.filename, chunk.chunk_index, chunk.id) for chunk in chunks],
+                )
+                connection.execute(
+                    "UPDATE users SET dead = dead + ?, version = version + 1 WHERE user_id = ?", (deleted, user_id)
+                )
+            self._compact_if_sparse(connection, user_id)
+
+    def delete_chunks(self, chunk_ids: Sequence[str], user_id: str | None = None) -> None:
+        if not chunk_ids:
+            return
+        with closing(self._connect()) as connection:
+            owners = self._owners(connection, "chunk_id", list(chunk_ids))
+        self._delete(owners)
+
+    def delete_document_embeddings(self, document_id: str, user_id: str | None = None) -> None:
+        with closing(self._connect()) as connection:
+            owners = self._owners(connection, "document_id", [document_id])
+        self._delete(owners)
+
+    @staticmethod
+    def _owners(connection: sqlite3.Connection, column: str, values: list[str]) -> dict[str, list[str]]:
+        owners: dict[str, list[str]] = defaultdict(list)
+        for start in range(0, len(values), SQLITE_BATCH):
+            batch = values[start : start + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for chunk_id, user_id in connection.execute(
+                f"SELECT chunk_id, user_id FROM chunks WHERE {column} IN ({placeholders})", batch
+            ):
+                owners[user_id].append(chunk_id)
+        return owners
+
+    def _delete(self, owners: dict[str, list[str]]) -> None:
+        for user_id, chunk_ids in owners.items():
+            with self._user_lock(user_id), closing(self._connect()) as connection:
+                with connection:
+                    connection.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+                    connection.execute(
+                        "UPDATE users SET dead = dead + ?, version = version + 1 WHERE user_id = ?",
+                        (len(chunk_ids), user_id),
+                    )
+                self._compact_if_sparse(connection, user_id)
+
+    def _compact_if_sparse(self, connection: sqlite3.Connection, user_id: str) -> None:
+        row = connection.execute("SELECT rows, dead FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return
+        rows, dead = row
+        if rows >= COMPACTION_MIN_ROWS and dead > rows * self.compaction_threshold:
+            self._compact(connection, user_id)
+
+    def compact(self, user_id: str) -> None:
+        """Rewrite the user's matrix without tombstoned rows."""
+        with self._user_lock(user_id), closing(self._connect()) as connection:
+            self._compact(connection, user_id)
+
+    def _compact(self, connection: sqlite3.Connection, user_id: str) -> None:
+        row = connection.execute("SELECT dimension, rows, generation FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return
+        dimension, rows, generation = row
+        live = connection.execute(
+            "SELECT chunk_id, row FROM chunks WHERE user_id = ? ORDER BY row", (user_id,)
+        ).fetchall()
+
+        old_path = self._matrix_path(user_id, generation)
+        new_path = self._matrix_path(user_id, generation + 1)
+        old = np.memmap(old_path, dtype=np.float32, mode="r", shape=(rows, dimension)) if rows else None
+        with new_path.open("wb") as handle:
+            for start in range(0, len(live), COMPACTION_COPY_ROWS):
+                source_rows = [source_row for _, source_row in live[start : start + COMPACTION_COPY_ROWS]]
+                handle.write(np.ascontiguousarray(old[source_rows]).tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        del old
+
+        with connection:
+            connection.executemany(
+                "UPDATE chunks SET row = ? WHERE chunk_id = ?",
+                [(new_row, chunk_id) for new_row, (chunk_id, _) in enumerate(live)],
+            )
+            connection.execute(
+                "UPDATE users SET rows = ?, dead = 0, generation = ?, coded = 0, version = version + 1 "
+                "WHERE user_id = ?",
+                (len(live), generation + 1, user_id),
+            )
+            # Retrain on the surviving rows rather than copying codes across.
+            self._encode_pending(connection, user_id)
+        old_path.unlink(missing_ok=True)
+        if self.quantization != "none":
+            self._codes_path(user_id, generation).unlink(missing_ok=True)
+            self._quantizer_path(user_id, generation).unlink(missing_ok=True)
+        logger.info("Compacted vector index of %s from %d to %d rows", user_id, rows, len(live))
+
+    def _encode_pending(self, connection: sqlite3.Connection, user_id: str) -> None:
+        """Quantize rows appended since the last call, training the quantizer first if needed.
+
+        Runs inside the caller's transaction and under the user's lock. The codes are written
+        before the ``coded`` counter commits, so a crash leaves only trailing bytes that the
+        next call truncates.
+        """
+        if self.quantization == "none":
+            return
+        dimension, rows, generation, coded, codec = connection.execute(
+            "SELECT dimension, rows, generation, coded, codec FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if codec != self.quantization:
+            coded = 0  # codec changed since these codes were written
+        if coded >= rows or (coded == 0 and rows < QUANTIZATION_MIN_ROWS):
+            return
+
+        matrix = np.memmap(self._matrix_path(user_id, generation), dtype=np.float32, mode="r", shape=(rows, dimension))
+        if coded == 0:
+            quantizer = build_quantizer(self.quantization, dimension, self.pq_subvectors)
+            sample = np.random.default_rng(0).choice(rows, min(rows, TRAIN_SAMPLE_ROWS), replace=False)
+            quantizer.train(np.asarray(matrix[np.sort(sample)]))
+            quantizer.save(self._quantizer_path(user_id, generation))
+        else:
+            quantizer = self._quantizer(user_id, dimension, generation)
+
+        with self._codes_path(user_id, generation).open("ab") as handle:
+            handle.truncate(coded * quantizer.code_size)
+            for start in range(coded, rows, COMPACTION_COPY_ROWS):
+                handle.write(quantizer.encode(np.asarray(matrix[start : min(rows, start + COMPACTION_COPY_ROWS)])).tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        del matrix
+        connection.execute(
+            "UPDATE users SET coded = ?, codec = ?, version = version + 1 WHERE user_id = ?",
+            (rows, self.quantization, user_id),
+        )
+
+    def get_embeddings(self, chunk_ids: Sequence[str], user_id: str | None = None) -> dict[str, List[float]]:
+        if not chunk_ids:
+            return {}
+        found: dict[str, List[float]] = {}
+        with closing(self._connect()) as connection:
+            owners = self._owners(connection, "chunk_id", list(chunk_ids))
+            for user_id, ids in owners.items():
+                connection.execute("BEGIN")
+                try:
+                    dimension, rows, generation = connection.execute(
+                        "SELECT dimension, rows, generation FROM users WHERE user_id = ?", (user_id,)
+                    ).fetchone()
+                    placeholders = ",".join("?" * len(ids))
+                    positions = connection.execute(
+                        f"SELECT chunk_id, row FROM chunks WHERE chunk_id IN ({placeholders})", ids
+                    ).fetchall()
+                finally:
+                    connection.rollback()
+                matrix = np.memmap(self._matrix_path(user_id, generation), dtype=np.float32, mode="r", shape=(rows, dimension))
+                for chunk_id, row in positions:
+                    found[chunk_id] = matrix[row].tolist()
+        return found
+
+    def query(self, user_id: str, query_embedding: List[float], limit: int = 4) -> List[SourceChunk]:
+        if not query_embedding:
+            return []
+        return self.query_many(user_id, [query_embedding], limit)[0]
+
+    def query_many(
+        self, user_id: str, query_embeddings: Sequence[List[float]], limit: int = 4
+    ) -> List[List[SourceChunk]]:
+        """Search with several embeddings against one snapshot; exact search is a single matrix product."""
+        empty: List[List[SourceChunk]] = [[] for _ in query_embeddings]
+        if not len(query_embeddings) or limit <= 0:
+            return empty
+
+        snapshot = self._load(user_id)
+        if snapshot is None or not snapshot.live_count:
+            return empty
+
+        queries = _normalise(np.asarray(query_embeddings, dtype=np.float32))
+        if queries.ndim != 2 or queries.shape[1] != snapshot.matrix.shape[1]:
+            return empty
+
+        hits = self._search_many(snapshot, queries, min(limit, snapshot.live_count))
+        chunk_ids = sorted({str(snapshot.chunk_ids[row]) for top, _ in hits for row in top})
+
+        metadata: dict[str, tuple] = {}
+        with closing(self._connect()) as connection:
+            for start in range(0, len(chunk_ids), SQLITE_BATCH):
+                batch = chunk_ids[start : start + SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for row in connection.execute(
+                    f"SELECT chunk_id, document_id, document_name, chunk_index, content FROM chunks "
+                    f"WHERE chunk_id IN ({placeholders})",
+                    batch,
+                ):
+                    metadata[row[0]] = row[1:]
+
+        results: List[List[SourceChunk]] = []
+        for top, scores in hits:
+            sources: list[SourceChunk] = []
+            for row, score in zip(top, scores):
+                chunk_id = str(snapshot.chunk_ids[row])
+                if chunk_id not in metadata:
+                    continue  # deleted since the snapshot was taken
+                document_id, document_name, chunk_index, content = metadata[chunk_id]
+                sources.append(
+                    SourceChunk(
+                        chunk_id=chunk_id,
+                        document_id=document_id,
+                        document_name=document_name or "unknown",
+                        chunk_index=int(chunk_index or 0),
+                        content=content or "",
+                        # Cosine distance, so lower is better as with Chroma.
+                        score=float(1.0 - score),
+                        score_kind="distance",
+                    )
+                )
+            results.append(sources)
+        return results
+
+    def _search_many(
+        self, snapshot: _UserMatrix, queries: np.ndarray, k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        if snapshot.codes is not None or len(queries) == 1:
+            return [self._search(snapshot, query, k) for query in queries]
+        # One pass over the matrix for all queries instead of one per query.
+        scores = snapshot.matrix @ queries.T
+        scores[~snapshot.live] = -np.inf
+        hits = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            hits.append((top, column[top]))
+        return hits
+
+    def _search(self, snapshot: _UserMatrix, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the best ``k`` live rows and their exact inner products, best first."""
+        matrix = snapshot.matrix
+        if snapshot.codes is None:
+            scores = matrix @ query
+            scores[~snapshot.live] = -np.inf
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return top, scores[top]
+
+        coded = snapshot.codes.shape[0]
+        approximate = np.empty(matrix.shape[0], dtype=np.float32)
+        approximate[:coded] = snapshot.quantizer.scores(snapshot.codes, query)
+        approximate[coded:] = matrix[coded:] @ query
+        approximate[~snapshot.live] = -np.inf
+        candidates = min(max(k, self.rerank_candidates), snapshot.live_count)
+        # Sorted row order keeps the reads from the float32 file sequential.
+        rows = np.sort(np.argpartition(-approximate, candidates - 1)[:candidates])
+        exact = matrix[rows] @ query
+        best = np.argsort(-exact)[:k]
+        return rows[best], exact[best]
+
+    def _load(self, user_id: str) -> _UserMatrix | None:
+        """Return a snapshot of the user's published rows, reloading it after any write."""
+        with closing(self._connect()) as connection:
+            for _ in range(3):
+                # One read transaction, so the row count and positions come from the same snapshot.
+                connection.execute("BEGIN")
+                try:
+                    row = connection.execute(
+                        "SELECT dimension, rows, generation, version, coded, codec FROM users WHERE user_id = ?",
+                        (user_id,),
+                    ).fetchone()
+                    if row is None:
+                        return None
+                    dimension, rows, generation, version, coded, codec = row
+                    cached = self._cache.get(user_id)
+                    if cached is not None and cached.version == version:
+                        return cached
+                    positions = connection.execute(
+                        "SELECT row, chunk_id FROM chunks WHERE user_id = ? AND staged = 0", (user_id,)
+                    ).fetchall()
+                finally:
+                    connection.rollback()
+
+                if not rows:
+                    return None
+                codes = quantizer = None
+                try:
+                    matrix = np.memmap(
+                        self._matrix_path(user_id, generation), dtype=np.float32, mode="r", shape=(rows, dimension)
+                    )
+                    if coded and codec == self.quantization:
+                        quantizer = self._quantizer(user_id, dimension, generation)
+                        codes = np.memmap(
+                            self._codes_path(user_id, generation),
+                            dtype=np.uint8,
+                            mode="r",
+                            shape=(coded, quantizer.code_size),
+                        )
+                except FileNotFoundError:
+                    continue  # compacted between reading the metadata and opening the file
+
+                live = np.zeros(rows, dtype=bool)
+                chunk_ids = np.empty(rows, dtype=object)
+                for position, chunk_id in positions:
+                    live[position] = True
+                    chunk_ids[position] = chunk_id
+                snapshot = _UserMatrix(version, matrix, live, chunk_ids, len(positions), codes, quantizer)
+                self._cache[user_id] = snapshot
+                return snapshot
+        return None
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -0,0 +1,25 @@
+"""Functions executed inside the PDF extraction process pool.
+
+This module only depends on ``pypdf`` so spawned workers start quickly and never import the
+web application.
+"""
+
+from __future__ import annotations
+
+from pypdf import PdfReader
+
+
+def count_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    """Return the stripped text of pages ``start`` to ``stop - 1``; unreadable pages become ``""``."""
+    reader = PdfReader(path)
+    texts: list[str] = []
+    for index in range(start, min(stop, len(reader.pages))):
+        try:
+            texts.append((reader.pages[index].extract_text() or "").strip())
+        except Exception:
+            texts.append("")
+    return texts
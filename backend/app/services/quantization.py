@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+TRAIN_SAMPLE_ROWS = 8192
+KMEANS_ITERATIONS = 10
+SCORE_BLOCK_ROWS = 1024
+
+
+class Quantizer:
+    """Lossy compression of unit-length float32 rows into fixed-width uint8 codes for candidate search.
+
+    A quantizer is trained on a sample of the rows it will encode. ``scores`` approximates the
+    inner products of every encoded row with a query; callers rerank the best candidates
+    against the full-precision vectors.
+    """
+
+    name = "base"
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+
+    @property
+    def code_size(self) -> int:
+        raise NotImplementedError
+
+    def train(self, sample: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _block_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate ``vectors @ query``, decoding in blocks so temporaries stay small."""
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        prepared = self._prepare_query(query)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_ROWS):
+            out[start : start + SCORE_BLOCK_ROWS] = self._block_scores(codes[start : start + SCORE_BLOCK_ROWS], prepared)
+        return out
+
+    def _prepare_query(self, query: np.ndarray) -> np.ndarray:
+        return query
+
+    def save(self, path: Path) -> None:
+        np.savez(path, **self._state())
+
+    def load(self, path: Path) -> None:
+        with np.load(path) as state:
+            self._load_state(state)
+
+    def _state(self) -> dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def _load_state(self, state) -> None:
+        raise NotImplementedError
+
+
+class Int8Quantizer(Quantizer):
+    """Symmetric per-dimension scalar quantization to int8 (4x smaller than float32).
+
+    The scale of each dimension comes from the 99.9th percentile of its magnitude in the
+    training sample; rarer outliers are clipped.
+    """
+
+    name = "int8"
+
+    def __init__(self, dimension: int) -> None:
+        super().__init__(dimension)
+        self.scale = np.ones(dimension, dtype=np.float32)
+
+    @property
+    def code_size(self) -> int:
+        return self.dimension
+
+    def train(self, sample: np.ndarray) -> None:
+        bound = np.percentile(np.abs(sample), 99.9, axis=0).astype(np.float32)
+        self.scale = np.maximum(bound, 1e-6) / 127.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        return codes.view(np.uint8)
+
+    def _prepare_query(self, query: np.ndarray) -> np.ndarray:
+        # (codes * scale) @ q == codes @ (scale * q)
+        return (query * self.scale).astype(np.float32)
+
+    def _block_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes.view(np.int8).astype(np.float32) @ query
+
+    def _state(self) -> dict[str, np.ndarray]:
+        return {"scale": self.scale}
+
+    def _load_state(self, state) -> None:
+        self.scale = state["scale"]
+
+
+class ProductQuantizer(Quantizer):
+    """Product quantization: ``subvectors`` slices, each encoded as one of 256 k-means centroids.
+
+    A code is ``subvectors`` bytes, e.g. 64 bytes for a 1536-dim vector (96x smaller than
+    float32). Scoring sums per-slice lookup tables of centroid/query inner products.
+    """
+
+    name = "pq"
+
+    def __init__(self, dimension: int, subvectors: int = 64, seed: int = 0) -> None:
+        super().__init__(dimension)
+        # Slices must tile the vector exactly.
+        self.subvectors = math.gcd(dimension, max(1, subvectors))
+        self.subdimension = dimension // self.subvectors
+        self.centroids = np.zeros((self.subvectors, 256, self.subdimension), dtype=np.float32)
+        self.seed = seed
+
+    @property
+    def code_size(self) -> int:
+        return self.subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(vectors.shape[0], self.subvectors, self.subdimension)
+
+    def train(self, sample: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        if sample.shape[0] > TRAIN_SAMPLE_ROWS:
+            sample = sample[rng.choice(sample.shape[0], TRAIN_SAMPLE_ROWS, replace=False)]
+        parts = self._split(np.asarray(sample, dtype=np.float32))
+        for index in range(self.subvectors):
+            self.centroids[index] = _kmeans(parts[:, index, :], 256, rng)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((vectors.shape[0], self.subvectors), dtype=np.uint8)
+        for index in range(self.subvectors):
+            codes[:, index] = _nearest(parts[:, index, :], self.centroids[index])
+        return codes
+
+    def _prepare_query(self, query: np.ndarray) -> np.ndarray:
+        # tables[i, c] = centroid c of slice i . query slice i, flattened for np.take
+        tables = np.einsum("ikd,id->ik", self.centroids, query.reshape(self.subvectors, self.subdimension))
+        return tables.ravel()
+
+    def _block_scores(self, codes: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        offsets = np.arange(self.subvectors, dtype=np.intp) * 256
+        return np.take(tables, codes + offsets).sum(axis=1)
+
+    def _state(self) -> dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+    def _load_state(self, state) -> None:
+        self.centroids = state["centroids"]
+
+
+def build_quantizer(kind: str, dimension: int, pq_subvectors: int = 64) -> Quantizer | None:
+    if kind == "none":
+        return None
+    if kind == "int8":
+        return Int8Quantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, pq_subvectors)
+    raise ValueError(f"Unknown quantization {kind!r}; expected none, int8 or pq")
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||p - c||^2 == argmin (||c||^2 - 2 p.c)
+    distances = (centroids * centroids).sum(axis=1)[None, :] - 2.0 * points @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def _kmeans(points: np.ndarray, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means; returns exactly ``clusters`` centroids (duplicates when points are scarce)."""
+    initial = rng.choice(points.shape[0], clusters, replace=points.shape[0] < clusters)
+    centroids = points[initial].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = _nearest(points, centroids)
+        counts = np.bincount(assignment, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(points.shape[0], len(empty))]
+    return centroids
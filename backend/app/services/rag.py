@@ -1,24 +1,58 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from dataclasses import dataclass, field
 from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Sequence
+from typing import AsyncIterator, Callable, Sequence
 
 from fastapi import UploadFile
 from fastapi.concurrency import run_in_threadpool
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from ..core.config import Settings, get_settings
-from ..models.document import Document, DocumentChunk
-from ..schemas import AskResponse, DocumentSummary, SourceInfo, UploadResponse
+from ..db.session import SessionLocal
+from ..models.document import Document, DocumentChunk, DocumentStatus
+from ..models.user import User
+from ..schemas import AskResponse, BatchAskResult, DocumentSummary, SourceInfo, UploadResponse, UploadResult
+from .answer_cache import AnswerCache
+from .chat_history import ChatHistoryService
+from .chunk_writer import ChunkRecord, write_chunks
+from .concurrency import SingleFlight
+from .context_packer import ContextPacker
 from .embedding import EmbeddingService
-from .file_storage import FileStorageService
+from .embedding_cache import normalize_query
+from .file_storage import FileStorageService, UploadBudget
+from .lexical_index import LexicalIndexService
 from .llm import LLMService, build_llm_service
-from .text_processing import TextExtractionError, TextExtractionService
-from .vector_store import VectorStoreService
-from collections import defaultdict
+from .reranker import build_reranker
+from .retrieval import Retriever
+from .text_processing import (
+    StreamingTextSplitter,
+    StreamingTokenSplitter,
+    TextChunk,
+    TextExtractionError,
+    TextExtractionService,
+)
+from .tokenizer import get_tokenizer
+from .vector_store import SourceChunk, VectorStoreService, build_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PreparedAnswer:
+    top_k: int = 0
+    corpus_version: int | None = None
+    query_embedding: list[float] | None = None
+    context: str = ""
+    sources: list[SourceInfo] = field(default_factory=list)
+    cached: AskResponse | None = None
 
 
 class RAGService:
@@ -32,6 +66,10 @@ class RAGService:
         embedding_service: EmbeddingService,
         vector_store: VectorStoreService,
         llm_service: LLMService,
+        session_factory: Callable[[], Session] = SessionLocal,
+        answer_cache: AnswerCache | None = None,
+        lexical_index: LexicalIndexService | None = None,
+        chat_history: ChatHistoryService | None = None,
     ) -> None:
         self.settings = settings
         self.file_storage = file_storage
@@ -39,40 +77,100 @@ class RAGService:
         self.embedding_service = embedding_service
         self.vector_store = vector_store
         self.llm_service = llm_service
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.text_splitter_chunk_size,
-            chunk_overlap=settings.text_splitter_chunk_overlap,
+        self.session_factory = session_factory
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index or LexicalIndexService(settings.lexical_index_dir)
+        self.retriever = Retriever(
+            vector_store,
+            self.lexical_index,
+            mode=settings.retrieval_mode,
+            candidates=settings.retrieval_candidates,
+            rrf_k=settings.retrieval_rrf_k,
+            coalesce=settings.single_flight_enabled,
+            reranker=build_reranker(settings),
+            rerank_candidates=settings.rerank_candidates,
+            rerank_budget_ms=settings.rerank_latency_budget_ms,
+            rerank_min_score=settings.rerank_min_score,
+            rerank_workers=settings.rerank_workers,
+        )
+        self.flights = SingleFlight("answer", enabled=settings.single_flight_enabled)
+        self.text_splitter = build_text_splitter(settings)
+        self.chat_history = chat_history or ChatHistoryService(
+            llm_service,
+            get_tokenizer(settings.tokenizer_encoding),
+            session_factory=session_factory,
+            token_budget=settings.chat_history_token_budget,
+            summary_token_budget=settings.chat_summary_token_budget,
+            condense_questions=settings.chat_condense_questions,
         )
+        self.context_packer = ContextPacker(
+            get_tokenizer(settings.tokenizer_encoding),
+            token_budget=settings.context_token_budget,
+            model_budgets=settings.context_token_budgets,
+            mmr_lambda=settings.context_mmr_lambda,
+            duplicate_threshold=settings.context_duplicate_threshold,
+        )
+
+    async def ingest_uploads(self, uploads: Sequence[UploadFile], user_id: str) -> UploadResponse:
+        """Persist uploads concurrently and queue them for background ingestion.
 
-    async def ingest_uploads(self, uploads: Sequence[UploadFile], db: Session, user_id: str) -> UploadResponse:
+        Each file is staged in its own task and DB session, so one rejected file is reported in
+        ``results`` without undoing the files that were accepted alongside it.
+        """
         if not uploads:
             raise ValueError("No files supplied.")
 
-        stored_documents: list[DocumentSummary] = []
-
-        for upload in uploads:
-            document = await self._process_upload(upload, db, user_id)
-            stored_documents.append(DocumentSummary.model_validate(document))
+        semaphore = asyncio.Semaphore(max(1, self.settings.ingestion_upload_concurrency))
+        budget = UploadBudget(self.settings.upload_max_request_mb * 1024 * 1024)
+
+        async def stage(upload: UploadFile) -> UploadResult:
+            filename = upload.filename or "upload"
+            async with semaphore:
+                try:
+                    with self.session_factory() as db:
+                        document, deduplicated = await self._stage_upload(upload, db, user_id, budget)
+                        summary = DocumentSummary.model_validate(document)
+                except (TextExtractionError, ValueError) as exc:
+                    logger.warning("Rejected upload %s for user %s: %s", filename, user_id, exc)
+                    return UploadResult(filename=filename, accepted=False, error=str(exc))
+                except Exception as exc:
+                    logger.exception("Failed to stage upload %s for user %s", filename, user_id)
+                    return UploadResult(filename=filename, accepted=False, error=str(exc) or exc.__class__.__name__)
+            return UploadResult(filename=filename, accepted=True, document=summary, deduplicated=deduplicated)
+
+        results = await asyncio.gather(*(stage(upload) for upload in uploads))
+
+        # The same file twice in one request stages to one document; list it once.
+        unique = {result.document.id: result.document for result in results if result.document is not None}
+        stored_documents = list(unique.values())
+        if not stored_documents:
+            raise TextExtractionError("; ".join(f"{result.filename}: {result.error}" for result in results))
 
         stored_documents.sort(key=lambda doc: doc.created_at, reverse=True)
-        return UploadResponse(documents=stored_documents, count=len(stored_documents))
-
-    async def _process_upload(self, upload: UploadFile, db: Session, user_id: str) -> Document:
-        metadata = await self.file_storage.save_upload(upload)
-        text = await run_in_threadpool(
-            self.text_extractor.extract_text,
-            Path(metadata["storage_path"]),
-            metadata["content_type"],
-        )
+        return UploadResponse(documents=stored_documents, count=len(stored_documents), results=list(results))
 
-        if not text.strip():
-            raise TextExtractionError(f"No text found in {metadata['original_name']}")
+    async def _stage_upload(
+        self, upload: UploadFile, db: Session, user_id: str, budget: UploadBudget | None = None
+    ) -> tuple[Document, bool]:
+        """Store an upload and queue it, or return the user's existing copy of the same file."""
+        suffix = Path(upload.filename or "").suffix.lower()
+        if suffix not in self.text_extractor.SUPPORTED_EXTENSIONS:
+            raise TextExtractionError(f"Unsupported file type: {suffix or upload.filename}")
 
-        chunks = await run_in_threadpool(self.text_splitter.split_text, text)
-        if not chunks:
-            raise TextExtractionError(f"Unable to split text for {metadata['original_name']}")
+        metadata = await self.file_storage.save_upload(upload, budget)
 
-        embeddings = await run_in_threadpool(self.embedding_service.embed_documents, chunks)
+        existing = (
+            db.query(Document)
+            .filter(
+                Document.user_id == user_id,
+                Document.content_hash == metadata["sha256"],
+                Document.status != DocumentStatus.FAILED.value,
+            )
+            .order_by(Document.created_at)
+            .first()
+        )
+        if existing:
+            return existing, True
 
         document = Document(
             user_id=user_id,
@@ -80,34 +178,211 @@ class RAGService:
             content_type=metadata["content_type"],
             stored_path=metadata["storage_path"],
             size_bytes=metadata["size_bytes"],
-            chunk_count=len(chunks),
-            embedding_count=len(embeddings),
+            content_hash=metadata["sha256"],
+            status=DocumentStatus.QUEUED.value,
         )
 
-        chunk_models: list[DocumentChunk] = []
-
         try:
             db.add(document)
-            db.flush()
+            db.commit()
+            db.refresh(document)
+        except Exception:
+            db.rollback()
+            raise
+
+        return document, False
+
+    async def process_document(self, db: Session, document_id: str) -> Document | None:
+        """Stream a queued document through extract → split → embed → index; raises on failure.
+
+        Chunks are embedded and indexed in batches of ``EMBEDDING_BATCH_SIZE`` as the extractor
+        yields pages, so memory stays bounded and early chunks become searchable before the
+        rest of the document is processed.
+
+        Every database call runs in a worker thread. ``db`` should not expire on commit, so that
+        reading the document's attributes afterwards does not query from the event loop.
+        """
+        document = await run_in_threadpool(db.get, Document, document_id)
+        if not document:
+            return None
 
-            for index, chunk_text in enumerate(chunks):
-                chunk_model = DocumentChunk(
+        await run_in_threadpool(self._set_progress, db, document, DocumentStatus.EXTRACTING, 0)
+
+        # Drop rows and vectors left behind by an interrupted earlier attempt.
+        await run_in_threadpool(self.discard_index, db, document)
+
+        # Identical files indexed before (by any user) are copied instead of re-embedded.
+        source = await run_in_threadpool(self._find_indexed_copy, db, document)
+        if source is not None and await self._clone_from(db, document, source):
+            document.error = None
+            await run_in_threadpool(self._set_progress, db, document, DocumentStatus.INDEXED, 100)
+            return document
+
+        extracted = [0.0]
+
+        def record_progress(fraction: float) -> None:
+            extracted[0] = fraction
+
+        segments = self.text_extractor.iter_text(Path(document.stored_path), document.content_type, record_progress)
+        chunk_stream = self.text_splitter.split(segments)
+        batch_size = max(1, self.settings.embedding_batch_size)
+
+        while batch := await run_in_threadpool(lambda: list(islice(chunk_stream, batch_size))):
+            progress = min(99, int(extracted[0] * 100))
+            await self._index_batch(db, document, batch, progress)
+
+        if not document.chunk_count:
+            raise TextExtractionError(f"No text found in {document.filename}")
+
+        document.error = None
+        await run_in_threadpool(self._set_progress, db, document, DocumentStatus.INDEXED, 100)
+        return document
+
+    async def _index_batch(self, db: Session, document: Document, chunks: list[TextChunk], progress: int) -> None:
+        embeddings = await self.embedding_service.aembed_documents([chunk.text for chunk in chunks])
+
+        # Ids are assigned up front so vectors can be indexed before the rows are written;
+        # no SQL transaction is held open across the await.
+        records = [
+            ChunkRecord(
+                document_id=document.id,
+                chunk_index=document.chunk_count + offset,
+                content=chunk.text,
+                token_count=chunk.token_count,
+            )
+            for offset, chunk in enumerate(chunks)
+        ]
+        await self._store_batch(db, document, records, embeddings, progress)
+
+    async def _store_batch(
+        self,
+        db: Session,
+        document: Document,
+        records: list[ChunkRecord],
+        embeddings: Sequence[list[float]],
+        progress: int,
+    ) -> None:
+        await run_in_threadpool(self.vector_store.add_document_chunks, document, records, embeddings, document.user_id)
+        await run_in_threadpool(self.lexical_index.add_document_chunks, document, records, document.user_id)
+        await run_in_threadpool(self._commit_batch, db, document, records, len(embeddings), progress)
+
+    @staticmethod
+    def _commit_batch(
+        db: Session, document: Document, records: list[ChunkRecord], embedding_count: int, progress: int
+    ) -> None:
+        try:
+            write_chunks(db, records)
+            bump_corpus_version(db, document.user_id)
+            document.chunk_count += len(records)
+            document.embedding_count += embedding_count
+            document.status = DocumentStatus.EMBEDDING.value
+            document.progress = progress
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def _find_indexed_copy(db: Session, document: Document) -> Document | None:
+        if not document.content_hash:
+            return None
+        return (
+            db.query(Document)
+            .filter(
+                Document.content_hash == document.content_hash,
+                Document.id != document.id,
+                Document.status == DocumentStatus.INDEXED.value,
+                Document.chunk_count > 0,
+            )
+            .order_by(Document.created_at)
+            .first()
+        )
+
+    async def _clone_from(self, db: Session, document: Document, source: Document) -> bool:
+        """Copy chunks and vectors of an already indexed identical file instead of re-embedding.
+
+        Returns False, leaving nothing behind, when the source's vectors are incomplete.
+        """
+        await run_in_threadpool(self._set_progress, db, document, DocumentStatus.EMBEDDING, 0)
+        batch_size = max(1, self.settings.embedding_batch_size)
+        total = source.chunk_count
+        offset = 0
+
+        def next_batch() -> list[DocumentChunk]:
+            return (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == source.id)
+                .order_by(DocumentChunk.chunk_index)
+                .offset(offset)
+                .limit(batch_size)
+                .all()
+            )
+
+        while True:
+            source_chunks = await run_in_threadpool(next_batch)
+            if not source_chunks:
+                break
+
+            vectors = await run_in_threadpool(
+                self.vector_store.get_embeddings, [chunk.id for chunk in source_chunks], source.user_id
+            )
+            if len(vectors) != len(source_chunks):
+                logger.warning("Vectors missing for %s; re-embedding %s instead", source.id, document.id)
+                await run_in_threadpool(self.discard_index, db, document)
+                return False
+
+            records = [
+                ChunkRecord(
                     document_id=document.id,
-                    chunk_index=index,
-                    content=chunk_text,
-                    token_count=len(chunk_text.split()),
+                    chunk_index=chunk.chunk_index,
+                    content=chunk.content,
+                    token_count=chunk.token_count,
                 )
-                db.add(chunk_model)
-                chunk_models.append(chunk_model)
-
+                for chunk in source_chunks
+            ]
+            embeddings = [vectors[chunk.id] for chunk in source_chunks]
+            offset += len(source_chunks)
+            await self._store_batch(db, document, records, embeddings, min(99, offset * 100 // (total or 1)))
+
+        logger.info("Reused %d chunk(s) of %s for %s", offset, source.id, document.id)
+        return offset > 0
+
+    def discard_index(self, db: Session, document: Document) -> None:
+        """Remove a document's vectors, keyword entries and chunk rows, e.g. after a failed attempt.
+
+        Batches are searchable as soon as they are stored, so a document that is not indexed
+        must not keep them. Blocking; call it from a worker thread.
+        """
+        self.vector_store.delete_document_embeddings(document.id, document.user_id)
+        self.lexical_index.delete_document(document.id, document.user_id)
+        try:
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete(synchronize_session=False)
+            bump_corpus_version(db, document.user_id)
+            document.chunk_count = 0
+            document.embedding_count = 0
             db.commit()
-            db.refresh(document)
         except Exception:
             db.rollback()
             raise
 
-        await run_in_threadpool(self.vector_store.upsert_document_chunks, document, chunk_models, embeddings, user_id)
+    @staticmethod
+    def _set_progress(db: Session, document: Document, status: DocumentStatus, progress: int) -> None:
+        document.status = status.value
+        document.progress = progress
+        db.commit()
+
+    def retry_document(self, db: Session, document_id: str, user_id: str) -> Document | None:
+        """Requeue a failed document so the ingestion workers pick it up again."""
+        document = db.get(Document, document_id)
+        if not document or document.user_id != user_id:
+            return None
 
+        if document.status == DocumentStatus.FAILED.value:
+            document.status = DocumentStatus.QUEUED.value
+            document.progress = 0
+            document.attempts = 0
+            db.commit()
+            db.refresh(document)
         return document
 
     def list_documents(self, db: Session, user_id: str) -> list[Document]:
@@ -123,52 +398,258 @@ class RAGService:
         if not document or document.user_id != user_id:
             return False
 
-        self.vector_store.delete_document_embeddings(document_id)
+        self.vector_store.delete_document_embeddings(document_id, user_id)
+        self.lexical_index.delete_document(document_id, user_id)
         db.delete(document)
+        bump_corpus_version(db, user_id)
         db.commit()
         return True
 
-    async def answer_question(self, question: str, user_id: str, top_k: int = 4) -> AskResponse:
-        query_embedding = await run_in_threadpool(self.embedding_service.embed_query, question)
-        source_chunks = await run_in_threadpool(self.vector_store.query, user_id, query_embedding, top_k)
-
-        # Group chunks by document name
-        chunks_by_doc = defaultdict(list)
-        for chunk in source_chunks:
-            chunks_by_doc[chunk.document_name].append(chunk.content)
-        
-        # Construct context with document names and their chunks
-        context = "\n\n".join(
-            f"{doc_name}\n" + "\n".join(chunks)
-            for doc_name, chunks in chunks_by_doc.items()
+    async def answer_question(
+        self, question: str, user_id: str, top_k: int | None = None, chat_session_id: str | None = None
+    ) -> AskResponse:
+        """Answer from the user's documents; identical concurrent questions share one computation.
+
+        With ``chat_session_id`` the answer sees the session's history and the turn is stored.
+        Raises ``ChatSessionNotFound`` when the session belongs to another user.
+        """
+        top_k = top_k or self.settings.retrieval_top_k
+        if chat_session_id:
+            return await self._answer_in_session(question, user_id, top_k, chat_session_id)
+        key = (user_id, normalize_query(question), top_k)
+        return await self.flights.do(key, lambda: self._answer_question(question, user_id, top_k))
+
+    async def _answer_in_session(self, question: str, user_id: str, top_k: int, chat_session_id: str) -> AskResponse:
+        turn = await self.chat_history.prepare(user_id, chat_session_id, question)
+        # Answers that depend on earlier turns are neither cached nor served from the cache.
+        prepared = await self._prepare_answer(turn.standalone_question, user_id, top_k, use_cache=not turn.history)
+        if prepared.cached is not None:
+            response = prepared.cached
+        else:
+            answer = await self.llm_service.agenerate_answer(question, prepared.context, turn.history)
+            response = AskResponse(answer=answer, sources=prepared.sources)
+            if not turn.history:
+                self._remember_answer(user_id, question, prepared, response)
+        await self.chat_history.record(user_id, turn, question, response.answer)
+        return response
+
+    async def _answer_question(self, question: str, user_id: str, top_k: int) -> AskResponse:
+        prepared = await self._prepare_answer(question, user_id, top_k)
+        if prepared.cached is not None:
+            return prepared.cached
+
+        answer = await self.llm_service.agenerate_answer(question, prepared.context)
+        response = AskResponse(answer=answer, sources=prepared.sources)
+        self._remember_answer(user_id, question, prepared, response)
+        return response
+
+    async def stream_answer(
+        self, question: str, user_id: str, top_k: int | None = None, chat_session_id: str | None = None
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """Yield ``("sources", ...)`` once, then ``("token", ...)`` per fragment as the model produces it,
+        then ``("done", ...)``.
+
+        Closing the generator early (e.g. on client disconnect) closes the upstream model stream,
+        and the partial answer is neither cached nor stored in the chat session.
+        """
+        top_k = top_k or self.settings.retrieval_top_k
+        turn = await self.chat_history.prepare(user_id, chat_session_id, question) if chat_session_id else None
+        history = turn.history if turn else ""
+        retrieval_question = turn.standalone_question if turn else question
+        prepared = await self._prepare_answer(retrieval_question, user_id, top_k, use_cache=not history)
+        if prepared.cached is not None:
+            yield "sources", {"sources": [source.model_dump() for source in prepared.cached.sources]}
+            yield "token", {"text": prepared.cached.answer}
+            if turn is not None:
+                await self.chat_history.record(user_id, turn, question, prepared.cached.answer)
+            yield "done", {"cached": True}
+            return
+
+        yield "sources", {"sources": [source.model_dump() for source in prepared.sources]}
+        parts: list[str] = []
+        async for text in self.llm_service.astream_answer(question, prepared.context, history):
+            parts.append(text)
+            yield "token", {"text": text}
+        response = AskResponse(answer="".join(parts).strip(), sources=prepared.sources)
+        if not history:
+            self._remember_answer(user_id, question, prepared, response)
+        if turn is not None:
+            await self.chat_history.record(user_id, turn, question, response.answer)
+        yield "done", {"cached": False}
+
+    async def _prepare_answer(self, question: str, user_id: str, top_k: int, use_cache: bool = True) -> _PreparedAnswer:
+        """Everything up to the LLM call: cache lookups, retrieval and context packing."""
+        prepared = _PreparedAnswer(top_k=top_k)
+        if self.answer_cache is not None and use_cache:
+            prepared.corpus_version = await run_in_threadpool(self._corpus_version, user_id)
+            cached = self.answer_cache.get(user_id, prepared.corpus_version, top_k, question)
+            if cached is not None:
+                prepared.cached = cached.model_copy(update={"cached": True})
+                return prepared
+
+        similarity_cache = use_cache and self.answer_cache and self.answer_cache.similarity_threshold
+        if self.retriever.uses_embeddings or similarity_cache:
+            prepared.query_embedding = await self.embedding_service.aembed_query(question)
+        if self.answer_cache is not None and use_cache:
+            cached = self.answer_cache.get_similar(user_id, prepared.corpus_version, top_k, prepared.query_embedding)
+            if cached is not None:
+                prepared.cached = cached.model_copy(update={"cached": True})
+                return prepared
+
+        source_chunks = await self.retriever.retrieve(user_id, question, prepared.query_embedding, top_k)
+        await self._pack(prepared, source_chunks)
+        return prepared
+
+    async def answer_batch(
+        self, questions: Sequence[str], user_id: str, top_k: int | None = None
+    ) -> AsyncIterator[BatchAskResult]:
+        """Answer many questions, yielding each result as soon as its generation finishes.
+
+        Uncached questions are embedded concurrently as queries and searched with one
+        multi-embedding vector query. Generations then run ``BATCH_ASK_CONCURRENCY`` at a time. A failed generation
+        yields a result with ``error`` set, and the other questions are unaffected.
+        """
+        top_k = top_k or self.settings.retrieval_top_k
+        prepared = [_PreparedAnswer(top_k=top_k) for _ in questions]
+        similarity_cache = bool(self.answer_cache and self.answer_cache.similarity_threshold)
+
+        if self.answer_cache is not None:
+            version = await run_in_threadpool(self._corpus_version, user_id)
+            for index, question in enumerate(questions):
+                prepared[index].corpus_version = version
+                cached = self.answer_cache.get(user_id, version, top_k, question)
+                if cached is not None:
+                    prepared[index].cached = cached.model_copy(update={"cached": True})
+
+        pending = [index for index, item in enumerate(prepared) if item.cached is None]
+        if pending and (self.retriever.uses_embeddings or similarity_cache):
+            embeddings = await self.embedding_service.aembed_queries([questions[index] for index in pending])
+            for index, embedding in zip(pending, embeddings):
+                prepared[index].query_embedding = embedding
+                if similarity_cache:
+                    cached = self.answer_cache.get_similar(user_id, prepared[index].corpus_version, top_k, embedding)
+                    if cached is not None:
+                        prepared[index].cached = cached.model_copy(update={"cached": True})
+            pending = [index for index in pending if prepared[index].cached is None]
+
+        for index, item in enumerate(prepared):
+            if item.cached is not None:
+                yield BatchAskResult(index=index, question=questions[index], **item.cached.model_dump())
+        if not pending:
+            return
+
+        rankings = await self.retriever.retrieve_many(
+            user_id,
+            [questions[index] for index in pending],
+            [prepared[index].query_embedding for index in pending] if self.retriever.uses_embeddings else None,
+            top_k,
         )
-
-        answer = await run_in_threadpool(self.llm_service.generate_answer, question, context)
-
-        sources = [
+        for index, source_chunks in zip(pending, rankings):
+            await self._pack(prepared[index], source_chunks)
+
+        semaphore = asyncio.Semaphore(max(1, self.settings.batch_ask_concurrency))
+
+        async def generate(index: int) -> BatchAskResult:
+            question, item = questions[index], prepared[index]
+            async with semaphore:
+                try:
+                    answer = await self.llm_service.agenerate_answer(question, item.context)
+                except Exception as exc:
+                    logger.warning("Batch answer %d failed for user %s: %s", index, user_id, exc)
+                    return BatchAskResult(index=index, question=question, error=str(exc) or exc.__class__.__name__)
+            response = AskResponse(answer=answer, sources=item.sources)
+            self._remember_answer(user_id, question, item, response)
+            return BatchAskResult(index=index, question=question, **response.model_dump())
+
+        tasks = [asyncio.create_task(generate(index)) for index in pending]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The consumer went away (e.g. the client disconnected); stop the remaining generations.
+            for task in tasks:
+                task.cancel()
+
+    async def _pack(self, prepared: _PreparedAnswer, source_chunks: list[SourceChunk]) -> None:
+        packed = await run_in_threadpool(self.context_packer.pack, source_chunks, self.llm_service.model_name)
+        prepared.context = packed.text
+        # Only cite what the model was shown.
+        prepared.sources = [
             SourceInfo(
                 chunk_id=chunk.chunk_id,
                 document_id=chunk.document_id,
                 document_name=chunk.document_name,
                 chunk_index=chunk.chunk_index,
                 score=chunk.score,
+                score_kind=chunk.score_kind,
                 snippet=chunk.content[:400],
             )
             for chunk in source_chunks
+            if chunk.chunk_id in packed.chunk_ids
         ]
 
-        return AskResponse(answer=answer, sources=sources)
+    def _remember_answer(self, user_id: str, question: str, prepared: _PreparedAnswer, response: AskResponse) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                user_id, prepared.corpus_version, prepared.top_k, question, response, prepared.query_embedding
+            )
+
+    def _corpus_version(self, user_id: str) -> int:
+        with self.session_factory() as db:
+            return db.query(User.corpus_version).filter(User.id == user_id).scalar() or 0
+
+
+def bump_corpus_version(db: Session, user_id: str) -> None:
+    """Invalidate the user's cached answers; runs inside the caller's transaction."""
+    db.query(User).filter(User.id == user_id).update(
+        {User.corpus_version: func.coalesce(User.corpus_version, 0) + 1}, synchronize_session=False
+    )
+
+
+def build_text_splitter(settings: Settings) -> StreamingTextSplitter | StreamingTokenSplitter:
+    tokenizer = get_tokenizer(settings.tokenizer_encoding)
+    if settings.text_splitter_mode == "tokens":
+        return StreamingTokenSplitter(
+            tokenizer,
+            chunk_size=settings.text_splitter_chunk_size,
+            chunk_overlap=settings.text_splitter_chunk_overlap,
+        )
+    return StreamingTextSplitter(
+        RecursiveCharacterTextSplitter(
+            chunk_size=settings.text_splitter_chunk_size,
+            chunk_overlap=settings.text_splitter_chunk_overlap,
+        ),
+        chunk_size=settings.text_splitter_chunk_size,
+        tokenizer=tokenizer,
+    )
 
 
 @lru_cache
 def build_rag_service() -> RAGService:
     """Factory used by FastAPI dependencies."""
     settings = get_settings()
+    embedding_service = EmbeddingService(settings)
     return RAGService(
         settings=settings,
-        file_storage=FileStorageService(settings.uploads_dir),
-        text_extractor=TextExtractionService(),
-        embedding_service=EmbeddingService(settings),
-        vector_store=VectorStoreService(settings),
+        file_storage=FileStorageService(
+            settings.uploads_dir,
+            max_file_bytes=settings.upload_max_file_mb * 1024 * 1024,
+        ),
+        text_extractor=TextExtractionService(
+            pdf_workers=settings.pdf_extraction_workers,
+            pdf_pages_per_task=settings.pdf_pages_per_task,
+            pdf_timeout_seconds=settings.pdf_extraction_timeout_seconds,
+        ),
+        embedding_service=embedding_service,
+        vector_store=build_vector_store(settings, embedding_service.namespace),
         llm_service=build_llm_service(settings),
+        answer_cache=(
+            AnswerCache(
+                settings.answer_cache_size,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                similarity_threshold=settings.answer_cache_similarity_threshold,
+            )
+            if settings.answer_cache_size > 0
+            else None
+        ),
     )
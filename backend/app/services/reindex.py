@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Sequence
+
+from sqlalchemy.orm import Session
+
+from ..core.config import Settings
+from ..db.session import SessionLocal
+from ..models.document import Document, DocumentChunk, DocumentStatus
+from .chunk_writer import ChunkRecord, write_chunks
+from .embedding import EmbeddingService
+from .rag import RAGService, bump_corpus_version
+from .text_processing import TextExtractionError
+
+logger = logging.getLogger(__name__)
+
+# Settings that change the chunks produced for a document.
+FINGERPRINT_FIELDS = (
+    "text_splitter_mode",
+    "text_splitter_chunk_size",
+    "text_splitter_chunk_overlap",
+    "tokenizer_encoding",
+)
+
+
+def settings_fingerprint(settings: Settings, embedding_service: EmbeddingService) -> str:
+    """Hash of the chunking settings and the embedding provider actually in use.
+
+    The provider is taken from ``embedding_service`` rather than the settings, so that with
+    ``EMBEDDING_PROVIDER=auto`` adding or removing an API key also changes the fingerprint.
+    """
+    values = {name: getattr(settings, name, None) for name in FINGERPRINT_FIELDS}
+    values["embeddings"] = embedding_service.namespace
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Blocking limiter that spaces calls at most ``rate`` per second across threads."""
+
+    def __init__(self, rate: float | None) -> None:
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ReindexCheckpoint:
+    """JSON record of finished documents, keyed to the settings fingerprint they were built with.
+
+    A checkpoint written under different settings is ignored, so changing the chunk size or
+    model mid-way restarts the run instead of mixing old and new vectors.
+    """
+
+    def __init__(self, path: str | Path, fingerprint: str) -> None:
+        self.path = Path(path).expanduser()
+        self.fingerprint = fingerprint
+        self.done: set[str] = set()
+        self.failed: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("fingerprint") != self.fingerprint:
+            logger.info("Checkpoint %s was written with different settings; starting over", self.path)
+            return
+        self.done = set(data.get("done", []))
+        self.failed = dict(data.get("failed", {}))
+
+    def mark_done(self, document_id: str) -> None:
+        with self._lock:
+            self.done.add(document_id)
+            self.failed.pop(document_id, None)
+            self._save()
+
+    def mark_failed(self, document_id: str, error: str) -> None:
+        with self._lock:
+            self.failed[document_id] = error
+            self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        payload = {"fingerprint": self.fingerprint, "done": sorted(self.done), "failed": self.failed}
+        temp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(temp_path, self.path)
+
+
+@dataclass
+class ReindexReport:
+    reindexed: int = 0
+    skipped: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+class Reindexer:
+    """Rebuild chunks and vectors of indexed documents from their stored files.
+
+    New vectors are staged invisibly while a document is processed. The swap then replaces
+    the old vectors with them and the chunk rows in one transaction, so queries see either the
+    old or the new index of a document, never both.
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        settings: Settings,
+        checkpoint: ReindexCheckpoint,
+        workers: int = 2,
+        requests_per_second: float | None = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.rag_service = rag_service
+        self.settings = settings
+        self.checkpoint = checkpoint
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(requests_per_second)
+        self.session_factory = session_factory
+
+    def run(self, document_ids: Sequence[str] | None = None, user_id: str | None = None) -> ReindexReport:
+        report = ReindexReport()
+        with self.session_factory() as db:
+            query = db.query(Document.id).filter(Document.status == DocumentStatus.INDEXED.value)
+            if document_ids:
+                query = query.filter(Document.id.in_(list(document_ids)))
+            if user_id:
+                query = query.filter(Document.user_id == user_id)
+            candidates = [row.id for row in query.order_by(Document.created_at)]
+
+        pending = [document_id for document_id in candidates if document_id not in self.checkpoint.done]
+        report.skipped = len(candidates) - len(pending)
+        logger.info("Reindexing %d document(s), %d already done", len(pending), report.skipped)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reindex") as executor:
+            futures = {executor.submit(self.reindex_document, document_id): document_id for document_id in pending}
+            for future in as_completed(futures):
+                document_id = futures[future]
+                try:
+                    chunk_count = future.result()
+                except Exception as exc:
+                    logger.exception("Reindexing %s failed", document_id)
+                    report.failed[document_id] = str(exc) or exc.__class__.__name__
+                    self.checkpoint.mark_failed(document_id, report.failed[document_id])
+                    continue
+                if chunk_count is None:
+                    report.skipped += 1
+                else:
+                    report.reindexed += 1
+                    logger.info("Reindexed %s into %d chunk(s)", document_id, chunk_count)
+                self.checkpoint.mark_done(document_id)
+        return report
+
+    def reindex_document(self, document_id: str) -> int | None:
+        """Rebuild one document; returns its new chunk count, or None if it was skipped."""
+        with self.session_factory() as db:
+            document = db.get(Document, document_id)
+            if document is None or document.status != DocumentStatus.INDEXED.value:
+                return None
+            db.expunge(document)
+
+        staged = self._stage(document)
+        try:
+            return self._swap(document, staged)
+        except Exception:
+            self.rag_service.vector_store.delete_chunks([record.id for record in staged], document.user_id)
+            raise
+
+    def _stage(self, document: Document) -> list[ChunkRecord]:
+        service = self.rag_service
+        segments = service.text_extractor.iter_text(Path(document.stored_path), document.content_type)
+        chunk_stream = service.text_splitter.split(segments)
+        batch_size = max(1, self.settings.embedding_batch_size)
+
+        staged: list[ChunkRecord] = []
+        try:
+            while batch := list(islice(chunk_stream, batch_size)):
+                self.limiter.acquire()
+                embeddings = service.embedding_service.embed_documents([chunk.text for chunk in batch])
+                records = [
+                    ChunkRecord(
+                        document_id=document.id,
+                        chunk_index=len(staged) + offset,
+                        content=chunk.text,
+                        token_count=chunk.token_count,
+                    )
+                    for offset, chunk in enumerate(batch)
+                ]
+                service.vector_store.add_document_chunks(document, records, embeddings, document.user_id, staged=True)
+                staged.extend(records)
+        except BaseException:
+            service.vector_store.delete_chunks([record.id for record in staged], document.user_id)
+            raise
+
+        if not staged:
+            raise TextExtractionError(f"No text found in {document.filename}")
+        return staged
+
+    def _swap(self, document: Document, staged: list[ChunkRecord]) -> int | None:
+        vector_store = self.rag_service.vector_store
+        with self.session_factory() as db:
+            current = db.get(Document, document.id)
+            # The document may have been deleted or requeued while its new index was built.
+            if current is None or current.status != DocumentStatus.INDEXED.value:
+                vector_store.delete_chunks([record.id for record in staged], document.user_id)
+                return None
+
+            old_ids = [row.id for row in db.query(DocumentChunk.id).filter(DocumentChunk.document_id == document.id)]
+            try:
+                db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete(
+                    synchronize_session=False
+                )
+                write_chunks(db, staged)
+                bump_corpus_version(db, current.user_id)
+                current.chunk_count = len(staged)
+                current.embedding_count = len(staged)
+                db.flush()
+                # Swapped last before the commit: if it fails, the rows roll back and the old vectors stay.
+                vector_store.replace_chunks(current, old_ids, staged, current.user_id)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        self.rag_service.lexical_index.replace_document_chunks(document, staged, document.user_id)
+        return len(staged)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import List, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+
+from .concurrency import SingleFlight
+from .embedding_cache import normalize_query
+from .lexical_index import LexicalIndexService
+from .reranker import Reranker
+from .vector_store import SourceChunk, VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[SourceChunk]], k: int = 60) -> List[SourceChunk]:
+    """Merge ranked lists by summing ``1 / (k + rank)`` per chunk; ``score`` becomes the fused score.
+
+    The inputs' scores are not comparable (a distance and a BM25 score), so only ranks are used.
+    """
+    fused: dict[str, float] = {}
+    chunks: dict[str, SourceChunk] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused[chunk.chunk_id] = fused.get(chunk.chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk.chunk_id, chunk)
+
+    ordered = sorted(fused, key=fused.__getitem__, reverse=True)
+    return [
+        SourceChunk(
+            chunk_id=chunk_id,
+            document_id=chunks[chunk_id].document_id,
+            document_name=chunks[chunk_id].document_name,
+            chunk_index=chunks[chunk_id].chunk_index,
+            content=chunks[chunk_id].content,
+            score=round(fused[chunk_id], 6),
+            score_kind="rrf",
+        )
+        for chunk_id in ordered
+    ]
+
+
+class Retriever:
+    """Fetch the chunks most relevant to a question by dense, lexical or hybrid search.
+
+    Hybrid mode runs both searches concurrently for ``candidates`` results each and merges
+    them with reciprocal rank fusion. With a ``reranker``, ``rerank_candidates`` results are
+    fetched first, rescored, and the best ``top_k`` at or above ``rerank_min_score`` are kept.
+    Reranking that does not finish within ``rerank_budget_ms`` (queueing included) is skipped,
+    and the first-stage order is used.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStoreService,
+        lexical_index: LexicalIndexService,
+        mode: str = "hybrid",
+        candidates: int = 20,
+        rrf_k: int = 60,
+        coalesce: bool = True,
+        reranker: Reranker | None = None,
+        rerank_candidates: int = 20,
+        rerank_budget_ms: float = 300.0,
+        rerank_min_score: float = 0.0,
+        rerank_workers: int = 2,
+    ) -> None:
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {', '.join(RETRIEVAL_MODES)}")
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.mode = mode
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.flights = SingleFlight("retrieval", enabled=coalesce)
+
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.rerank_min_score = rerank_min_score
+        self.reranked = 0
+        self.rerank_skipped = 0
+        self.rerank_dropped = 0
+        # A dedicated pool: slow scoring queues here instead of holding the shared request threads,
+        # and work still queued when its budget runs out is cancelled before it starts.
+        self._rerank_executor = (
+            ThreadPoolExecutor(max_workers=max(1, rerank_workers), thread_name_prefix="rerank") if reranker else None
+        )
+
+    @property
+    def uses_embeddings(self) -> bool:
+        return self.mode != "lexical"
+
+    async def retrieve(
+        self, user_id: str, question: str, query_embedding: List[float] | None, top_k: int
+    ) -> List[SourceChunk]:
+        # Equal normalised questions have equal embeddings (the query cache relies on it too).
+        key = (user_id, normalize_query(question), top_k)
+        return await self.flights.do(key, lambda: self._retrieve(user_id, question, query_embedding, top_k))
+
+    async def _retrieve(
+        self, user_id: str, question: str, query_embedding: List[float] | None, top_k: int
+    ) -> List[SourceChunk]:
+        hits = await self._search(user_id, question, query_embedding, self._fetch_size(top_k))
+        return await self._rerank(question, hits, top_k)
+
+    def _fetch_size(self, top_k: int) -> int:
+        return max(top_k, self.rerank_candidates) if self.reranker else top_k
+
+    async def _search(
+        self, user_id: str, question: str, query_embedding: List[float] | None, limit: int
+    ) -> List[SourceChunk]:
+        if self.mode == "dense":
+            return await self.vector_store.aquery(user_id, query_embedding, limit)
+        if self.mode == "lexical":
+            # SQLite FTS5 has no async interface.
+            return await run_in_threadpool(self.lexical_index.query, user_id, question, limit)
+
+        fused_limit = limit
+        limit = max(limit, self.candidates)
+        dense, lexical = await asyncio.gather(
+            self.vector_store.aquery(user_id, query_embedding, limit),
+            run_in_threadpool(self.lexical_index.query, user_id, question, limit),
+        )
+        return reciprocal_rank_fusion([dense, lexical], k=self.rrf_k)[:fused_limit]
+
+    async def _rerank(self, question: str, chunks: List[SourceChunk], top_k: int) -> List[SourceChunk]:
+        if self.reranker is None or not chunks:
+            return chunks[:top_k]
+
+        scoring = asyncio.get_running_loop().run_in_executor(
+            self._rerank_executor, self.reranker.score, question, chunks
+        )
+        try:
+            if self.rerank_budget_ms > 0:
+                scores = await asyncio.wait_for(scoring, self.rerank_budget_ms / 1000)
+            else:
+                scores = await scoring
+        except asyncio.TimeoutError:
+            self.rerank_skipped += 1
+            logger.info("Reranking exceeded %.0f ms; using first-stage order", self.rerank_budget_ms)
+            return chunks[:top_k]
+
+        self.reranked += 1
+        ranked = sorted(
+            (replace(chunk, score=round(score, 6), score_kind="rerank") for chunk, score in zip(chunks, scores)),
+            key=lambda chunk: chunk.score,
+            reverse=True,
+        )
+        kept = [chunk for chunk in ranked if chunk.score >= self.rerank_min_score]
+        self.rerank_dropped += len(ranked) - len(kept)
+        return kept[:top_k]
+
+    async def retrieve_many(
+        self,
+        user_id: str,
+        questions: Sequence[str],
+        query_embeddings: Sequence[List[float]] | None,
+        top_k: int,
+    ) -> List[List[SourceChunk]]:
+        """``retrieve`` for several questions; the dense side is a single multi-embedding vector search."""
+        limit = self._fetch_size(top_k)
+        rankings = await self._search_many(user_id, questions, query_embeddings, limit)
+        return list(
+            await asyncio.gather(*(self._rerank(question, hits, top_k) for question, hits in zip(questions, rankings)))
+        )
+
+    async def _search_many(
+        self,
+        user_id: str,
+        questions: Sequence[str],
+        query_embeddings: Sequence[List[float]] | None,
+        limit: int,
+    ) -> List[List[SourceChunk]]:
+        if self.mode == "dense":
+            return await self.vector_store.aquery_many(user_id, query_embeddings, limit)
+
+        fused_limit = limit
+        limit = limit if self.mode == "lexical" else max(limit, self.candidates)
+        lexical_search = asyncio.gather(
+            *(run_in_threadpool(self.lexical_index.query, user_id, question, limit) for question in questions)
+        )
+        if self.mode == "lexical":
+            return list(await lexical_search)
+
+        dense, lexical = await asyncio.gather(
+            self.vector_store.aquery_many(user_id, query_embeddings, limit), lexical_search
+        )
+        return [
+            reciprocal_rank_fusion([dense_hits, lexical_hits], k=self.rrf_k)[:fused_limit]
+            for dense_hits, lexical_hits in zip(dense, lexical)
+        ]
+
+    def stats(self) -> dict[str, int | str | None]:
+        return {
+            "reranker": self.reranker.name if self.reranker else None,
+            "reranked": self.reranked,
+            "skipped_over_budget": self.rerank_skipped,
+            "dropped_below_cutoff": self.rerank_dropped,
+        }
@@ -1,48 +1,334 @@
 from __future__ import annotations
 
+import codecs
+import logging
+import multiprocessing
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
 
-from langchain_community.document_loaders import PyPDFLoader
-import tiktoken 
+from langchain.text_splitter import TextSplitter
 from pypdf import PdfReader
 
+from . import pdf_worker
+from .tokenizer import Tokenizer
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[float], None]
+
+TEXT_READ_SIZE = 64 * 1024
+PAGE_SEPARATOR = "\n\n"
+
 
 class TextExtractionError(Exception):
     """Raised when text cannot be extracted from an upload."""
 
 
+class ExtractionInterruptedError(TextExtractionError):
+    """Raised when another document's timeout killed the shared PDF pool mid-extraction.
+
+    The document itself is not at fault, so the ingestion queue retries it without using up
+    an attempt.
+    """
+
+
 class TextExtractionService:
     """Extract raw text content from supported document formats."""
 
     SUPPORTED_EXTENSIONS = {".txt", ".pdf"}
 
+    def __init__(
+        self,
+        pdf_workers: int = 0,
+        pdf_pages_per_task: int = 16,
+        pdf_timeout_seconds: float = 120.0,
+    ) -> None:
+        """``pdf_workers > 0`` parses PDFs in a dedicated process pool, off the GIL of the API process.
+
+        Each PDF is split into ranges of ``pdf_pages_per_task`` pages that are parsed in parallel
+        and yielded in page order. ``pdf_timeout_seconds`` bounds the time a document may spend
+        waiting on extraction; when exceeded, the pool's processes are killed and replaced, and
+        other documents caught in the same pool fail with ``ExtractionInterruptedError``.
+        """
+        self.pdf_workers = pdf_workers
+        self.pdf_pages_per_task = max(1, pdf_pages_per_task)
+        self.pdf_timeout_seconds = pdf_timeout_seconds
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        # Which pool ran a job, and which pools were killed on a timeout rather than crashing.
+        self._job_pools: weakref.WeakKeyDictionary[Future, ProcessPoolExecutor] = weakref.WeakKeyDictionary()
+        self._killed_pools: weakref.WeakSet[ProcessPoolExecutor] = weakref.WeakSet()
+
     def extract_text(self, file_path: Path, content_type: str | None = None) -> str:
+        return "".join(self.iter_text(file_path, content_type))
+
+    def iter_text(
+        self,
+        file_path: Path,
+        content_type: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> Iterator[str]:
+        """Yield the document text in segments that concatenate to the full text.
+
+        PDFs are read one page at a time and text files in fixed-size blocks, so callers can
+        process arbitrarily large files without holding the whole text in memory.
+        ``on_progress`` receives the fraction of the source consumed after each segment.
+        """
         suffix = file_path.suffix.lower()
         if suffix not in self.SUPPORTED_EXTENSIONS:
             raise TextExtractionError(f"Unsupported file type: {suffix}")
 
         if suffix == ".txt":
-            return file_path.read_text(encoding="utf-8", errors="ignore")
+            return self._iter_txt(file_path, on_progress)
         if suffix == ".pdf":
-            res = self._extract_pdf(file_path)
-            print(len(tiktoken.get_encoding("cl100k_base").encode(res)))
-            return res
+            if self.pdf_workers > 0:
+                return self._iter_pdf_parallel(file_path, on_progress)
+            return self._iter_pdf(file_path, on_progress)
 
         raise TextExtractionError(f"Unsupported file type: {suffix}")
 
     @staticmethod
-    def _extract_pdf(file_path: Path) -> str:
-        # Prefer LangChain's PDF loader for more resilient extraction (handles layout quirks, encodings, etc.).
+    def _iter_txt(file_path: Path, on_progress: ProgressCallback | None) -> Iterator[str]:
+        total = file_path.stat().st_size or 1
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        consumed = 0
+        with file_path.open("rb") as handle:
+            while block := handle.read(TEXT_READ_SIZE):
+                consumed += len(block)
+                text = decoder.decode(block)
+                if on_progress:
+                    on_progress(consumed / total)
+                if text:
+                    yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    @staticmethod
+    def _iter_pdf(file_path: Path, on_progress: ProgressCallback | None) -> Iterator[str]:
         try:
-            docs = PyPDFLoader(str(file_path)).load()
-            if docs:
-                return "\n\n".join(doc.page_content.strip() for doc in docs if doc.page_content)
+            reader = PdfReader(str(file_path))
+            total = len(reader.pages) or 1
         except Exception as exc:
-            print(f"LangChain PDF extraction failed for {file_path}: {exc}")
-
-        reader = PdfReader(str(file_path))
-        pages_text: list[str] = []
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            pages_text.append(page_text.strip())
-        return "\n\n".join(filter(None, pages_text))
+            raise TextExtractionError(f"Unable to read PDF {file_path.name}: {exc}") from exc
+
+        emitted = False
+        for index, page in enumerate(reader.pages, start=1):
+            try:
+                page_text = (page.extract_text() or "").strip()
+            except Exception as exc:
+                logger.warning("PDF page %d extraction failed for %s: %s", index, file_path, exc)
+                page_text = ""
+            if on_progress:
+                on_progress(index / total)
+            if not page_text:
+                continue
+            yield f"{PAGE_SEPARATOR}{page_text}" if emitted else page_text
+            emitted = True
+
+    def _iter_pdf_parallel(self, file_path: Path, on_progress: ProgressCallback | None) -> Iterator[str]:
+        path = str(file_path)
+        waited = [0.0]
+        total = self._await(self._submit(pdf_worker.count_pages, path), file_path, waited)
+        ranges = [
+            (start, min(start + self.pdf_pages_per_task, total))
+            for start in range(0, total, self.pdf_pages_per_task)
+        ]
+
+        # A bounded window of in-flight ranges keeps memory flat for very large PDFs.
+        pending: deque[Future] = deque()
+        next_range = 0
+        emitted = False
+        try:
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < self.pdf_workers * 2:
+                    pending.append(self._submit(pdf_worker.extract_page_range, path, *ranges[next_range]))
+                    next_range += 1
+
+                texts = self._await(pending.popleft(), file_path, waited)
+                if on_progress:
+                    on_progress((next_range - len(pending)) / (len(ranges) or 1))
+                for page_text in texts:
+                    if not page_text:
+                        continue
+                    yield f"{PAGE_SEPARATOR}{page_text}" if emitted else page_text
+                    emitted = True
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._pool_lock:
+            # A pool whose worker died (e.g. killed after another document's timeout) is unusable.
+            if self._pool is None or getattr(self._pool, "_broken", False):
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.pdf_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._pool.submit(fn, *args)
+            self._job_pools[future] = self._pool
+            return future
+
+    def _await(self, future: Future, file_path: Path, waited: list[float]) -> Any:
+        """Wait for a pool result, charging the wait against the document's extraction timeout."""
+        remaining = self.pdf_timeout_seconds - waited[0]
+        pool = self._job_pools.get(future)
+        started = time.monotonic()
+        try:
+            return future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            self._kill_pool(pool)
+            raise TextExtractionError(
+                f"PDF extraction timed out after {self.pdf_timeout_seconds:g}s for {file_path.name}"
+            ) from None
+        except BrokenProcessPool as exc:
+            if pool in self._killed_pools:
+                raise ExtractionInterruptedError(
+                    f"PDF extraction of {file_path.name} was interrupted by another document's timeout"
+                ) from exc
+            raise TextExtractionError(f"PDF extraction worker crashed while reading {file_path.name}") from exc
+        except Exception as exc:
+            raise TextExtractionError(f"Unable to read PDF {file_path.name}: {exc}") from exc
+        finally:
+            waited[0] += time.monotonic() - started
+
+    def _kill_pool(self, pool: ProcessPoolExecutor | None) -> None:
+        """Terminate worker processes so a pathological PDF cannot keep a core busy forever.
+
+        Jobs of other documents sharing the pool fail with ``ExtractionInterruptedError``.
+        """
+        with self._pool_lock:
+            if pool is None or pool is not self._pool:
+                return
+            self._pool = None
+            self._killed_pools.add(pool)
+        # ProcessPoolExecutor has no public way to stop a running task.
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(slots=True)
+class TextChunk:
+    text: str
+    token_count: int
+
+
+class StreamingTextSplitter:
+    """Split a stream of text segments into overlapping chunks without buffering the whole text.
+
+    Only the trailing, not-yet-complete chunk is carried between segments. That chunk already
+    begins with the overlap of its predecessor, so chunks keep their overlap across page
+    boundaries and together cover the whole text. Boundaries can still differ slightly from a
+    one-shot split, since the splitter picks separators within each buffer rather than the
+    whole text. Chunks are sized in characters by ``splitter``; ``tokenizer`` only measures them.
+    """
+
+    def __init__(self, splitter: TextSplitter, chunk_size: int, tokenizer: Tokenizer) -> None:
+        self.splitter = splitter
+        self.chunk_size = chunk_size
+        self.tokenizer = tokenizer
+
+    def split(self, segments: Iterable[str]) -> Iterator[TextChunk]:
+        for text in self._split_text(segments):
+            yield TextChunk(text=text, token_count=self.tokenizer.count(text))
+
+    def _split_text(self, segments: Iterable[str]) -> Iterator[str]:
+        buffer = ""
+        for segment in segments:
+            buffer += segment
+            # Re-splitting is only worthwhile once the buffer holds more than one chunk.
+            if len(buffer) < self.chunk_size * 2:
+                continue
+            chunks = self.splitter.split_text(buffer)
+            if len(chunks) > 1:
+                yield from chunks[:-1]
+                # Keep the raw tail rather than the stripped chunk so whitespace at a segment
+                # boundary is not lost when the next segment is appended.
+                start = buffer.rfind(chunks[-1])
+                buffer = buffer[start:] if start >= 0 else chunks[-1]
+
+        if buffer.strip():
+            yield from self.splitter.split_text(buffer)
+
+
+class StreamingTokenSplitter:
+    """Split a stream of text segments into windows of ``chunk_size`` tokens overlapping by ``chunk_overlap``.
+
+    Every segment is encoded once, and chunk token counts come from the same encoding. The last
+    word of a segment is carried into the next one so words that straddle a segment boundary
+    are tokenized as a whole.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, chunk_size: int, chunk_overlap: int) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = max(0, chunk_overlap)
+
+    def split(self, segments: Iterable[str]) -> Iterator[TextChunk]:
+        tokens: list = []
+        carry = ""
+        # Tokens at the front of ``tokens`` that were already emitted as the previous overlap.
+        emitted_overlap = 0
+        step = self.chunk_size - self.chunk_overlap
+
+        for segment in segments:
+            text = carry + segment
+            cut = _last_word_start(text)
+            carry = text[cut:]
+            if cut:
+                tokens.extend(self.tokenizer.encode(text[:cut]))
+            while len(tokens) >= self.chunk_size:
+                chunk = self._make_chunk(tokens[: self.chunk_size])
+                if chunk:
+                    yield chunk
+                del tokens[:step]
+                emitted_overlap = self.chunk_overlap
+
+        if carry:
+            tokens.extend(self.tokenizer.encode(carry))
+        while len(tokens) > emitted_overlap:
+            chunk = self._make_chunk(tokens[: self.chunk_size])
+            if chunk:
+                yield chunk
+            if len(tokens) <= self.chunk_size:
+                break
+            del tokens[:step]
+            emitted_overlap = self.chunk_overlap
+
+    def _make_chunk(self, window: list) -> TextChunk | None:
+        text = self.tokenizer.decode(window).strip()
+        return TextChunk(text=text, token_count=len(window)) if text else None
+
+
+def _last_word_start(text: str) -> int:
+    """Index where the trailing whitespace and partial word begin.
+
+    Tokenizers attach leading whitespace to the following word, so the whitespace before the
+    last word is carried over with it.
+    """
+    cut = len(text)
+    while cut and not text[cut - 1].isspace():
+        cut -= 1
+        # Text without whitespace (e.g. a long base64 blob) is not worth carrying over.
+        if len(text) - cut > TEXT_READ_SIZE:
+            return len(text)
+    while cut and text[cut - 1].isspace():
+        cut -= 1
+    return cut
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Words with their leading whitespace, or single punctuation marks; joining the pieces restores the text.
+_PIECE_PATTERN = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")
+
+
+class Tokenizer:
+    """Encode text to tokens and back. Tokens are opaque and only meaningful to the same tokenizer."""
+
+    name = "base"
+
+    def encode(self, text: str) -> list[Any]:
+        raise NotImplementedError
+
+    def decode(self, tokens: Sequence[Any]) -> str:
+        raise NotImplementedError
+
+    def count(self, text: str) -> int:
+        return len(self.encode(text))
+
+
+class TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding: Any) -> None:
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def encode(self, text: str) -> list[int]:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def decode(self, tokens: Sequence[int]) -> str:
+        # A token window may start or end inside a multi-byte character.
+        return self.encoding.decode_bytes(list(tokens)).decode("utf-8", errors="ignore")
+
+
+class RegexTokenizer(Tokenizer):
+    """Word/punctuation pieces; used when no BPE encoding can be loaded (e.g. offline)."""
+
+    name = "regex"
+
+    def encode(self, text: str) -> list[str]:
+        return _PIECE_PATTERN.findall(text)
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache
+def get_tokenizer(encoding_name: str = "cl100k_base") -> Tokenizer:
+    """Return the process-wide tokenizer for ``encoding_name``, loading the encoding only once.
+
+    Falls back to ``RegexTokenizer`` when tiktoken is missing or the encoding file cannot be
+    downloaded, so ingestion keeps working without network access.
+    """
+    if tiktoken is not None:
+        try:
+            return TiktokenTokenizer(tiktoken.get_encoding(encoding_name))
+        except Exception as exc:
+            logger.warning("Could not load tiktoken encoding %s (%s); using regex tokenizer", encoding_name, exc)
+    return RegexTokenizer()
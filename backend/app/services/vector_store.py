@@ -1,32 +1,157 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Sequence
+from typing import Any, List, Sequence
+
+import asyncio
 
 import chromadb
 from chromadb import Settings as ChromaSettings
+from fastapi.concurrency import run_in_threadpool
 
 from ..core.config import Settings
 from ..models.document import Document, DocumentChunk
+from .chunk_writer import ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+STAGED_USER_PREFIX = "__staged__:"
+SHARED_COLLECTION = "documents"
+SHARD_MODES = ("none", "user", "bucket")
+# Records which embedding namespace owns the unsuffixed collections.
+INDEX_REGISTRY = "index-registry"
+
+
+def namespace_suffix(namespace: str) -> str:
+    """Suffix of the collections (or index directory) holding vectors of another embedding namespace."""
+    return f"_e_{hashlib.sha256(namespace.encode('utf-8')).hexdigest()[:12]}"
 
 
 @dataclass
 class SourceChunk:
+    """A retrieved chunk; ``score_kind`` names the stage that set ``score`` and so how to read it.
+
+    ``distance`` (vector search) is better when lower. ``bm25`` (keyword search), ``rrf`` (fused
+    ranks) and ``rerank`` (in ``[0, 1]``) are better when higher.
+    """
+
     chunk_id: str
     document_id: str
     document_name: str
     chunk_index: int
     content: str
     score: float | None = None
+    score_kind: str | None = None
+
+
+ChunkLike = DocumentChunk | ChunkRecord
 
 
 class VectorStoreService:
-    """Wrapper around ChromaDB for persisting and retrieving embeddings."""
+    """Interface of the embedding index; ``build_vector_store`` picks the backend from settings.
+
+    Vectors are identified by chunk id and carry the owning user, document and chunk position.
+    ``staged`` vectors are invisible to ``query`` until ``publish_chunks`` is called.
+
+    Each embedding namespace (provider, model and dimension) has an index of its own. The first
+    namespace to open a store keeps the unsuffixed location; any other one is stored separately,
+    so a reindex for a new model never writes into the index the running API searches.
+    """
+
+    def add_document_chunks(
+        self,
+        document: Document,
+        chunks: Sequence[ChunkLike],
+        embeddings: Sequence[List[float]],
+        user_id: str,
+        staged: bool = False,
+    ) -> None:
+        raise NotImplementedError
+
+    def publish_chunks(self, document: Document, chunks: Sequence[ChunkLike], user_id: str) -> None:
+        raise NotImplementedError
+
+    def replace_chunks(
+        self, document: Document, old_ids: Sequence[str], chunks: Sequence[ChunkLike], user_id: str
+    ) -> None:
+        """Delete ``old_ids`` and publish the staged ``chunks`` in their place.
+
+        Queries never see both sets. Backends that cannot do this atomically delete first, so a
+        query racing the swap may briefly miss the document rather than match it twice.
+        """
+        self.delete_chunks(old_ids, user_id)
+        self.publish_chunks(document, chunks, user_id)
+
+    def delete_chunks(self, chunk_ids: Sequence[str], user_id: str | None = None) -> None:
+        """Delete vectors by id; ``user_id`` lets sharded backends skip other users' data."""
+        raise NotImplementedError
+
+    def delete_document_embeddings(self, document_id: str, user_id: str | None = None) -> None:
+        raise NotImplementedError
+
+    def get_embeddings(self, chunk_ids: Sequence[str], user_id: str | None = None) -> dict[str, List[float]]:
+        """Return stored vectors keyed by chunk id; ids without a vector are omitted."""
+        raise NotImplementedError
+
+    def query(self, user_id: str, query_embedding: List[float], limit: int = 4) -> List[SourceChunk]:
+        """Return the ``limit`` nearest published chunks of the user, nearest first.
+
+        ``score`` is a distance (``score_kind="distance"``), so lower means more similar.
+        """
+        raise NotImplementedError
+
+    def query_many(
+        self, user_id: str, query_embeddings: Sequence[List[float]], limit: int = 4
+    ) -> List[List[SourceChunk]]:
+        """``query`` for several embeddings at once, one result list per embedding, in order."""
+        return [self.query(user_id, embedding, limit) for embedding in query_embeddings]
+
+    async def aquery(self, user_id: str, query_embedding: List[float], limit: int = 4) -> List[SourceChunk]:
+        """Async ``query``; backends without an async client run it in a worker thread."""
+        return await run_in_threadpool(self.query, user_id, query_embedding, limit)
+
+    async def aquery_many(
+        self, user_id: str, query_embeddings: Sequence[List[float]], limit: int = 4
+    ) -> List[List[SourceChunk]]:
+        return await run_in_threadpool(self.query_many, user_id, query_embeddings, limit)
+
+    def upsert_document_chunks(
+        self,
+        document: Document,
+        chunks: Sequence[ChunkLike],
+        embeddings: Sequence[List[float]],
+        user_id: str,
+    ) -> None:
+        if not chunks or not embeddings:
+            return
+
+        self.delete_document_embeddings(document.id, user_id)
+        self.add_document_chunks(document, chunks, embeddings, user_id)
+
+
+class ChromaVectorStore(VectorStoreService):
+    """Wrapper around ChromaDB for persisting and retrieving embeddings.
 
-    def __init__(self, settings: Settings) -> None:
+    With ``CHROMA_SHARD_MODE=user`` every user gets a collection of their own, and with
+    ``bucket`` users are hashed into ``CHROMA_SHARD_BUCKETS`` collections. Collections are
+    created on first use and cached, so searches and deletes only touch the owner's shard.
+    ``none`` keeps the single shared ``documents`` collection. Collections of an embedding
+    namespace other than the one recorded in ``index-registry`` carry ``namespace_suffix``.
+    """
+
+    def __init__(self, settings: Settings, namespace: str = "") -> None:
         self._using_http = bool(settings.chroma_server_host)
         telemetry_settings = ChromaSettings(allow_reset=True, anonymized_telemetry=False)
+        self._settings = settings
+        self._telemetry_settings = telemetry_settings
+        # Queries against a Chroma server go through chromadb's AsyncHttpClient, created on first use.
+        self._async_client: Any = None
+        self._async_collections: dict[str, Any] = {}
+        self._async_lock = asyncio.Lock()
 
         if self._using_http:
             self._client = chromadb.HttpClient(
@@ -42,57 +167,227 @@ class VectorStoreService:
                 path=str(path),
                 settings=telemetry_settings,
             )
-        self._collection = self._client.get_or_create_collection(name="documents")
+        if settings.chroma_shard_mode not in SHARD_MODES:
+            raise ValueError(f"Unknown CHROMA_SHARD_MODE {settings.chroma_shard_mode!r}; expected one of {SHARD_MODES}")
+        self.shard_mode = settings.chroma_shard_mode
+        self.shard_buckets = max(1, settings.chroma_shard_buckets)
+        self._collections: dict[str, Any] = {}
+        self._collections_lock = threading.Lock()
+        self.suffix = self._namespace_suffix(namespace)
+        if self.shard_mode != "none":
+            self._warn_if_unmigrated()
 
-    def upsert_document_chunks(
+    def _namespace_suffix(self, namespace: str) -> str:
+        if not namespace:
+            return ""
+        registry = self._client.get_or_create_collection(name=INDEX_REGISTRY)
+        owner = registry.get(ids=["owner"], include=["metadatas"])
+        if not owner.get("ids"):
+            registry.add(ids=["owner"], embeddings=[[0.0]], metadatas=[{"namespace": namespace}])
+            return ""
+        if (owner["metadatas"][0] or {}).get("namespace") == namespace:
+            return ""
+        return namespace_suffix(namespace)
+
+    @property
+    def shared_collection(self) -> str:
+        return f"{SHARED_COLLECTION}{self.suffix}"
+
+    def _warn_if_unmigrated(self) -> None:
+        names = {getattr(entry, "name", entry) for entry in self._client.list_collections()}
+        if self.shared_collection in names and self._client.get_collection(self.shared_collection).count():
+            logger.warning(
+                "Chroma collection %r still holds vectors but CHROMA_SHARD_MODE=%s; "
+                "run `python -m app.cli.shard_chroma` to move them into shards",
+                self.shared_collection,
+                self.shard_mode,
+            )
+
+    def collection_name(self, user_id: str) -> str:
+        if self.shard_mode == "none":
+            return self.shared_collection
+        digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+        if self.shard_mode == "user":
+            return f"{SHARED_COLLECTION}_u_{digest[:32]}{self.suffix}"
+        return f"{SHARED_COLLECTION}_b_{int(digest, 16) % self.shard_buckets:04d}{self.suffix}"
+
+    def collection(self, name: str, create: bool = True) -> Any | None:
+        """Return a cached collection; with ``create=False`` a missing one yields None."""
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if create:
+                    collection = self._client.get_or_create_collection(name=name)
+                else:
+                    try:
+                        collection = self._client.get_collection(name=name)
+                    except Exception:  # pragma: no cover - Chroma raises custom errors
+                        return None
+                self._collections[name] = collection
+            return collection
+
+    def _collection_for(self, user_id: str, create: bool = True) -> Any | None:
+        return self.collection(self.collection_name(user_id), create=create)
+
+    def _candidate_collections(self, user_id: str | None) -> list[Any]:
+        """The owner's shard, or every document collection when the owner is unknown."""
+        if user_id is not None or self.shard_mode == "none":
+            collection = self._collection_for(user_id or "", create=False)
+            return [collection] if collection is not None else []
+        names = [getattr(entry, "name", entry) for entry in self._client.list_collections()]
+        return [self.collection(name) for name in names if name == SHARED_COLLECTION or name.startswith(f"{SHARED_COLLECTION}_")]
+
+    def add_document_chunks(
         self,
         document: Document,
-        chunks: Sequence[DocumentChunk],
+        chunks: Sequence[ChunkLike],
         embeddings: Sequence[List[float]],
         user_id: str,
+        staged: bool = False,
     ) -> None:
+        """Append a batch of chunks to a document's embeddings without touching earlier batches.
+
+        ``staged`` vectors are stored under a user id no query matches until ``publish_chunks``.
+        """
         if not chunks or not embeddings:
             return
 
         if len(chunks) != len(embeddings):
             raise ValueError("Chunks and embeddings length mismatch")
 
-        self._collection.delete(where={"document_id": document.id})
-
-        self._collection.add(
+        owner = f"{STAGED_USER_PREFIX}{user_id}" if staged else user_id
+        collection = self._collection_for(user_id)
+        collection.add(
             ids=[chunk.id for chunk in chunks],
             embeddings=list(embeddings),
             documents=[chunk.content for chunk in chunks],
-            metadatas=[
-                {
-                    "document_id": document.id,
-                    "document_name": document.filename,
-                    "chunk_index": chunk.chunk_index,
-                    "user_id": user_id,
-                }
-                for chunk in chunks
-            ],
+            metadatas=[self._chunk_metadata(document, chunk, owner) for chunk in chunks],
+        )
+        self._persist(collection)
+
+    def publish_chunks(self, document: Document, chunks: Sequence[ChunkLike], user_id: str) -> None:
+        """Make staged vectors visible to the owner's queries in one metadata update."""
+        if not chunks:
+            return
+        collection = self._collection_for(user_id)
+        collection.update(
+            ids=[chunk.id for chunk in chunks],
+            metadatas=[self._chunk_metadata(document, chunk, user_id) for chunk in chunks],
         )
+        self._persist(collection)
+
+    def delete_chunks(self, chunk_ids: Sequence[str], user_id: str | None = None) -> None:
+        if not chunk_ids:
+            return
+        for collection in self._candidate_collections(user_id):
+            collection.delete(ids=list(chunk_ids))
+            self._persist(collection)
+
+    @staticmethod
+    def _chunk_metadata(document: Document, chunk: ChunkLike, user_id: str) -> dict:
+        return {
+            "document_id": document.id,
+            "document_name": document.filename,
+            "chunk_index": chunk.chunk_index,
+            "user_id": user_id,
+        }
+
+    def _persist(self, collection: Any) -> None:
         if hasattr(self._client, "persist"):
-            self._collection.persist()
+            collection.persist()
+
+    def get_embeddings(self, chunk_ids: Sequence[str], user_id: str | None = None) -> dict[str, List[float]]:
+        if not chunk_ids:
+            return {}
+
+        found: dict[str, List[float]] = {}
+        for collection in self._candidate_collections(user_id):
+            results = collection.get(ids=list(chunk_ids), include=["embeddings"])
+            embeddings = results.get("embeddings")
+            if embeddings is None:
+                continue
+            found.update({chunk_id: list(vector) for chunk_id, vector in zip(results.get("ids", []), embeddings)})
+        return found
 
     def query(self, user_id: str, query_embedding: List[float], limit: int = 4) -> List[SourceChunk]:
         if not query_embedding:
             return []
+        return self.query_many(user_id, [query_embedding], limit)[0]
+
+    def query_many(
+        self, user_id: str, query_embeddings: Sequence[List[float]], limit: int = 4
+    ) -> List[List[SourceChunk]]:
+        """All embeddings go to Chroma in one ``query`` call."""
+        if not len(query_embeddings):
+            return []
+        collection = self._collection_for(user_id, create=False)
+        if collection is None:
+            return [[] for _ in query_embeddings]
 
         try:
-            results = self._collection.query(
-                query_embeddings=[query_embedding],
+            # Bucketed shards hold several users, so the owner filter is kept in every mode.
+            results = collection.query(
+                query_embeddings=list(query_embeddings),
                 n_results=limit,
                 where={"user_id": user_id},
             )
         except Exception:  # pragma: no cover - Chroma raises custom errors
+            return [[] for _ in query_embeddings]
+        return [self._sources(results, position) for position in range(len(query_embeddings))]
+
+    async def aquery(self, user_id: str, query_embedding: List[float], limit: int = 4) -> List[SourceChunk]:
+        if not query_embedding:
             return []
+        return (await self.aquery_many(user_id, [query_embedding], limit))[0]
+
+    async def aquery_many(
+        self, user_id: str, query_embeddings: Sequence[List[float]], limit: int = 4
+    ) -> List[List[SourceChunk]]:
+        if not self._using_http:
+            # The embedded client is synchronous.
+            return await super().aquery_many(user_id, query_embeddings, limit)
+        if not len(query_embeddings):
+            return []
+
+        collection = await self._async_collection(self.collection_name(user_id))
+        if collection is None:
+            return [[] for _ in query_embeddings]
+        try:
+            results = await collection.query(
+                query_embeddings=list(query_embeddings),
+                n_results=limit,
+                where={"user_id": user_id},
+            )
+        except Exception:  # pragma: no cover - Chroma raises custom errors
+            return [[] for _ in query_embeddings]
+        return [self._sources(results, position) for position in range(len(query_embeddings))]
+
+    async def _async_collection(self, name: str) -> Any | None:
+        collection = self._async_collections.get(name)
+        if collection is not None:
+            return collection
+        async with self._async_lock:
+            if self._async_client is None:
+                self._async_client = await chromadb.AsyncHttpClient(
+                    host=self._settings.chroma_server_host,
+                    port=self._settings.chroma_server_port,
+                    ssl=self._settings.chroma_server_ssl,
+                    settings=self._telemetry_settings,
+                )
+            try:
+                collection = await self._async_client.get_collection(name=name)
+            except Exception:  # pragma: no cover - missing shard
+                return None
+            self._async_collections[name] = collection
+            return collection
 
-        ids = results.get("ids", [[]])[0]
-        documents = results.get("documents", [[]])[0]
-        metadatas = results.get("metadatas", [[]])[0]
-        distances = results.get("distances", [[]])[0] if "distances" in results else None
+    @staticmethod
+    def _sources(results: dict, position: int = 0) -> List[SourceChunk]:
+        """Convert the hits of the ``position``-th query embedding of a Chroma result."""
+        ids = (results.get("ids") or [[]])[position]
+        documents = (results.get("documents") or [[]])[position]
+        metadatas = (results.get("metadatas") or [[]])[position]
+        distances = (results.get("distances") or [[]])[position] if "distances" in results else None
 
         sources: list[SourceChunk] = []
         for idx, chunk_id in enumerate(ids):
@@ -105,15 +400,34 @@ class VectorStoreService:
                     chunk_index=int(metadata.get("chunk_index", 0)),
                     content=documents[idx] if idx < len(documents) else "",
                     score=distances[idx] if distances and idx < len(distances) else None,
+                    score_kind="distance",
                 )
             )
         return sources
 
-    def delete_document_embeddings(self, document_id: str) -> None:
-        try:
-            self._collection.delete(where={"document_id": document_id})
-            if hasattr(self._client, "persist"):
-                self._collection.persist()
-        except Exception:
-            # Swallow Chroma errors; downstream code can continue.
-            pass
+    def delete_document_embeddings(self, document_id: str, user_id: str | None = None) -> None:
+        for collection in self._candidate_collections(user_id):
+            try:
+                collection.delete(where={"document_id": document_id})
+                self._persist(collection)
+            except Exception:
+                # Swallow Chroma errors; downstream code can continue.
+                pass
+
+
+def build_vector_store(settings: Settings, namespace: str = "") -> VectorStoreService:
+    """``namespace`` identifies the embeddings stored (``EmbeddingService.namespace``)."""
+    if settings.vector_store_backend == "numpy":
+        from .numpy_vector_store import NumpyVectorStore
+
+        return NumpyVectorStore(
+            settings.numpy_index_dir,
+            compaction_threshold=settings.numpy_index_compaction_threshold,
+            quantization=settings.numpy_index_quantization,
+            rerank_candidates=settings.numpy_index_rerank_candidates,
+            pq_subvectors=settings.numpy_index_pq_subvectors,
+            namespace=namespace,
+        )
+    if settings.vector_store_backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND {settings.vector_store_backend!r}; expected chroma or numpy")
+    return ChromaVectorStore(settings, namespace)
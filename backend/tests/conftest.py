@@ -0,0 +1,99 @@
+"""Shared fixtures: an offline configuration with all storage under a temporary directory."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+_STORAGE = Path(tempfile.mkdtemp(prefix="nixai-tests-"))
+# Settings are read when the app modules are imported, so configure them before any test imports.
+for _name, _value in {
+    "DATABASE_URL": f"sqlite:///{_STORAGE / 'nixai.db'}",
+    "UPLOADS_DIR": str(_STORAGE / "uploads"),
+    "CHROMA_PERSIST_DIR": str(_STORAGE / "chroma"),
+    "NUMPY_INDEX_DIR": str(_STORAGE / "vectors"),
+    "LEXICAL_INDEX_DIR": str(_STORAGE / "lexical"),
+    "EMBEDDING_CACHE_PATH": str(_STORAGE / "embedding_cache.sqlite3"),
+    "QUERY_EMBEDDING_CACHE_PATH": str(_STORAGE / "query_embedding_cache.sqlite3"),
+    "LLM_PROVIDER": "local",
+    "EMBEDDING_PROVIDER": "local",
+    "GEMINI_CHAT_MODEL": "gemini-test",
+    "OPENAI_API_KEY": "",
+    "GEMINI_API_KEY": "",
+    "ANTHROPIC_API_KEY": "",
+}.items():
+    os.environ[_name] = _value
+
+
+@pytest.fixture(scope="session")
+def storage_dir() -> Path:
+    return _STORAGE
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from app import models as _  # noqa: F401
+    from app.db.session import init_db
+
+    init_db()
+
+
+@pytest.fixture
+def session_factory():
+    from app.db.session import SessionLocal
+
+    return SessionLocal
+
+
+@pytest.fixture
+def user_id(session_factory) -> str:
+    from app.models.user import User
+
+    with session_factory() as db:
+        user = User(email=f"{uuid4().hex[:12]}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+@pytest.fixture(scope="session")
+def rag_service():
+    from app.services.rag import build_rag_service
+
+    service = build_rag_service()
+    yield service
+    service.text_extractor.close()
+
+
+@pytest.fixture
+def index_text(rag_service, session_factory, storage_dir):
+    """Store ``text`` as a queued document of the user and ingest it; returns the document id."""
+    from app.models.document import Document, DocumentStatus
+
+    def index(user_id: str, text: str, service=rag_service, filename: str = "notes.txt") -> str:
+        path = storage_dir / "uploads" / f"{uuid4().hex}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        with session_factory() as db:
+            document = Document(
+                user_id=user_id,
+                filename=filename,
+                content_type="text/plain",
+                stored_path=str(path),
+                size_bytes=path.stat().st_size,
+                status=DocumentStatus.QUEUED.value,
+            )
+            db.add(document)
+            db.commit()
+            document_id = document.id
+        with session_factory() as db:
+            db.expire_on_commit = False
+            asyncio.run(service.process_document(db, document_id))
+        return document_id
+
+    return index
@@ -0,0 +1,55 @@
+"""Answer cache keying, on its own and through RAGService."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.schemas import AskResponse
+from app.services.answer_cache import AnswerCache
+
+TOPICS = ["apples", "bridges", "comets", "dolphins", "engines", "forests", "glaciers", "harbours"]
+
+
+def _response(answer: str) -> AskResponse:
+    return AskResponse(answer=answer, sources=[])
+
+
+def test_exact_hits_require_the_same_top_k():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("user", 1, 1, "What are apples?", _response("one source"))
+
+    assert cache.get("user", 1, 1, "  what are APPLES? ").answer == "one source"
+    assert cache.get("user", 1, 8, "What are apples?") is None
+    assert cache.get("user", 2, 1, "What are apples?") is None
+
+
+def test_similar_hits_require_the_same_top_k():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("user", 1, 1, "What are apples?", _response("one source"), query_embedding=[1.0, 0.0])
+
+    assert cache.get_similar("user", 1, 1, [0.99, 0.05]).answer == "one source"
+    assert cache.get_similar("user", 1, 8, [0.99, 0.05]) is None
+
+
+def test_new_corpus_version_evicts_older_entries():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("user", 1, 4, "q", _response("old"))
+    cache.put("user", 2, 4, "q", _response("new"))
+
+    assert cache.stats()["size"] == 1
+    assert cache.get("user", 2, 4, "q").answer == "new"
+
+
+def test_service_does_not_serve_a_smaller_top_k_answer(rag_service, user_id, index_text):
+    paragraphs = [f"Notes about {topic}. " + f"The {topic} section repeats its subject. " * 40 for topic in TOPICS]
+    index_text(user_id, "\n\n".join(paragraphs))
+    question = "What do the notes say about each subject?"
+
+    narrow = asyncio.run(rag_service.answer_question(question, user_id, top_k=1))
+    wide = asyncio.run(rag_service.answer_question(question, user_id, top_k=8))
+    again = asyncio.run(rag_service.answer_question(question, user_id, top_k=8))
+
+    assert len(narrow.sources) == 1
+    assert not wide.cached
+    assert len(wide.sources) > 1
+    assert again.cached and len(again.sources) == len(wide.sources)
@@ -0,0 +1,112 @@
+"""EmbeddingDispatcher against an offline provider that throttles like a remote API."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import List, Sequence
+
+import pytest
+
+from app.services.embedding import LocalHashEmbeddingProvider
+from app.services.embedding_dispatcher import (
+    MIN_BATCH_TOKENS,
+    EmbeddingDispatcher,
+    RateLimitError,
+    estimate_tokens,
+    is_rate_limit_error,
+)
+
+
+class FakeEmbeddingProvider:
+    """Offline stand-in for a remote provider.
+
+    Batches above ``max_batch_tokens`` and every ``rate_limit_every``-th call raise
+    ``RateLimitError`` like a throttled API would; ``calls`` records each batch size.
+    """
+
+    def __init__(self, dimension: int = 8, max_batch_tokens: int | None = None, rate_limit_every: int = 0) -> None:
+        self.max_batch_tokens = max_batch_tokens
+        self.rate_limit_every = rate_limit_every
+        self.calls: list[int] = []
+        self._local = LocalHashEmbeddingProvider(dimension)
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        self.calls.append(len(texts))
+        if self.rate_limit_every and len(self.calls) % self.rate_limit_every == 0:
+            raise RateLimitError("Simulated rate limit", retry_after=0.0)
+        if self.max_batch_tokens and sum(estimate_tokens(text) for text in texts) > self.max_batch_tokens:
+            raise RateLimitError("Simulated token-per-request limit", retry_after=0.0)
+        return self._local.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._local.embed_query(text)
+
+
+TEXTS = [f"chunk {index} " + "lorem ipsum dolor sit amet " * 20 for index in range(40)]
+
+
+def _dispatcher(provider: FakeEmbeddingProvider, **kwargs) -> EmbeddingDispatcher:
+    kwargs.setdefault("base_backoff_seconds", 0.0)
+    return EmbeddingDispatcher(provider, **kwargs)
+
+
+def test_oversized_batches_are_split_until_accepted():
+    provider = FakeEmbeddingProvider(max_batch_tokens=MIN_BATCH_TOKENS * 2)
+    dispatcher = _dispatcher(provider, max_batch_tokens=MIN_BATCH_TOKENS * 16, concurrency=1)
+
+    vectors = dispatcher.embed_documents(TEXTS)
+
+    assert vectors == provider._local.embed_documents(TEXTS)
+    assert dispatcher.rate_limited > 0
+    assert dispatcher.batch_token_limit < MIN_BATCH_TOKENS * 16
+
+
+def test_intermittent_rate_limits_are_retried_in_order():
+    provider = FakeEmbeddingProvider(rate_limit_every=3)
+    dispatcher = _dispatcher(provider, max_batch_tokens=MIN_BATCH_TOKENS, concurrency=4)
+
+    vectors = dispatcher.embed_documents(TEXTS)
+
+    assert vectors == provider._local.embed_documents(TEXTS)
+    assert dispatcher.rate_limited == len(provider.calls) // 3
+
+
+def test_async_path_backs_off_and_keeps_order():
+    provider = FakeEmbeddingProvider(max_batch_tokens=MIN_BATCH_TOKENS * 2, rate_limit_every=5)
+    dispatcher = _dispatcher(provider, max_batch_tokens=MIN_BATCH_TOKENS * 8, concurrency=3)
+
+    vectors = asyncio.run(dispatcher.aembed_documents(TEXTS))
+
+    assert vectors == provider._local.embed_documents(TEXTS)
+    assert dispatcher.rate_limited > 0
+
+
+def test_gives_up_after_max_retries():
+    provider = FakeEmbeddingProvider(rate_limit_every=1)
+    dispatcher = _dispatcher(provider, max_retries=2)
+
+    with pytest.raises(RateLimitError):
+        dispatcher.embed_documents(TEXTS[:1])
+    assert provider.calls == [1, 1, 1]
+
+
+def test_limit_recovers_after_successful_calls():
+    dispatcher = _dispatcher(FakeEmbeddingProvider(), max_batch_tokens=MIN_BATCH_TOKENS * 8)
+    dispatcher.batch_token_limit = MIN_BATCH_TOKENS
+
+    for _ in range(20):
+        dispatcher.embed_documents(TEXTS[:1])
+
+    assert dispatcher.batch_token_limit == MIN_BATCH_TOKENS * 8
+
+
+def test_recognises_sdk_rate_limit_errors():
+    class APIStatusError(Exception):
+        def __init__(self, status_code: int) -> None:
+            super().__init__("error")
+            self.response = SimpleNamespace(status_code=status_code, headers={})
+
+    assert is_rate_limit_error(APIStatusError(429))
+    assert not is_rate_limit_error(APIStatusError(500))
+    assert is_rate_limit_error(type("ResourceExhausted", (Exception,), {})())
@@ -0,0 +1,163 @@
+"""IngestionQueue job handling against a database of its own."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.document import Document, DocumentChunk, DocumentStatus
+from app.models.user import User
+from app.services.ingestion_queue import IngestionQueue
+from app.services.text_processing import ExtractionInterruptedError
+
+LONG_AGO = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+TEXT = "\n\n".join(f"Paragraph {index} covers topic number {index} at some length. " * 12 for index in range(12))
+
+
+@pytest.fixture
+def queue_sessions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+@pytest.fixture
+def queue(rag_service, queue_sessions):
+    settings = rag_service.settings.model_copy(update={"ingestion_max_attempts": 2})
+    return IngestionQueue(rag_service, settings, session_factory=queue_sessions)
+
+
+@pytest.fixture
+def add_document(queue_sessions, tmp_path):
+    def add(text: str = TEXT, **fields) -> str:
+        path = tmp_path / f"{len(list(tmp_path.glob('*.txt')))}.txt"
+        path.write_text(text, encoding="utf-8")
+        with queue_sessions() as db:
+            user = db.get(User, "queue-user") or User(id="queue-user", email="queue@example.com", hashed_password="x")
+            document = Document(
+                user_id=user.id,
+                filename=path.name,
+                content_type="text/plain",
+                stored_path=str(path),
+                size_bytes=path.stat().st_size,
+                **{"status": DocumentStatus.QUEUED.value, **fields},
+            )
+            db.add_all([user, document])
+            db.commit()
+            return document.id
+
+    return add
+
+
+def _document(queue_sessions, document_id: str) -> Document:
+    with queue_sessions() as db:
+        document = db.get(Document, document_id)
+        db.expunge(document)
+        return document
+
+
+def _searchable(rag_service, queue_sessions, document_id: str) -> int:
+    """Vectors, keyword hits and chunk rows still stored for the document."""
+    with queue_sessions() as db:
+        rows = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).count()
+    vectors = rag_service.vector_store.query("queue-user", rag_service.embedding_service.embed_query("topic"), 50)
+    keywords = rag_service.lexical_index.query("queue-user", "topic", 50)
+    return rows + sum(hit.document_id == document_id for hit in vectors + keywords)
+
+
+def test_claim_takes_the_oldest_queued_document_once(queue, queue_sessions, add_document):
+    newer = add_document(created_at=LONG_AGO + timedelta(days=1))
+    older = add_document(created_at=LONG_AGO)
+    add_document(status=DocumentStatus.FAILED.value, created_at=LONG_AGO - timedelta(days=1))
+
+    assert queue._claim_next([]) == older
+    assert queue._claim_next([older]) == newer
+    assert queue._claim_next([older, newer]) is None
+
+    document = _document(queue_sessions, older)
+    assert document.status == DocumentStatus.EXTRACTING.value
+    assert document.attempts == 1
+
+
+def test_failure_requeues_until_attempts_are_used_up(queue, queue_sessions, add_document):
+    document_id = add_document()
+
+    for attempt, status in enumerate([DocumentStatus.QUEUED, DocumentStatus.FAILED], start=1):
+        assert queue._claim_next([]) == document_id
+        with queue_sessions() as db:
+            queue._record_failure(db, document_id, RuntimeError("boom"))
+        document = _document(queue_sessions, document_id)
+        assert (document.status, document.attempts, document.error) == (status.value, attempt, "boom")
+
+    assert queue._claim_next([]) is None
+
+
+def test_stale_jobs_are_requeued_or_failed_by_attempts(queue, queue_sessions, add_document):
+    stale = {"status": DocumentStatus.EMBEDDING.value, "updated_at": LONG_AGO}
+    retried = add_document(attempts=1, **stale)
+    exhausted = add_document(attempts=queue.max_attempts, **stale)
+    running_here = add_document(attempts=1, **stale)
+    fresh = add_document(attempts=1, status=DocumentStatus.EXTRACTING.value)
+
+    with queue_sessions() as db:
+        queue._requeue_stale(db, [running_here])
+
+    assert _document(queue_sessions, retried).status == DocumentStatus.QUEUED.value
+    assert _document(queue_sessions, exhausted).status == DocumentStatus.FAILED.value
+    assert _document(queue_sessions, running_here).status == DocumentStatus.EMBEDDING.value
+    assert _document(queue_sessions, fresh).status == DocumentStatus.EXTRACTING.value
+
+
+def test_heartbeat_keeps_a_running_job_from_going_stale(queue, queue_sessions, add_document):
+    document_id = add_document(attempts=1, status=DocumentStatus.EXTRACTING.value, updated_at=LONG_AGO)
+
+    queue._touch([document_id])
+    with queue_sessions() as db:
+        queue._requeue_stale(db, [])
+
+    assert _document(queue_sessions, document_id).status == DocumentStatus.EXTRACTING.value
+
+
+def test_failed_attempt_leaves_nothing_searchable(rag_service, queue, queue_sessions, add_document, monkeypatch):
+    monkeypatch.setattr(rag_service, "settings", rag_service.settings.model_copy(update={"embedding_batch_size": 2}))
+    embed = rag_service.embedding_service.aembed_documents
+    calls = []
+
+    async def fail_after_first_batch(texts):
+        calls.append(len(texts))
+        if len(calls) > 1:
+            raise RuntimeError("embedding service unavailable")
+        return await embed(texts)
+
+    monkeypatch.setattr(rag_service.embedding_service, "aembed_documents", fail_after_first_batch)
+    document_id = add_document()
+
+    for attempt in range(1, queue.max_attempts + 1):
+        calls.clear()
+        assert queue._claim_next([]) == document_id
+        asyncio.run(queue._run_job(document_id))
+        document = _document(queue_sessions, document_id)
+        assert document.attempts == attempt
+        assert document.error == "embedding service unavailable"
+        assert _searchable(rag_service, queue_sessions, document_id) == 0
+
+    assert document.status == DocumentStatus.FAILED.value
+
+
+def test_interruption_by_another_documents_timeout_does_not_use_an_attempt(queue, queue_sessions, add_document):
+    document_id = add_document(attempts=queue.max_attempts - 1)
+
+    assert queue._claim_next([]) == document_id
+    with queue_sessions() as db:
+        queue._record_failure(db, document_id, ExtractionInterruptedError("interrupted"))
+
+    document = _document(queue_sessions, document_id)
+    assert document.status == DocumentStatus.QUEUED.value
+    assert document.attempts == queue.max_attempts - 1
+
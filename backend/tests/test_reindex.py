@@ -0,0 +1,81 @@
+"""Reindexing after the embedding model changes, on both vector store backends."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models.document import DocumentChunk
+from app.services.embedding import EmbeddingService
+from app.services.rag import RAGService
+from app.services.reindex import Reindexer, ReindexCheckpoint, settings_fingerprint
+from app.services.vector_store import build_vector_store
+
+TEXT = "\n\n".join(f"Section {index} explains the {topic} procedure in detail. " * 30 for index, topic in enumerate(
+    ["backup", "restore", "rotation", "failover", "audit"]
+))
+
+
+def _service(rag_service, settings) -> RAGService:
+    embedding_service = EmbeddingService(settings)
+    return RAGService(
+        settings=settings,
+        file_storage=rag_service.file_storage,
+        text_extractor=rag_service.text_extractor,
+        embedding_service=embedding_service,
+        vector_store=build_vector_store(settings, embedding_service.namespace),
+        llm_service=rag_service.llm_service,
+        lexical_index=rag_service.lexical_index,
+    )
+
+
+def _chunk_ids(document_id: str) -> set[str]:
+    with SessionLocal() as db:
+        return {row.id for row in db.query(DocumentChunk.id).filter(DocumentChunk.document_id == document_id)}
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_reindex_into_a_new_embedding_dimension(backend, rag_service, user_id, index_text, tmp_path):
+    base = get_settings().model_copy(
+        update={
+            "vector_store_backend": backend,
+            "chroma_persist_dir": str(tmp_path / "chroma"),
+            "numpy_index_dir": str(tmp_path / "vectors"),
+            "embedding_provider": "local",
+        }
+    )
+    old = _service(rag_service, base)
+    document_id = index_text(user_id, TEXT, service=old)
+    old_ids = _chunk_ids(document_id)
+
+    # Without API keys both are the local embedder, at 1536 and at Gemini's 768 dimensions.
+    new = _service(rag_service, base.model_copy(update={"embedding_provider": "gemini"}))
+    assert len(new.embedding_service.embed_query("x")) != len(old.embedding_service.embed_query("x"))
+
+    checkpoint = ReindexCheckpoint(tmp_path / "checkpoint.json", settings_fingerprint(new.settings, new.embedding_service))
+    report = Reindexer(new, new.settings, checkpoint, workers=1).run(user_id=user_id)
+
+    assert report.failed == {}
+    assert report.reindexed == 1
+    new_ids = _chunk_ids(document_id)
+    assert new_ids and not new_ids & old_ids
+
+    question = "How does the failover procedure work?"
+    new_hits = new.vector_store.query(user_id, new.embedding_service.embed_query(question), 10)
+    assert new_hits and {hit.chunk_id for hit in new_hits} <= new_ids
+    # The index the running API still searches with the old model is left intact.
+    old_hits = old.vector_store.query(user_id, old.embedding_service.embed_query(question), 10)
+    assert old_hits and {hit.chunk_id for hit in old_hits} <= old_ids
+
+
+def test_same_namespace_keeps_the_existing_location(tmp_path):
+    settings = get_settings().model_copy(
+        update={"vector_store_backend": "numpy", "numpy_index_dir": str(tmp_path / "vectors")}
+    )
+    first = build_vector_store(settings, "LocalHashEmbeddingProvider:768")
+    again = build_vector_store(settings, "LocalHashEmbeddingProvider:768")
+    other = build_vector_store(settings, "LocalHashEmbeddingProvider:1536")
+
+    assert first.directory == again.directory == tmp_path / "vectors"
+    assert other.directory.parent == tmp_path / "vectors"
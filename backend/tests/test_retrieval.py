@@ -0,0 +1,78 @@
+"""What ``score`` means for each retrieval mode."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.reranker import LexicalOverlapReranker
+from app.services.retrieval import Retriever
+from app.services.vector_store import SourceChunk
+
+TEXT = "\n\n".join(
+    f"The {name} runbook describes how to restart the {name} service. " * 20
+    for name in ["billing", "search", "mailer", "scheduler"]
+)
+
+
+@pytest.mark.parametrize(
+    ("mode", "kind"), [("dense", "distance"), ("lexical", "bm25"), ("hybrid", "rrf")]
+)
+def test_score_kind_follows_the_mode(rag_service, user_id, index_text, mode, kind):
+    index_text(user_id, TEXT)
+    retriever = Retriever(rag_service.vector_store, rag_service.lexical_index, mode=mode, coalesce=False)
+    question = "How do I restart the mailer service?"
+    embedding = rag_service.embedding_service.embed_query(question)
+
+    hits = asyncio.run(retriever.retrieve(user_id, question, embedding, 3))
+
+    assert hits and {hit.score_kind for hit in hits} == {kind}
+    scores = [hit.score for hit in hits]
+    assert scores == sorted(scores, reverse=kind != "distance")
+
+
+def test_reranked_scores_are_marked(rag_service, user_id, index_text):
+    index_text(user_id, TEXT)
+    retriever = Retriever(
+        rag_service.vector_store,
+        rag_service.lexical_index,
+        mode="dense",
+        coalesce=False,
+        reranker=LexicalOverlapReranker(),
+        rerank_budget_ms=0,
+    )
+    question = "How do I restart the mailer service?"
+
+    hits = asyncio.run(retriever.retrieve(user_id, question, rag_service.embedding_service.embed_query(question), 3))
+
+    assert hits and all(hit.score_kind == "rerank" and 0.0 <= hit.score <= 1.0 for hit in hits)
+
+
+def test_answer_sources_carry_the_score_kind(rag_service, user_id, index_text):
+    index_text(user_id, TEXT)
+
+    response = asyncio.run(rag_service.answer_question("How is the billing service restarted?", user_id))
+
+    assert response.sources
+    assert {source.score_kind for source in response.sources} == {"rrf"}
+
+
+@pytest.mark.parametrize(("min_score", "kept"), [(0.0, ["a", "b"]), (0.01, ["a"])])
+def test_zero_scores_are_dropped_only_by_a_positive_cutoff(rag_service, min_score, kept):
+    chunks = [
+        SourceChunk("a", "doc", "doc.txt", 0, "Restart the mailer service with the admin tool."),
+        SourceChunk("b", "doc", "doc.txt", 1, "Quarterly revenue grew in every region."),
+    ]
+    retriever = Retriever(
+        rag_service.vector_store,
+        rag_service.lexical_index,
+        reranker=LexicalOverlapReranker(),
+        rerank_budget_ms=0,
+        rerank_min_score=min_score,
+    )
+
+    hits = asyncio.run(retriever._rerank("How do I restart the mailer?", chunks, 5))
+
+    assert [hit.chunk_id for hit in hits] == kept
+    assert hits[0].score > 0.0
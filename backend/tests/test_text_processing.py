@@ -0,0 +1,90 @@
+"""Streaming splitters against splitting the whole text at once."""
+
+from __future__ import annotations
+
+import random
+import time
+from pathlib import Path
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.services.text_processing import (
+    ExtractionInterruptedError,
+    StreamingTextSplitter,
+    StreamingTokenSplitter,
+    TextExtractionError,
+    TextExtractionService,
+)
+from app.services.tokenizer import RegexTokenizer
+
+CHUNK_SIZE = 300
+OVERLAP = 60
+
+
+def _pages(seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    pages = []
+    for page in range(12):
+        paragraphs = []
+        for paragraph in range(rng.randint(1, 5)):
+            count = rng.randint(1, 12)
+            paragraphs.append(" ".join(f"Page {page} paragraph {paragraph} sentence {index} ends here." for index in range(count)))
+        pages.append("\n\n".join(paragraphs) + "\n\n")
+    return pages
+
+
+def _splitter() -> StreamingTextSplitter:
+    return StreamingTextSplitter(
+        RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=OVERLAP),
+        chunk_size=CHUNK_SIZE,
+        tokenizer=RegexTokenizer(),
+    )
+
+
+def test_streamed_chunks_cover_the_text_like_a_one_shot_split():
+    pages = _pages()
+    streamed = [chunk.text for chunk in _splitter().split(pages)]
+    one_shot = _splitter().splitter.split_text("".join(pages))
+
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in streamed)
+    sentences = [sentence for page in pages for sentence in page.replace("\n\n", " ").split(". ") if sentence.strip()]
+    for sentence in sentences:
+        sentence = sentence.strip().rstrip(".")
+        assert any(sentence in chunk for chunk in streamed), sentence
+    # Boundaries may differ near page ends, which shifts the count by a chunk here and there.
+    assert abs(len(streamed) - len(one_shot)) <= len(pages) // 4 + 1
+
+
+def test_streamed_chunks_overlap_across_page_boundaries():
+    pages = ["Alpha sentence number %d is here. " % index for index in range(40)]
+    streamed = [chunk.text for chunk in _splitter().split(pages)]
+
+    assert len(streamed) > 2
+    for previous, current in zip(streamed, streamed[1:]):
+        # Each chunk starts with text the previous one ended with.
+        assert current[:20] in previous
+
+
+def test_token_splitter_matches_a_one_shot_split():
+    tokenizer = RegexTokenizer()
+    pages = _pages(seed=3)
+    streamed = [chunk.text for chunk in StreamingTokenSplitter(tokenizer, 50, 10).split(pages)]
+    one_shot = [chunk.text for chunk in StreamingTokenSplitter(tokenizer, 50, 10).split(["".join(pages)])]
+
+    assert streamed == one_shot
+
+
+def test_pdf_timeout_interrupts_other_documents_in_the_pool():
+    extractor = TextExtractionService(pdf_workers=2, pdf_timeout_seconds=0.5)
+    try:
+        slow = extractor._submit(time.sleep, 30)
+        other = extractor._submit(time.sleep, 30)
+        with pytest.raises(TextExtractionError, match="timed out") as timed_out:
+            extractor._await(slow, Path("slow.pdf"), [0.0])
+        assert not isinstance(timed_out.value, ExtractionInterruptedError)
+        with pytest.raises(ExtractionInterruptedError):
+            extractor._await(other, Path("other.pdf"), [0.0])
+    finally:
+        extractor.close()
+
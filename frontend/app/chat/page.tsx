@@ -1,10 +1,10 @@
 "use client";
 
-import { FormEvent, useEffect, useMemo, useState } from "react";
+import { FormEvent, useEffect, useMemo, useRef, useState } from "react";
 import { useMutation } from "@tanstack/react-query";
 import { v4 as uuidv4 } from "uuid";
 
-import { AskResponse, SourceInfo, askQuestion, generateSessionTitle } from "@/lib/api";
+import { SourceInfo, generateSessionTitle, streamQuestion } from "@/lib/api";
 
 type ChatMessage = {
   id: string;
@@ -59,37 +59,69 @@ export default function ChatPage() {
     window.localStorage.setItem("nixai_chat_sessions", JSON.stringify(sessions));
   }, [sessions]);
 
+  const streamAbort = useRef<AbortController | null>(null);
+  useEffect(() => () => streamAbort.current?.abort(), []);
+
+  function updateMessage(sessionId: string, messageId: string, update: (message: ChatMessage) => ChatMessage) {
+    setSessions((prev) =>
+      prev.map((session) =>
+        session.id === sessionId
+          ? { ...session, messages: session.messages.map((message) => (message.id === messageId ? update(message) : message)) }
+          : session
+      )
+    );
+  }
+
   const askMutation = useMutation({
-    mutationFn: (question: string) => askQuestion(question),
-    onError: (err: Error) => setError(err.message),
-    onSuccess: (response: AskResponse) => {
+    mutationFn: ({ question, sessionId, messageId }: { question: string; sessionId: string; messageId: string }) => {
+      // The answer is rendered into this message as tokens arrive.
+      const assistantMessage: ChatMessage = { id: messageId, role: "assistant", content: "" };
+      setSessions((prev) =>
+        prev.map((session) =>
+          session.id === sessionId ? { ...session, messages: [...session.messages, assistantMessage] } : session
+        )
+      );
+      const controller = new AbortController();
+      streamAbort.current = controller;
+      return streamQuestion(
+        question,
+        {
+          onSources: (sources) => updateMessage(sessionId, messageId, (message) => ({ ...message, sources })),
+          onToken: (text) =>
+            updateMessage(sessionId, messageId, (message) => ({ ...message, content: message.content + text })),
+        },
+        controller.signal,
+        // The backend keeps the session's history, so follow-up questions can refer to earlier turns.
+        sessionId
+      );
+    },
+    onError: (err: Error, { sessionId, messageId }) => {
+      setError(err.message);
+      setSessions((prev) =>
+        prev.map((session) =>
+          session.id === sessionId
+            ? {
+                ...session,
+                messages: session.messages.filter((message) => message.id !== messageId || message.content),
+              }
+            : session
+        )
+      );
+    },
+    onSuccess: (_response, { sessionId }) => {
       setPrompt("");
       setError(null);
-      const assistantMessage: ChatMessage = {
-        id: uuidv4(),
-        role: "assistant",
-        content: response.answer,
-        sources: response.sources,
-      };
 
       setSessions((prev) => {
-        const next = prev.map((session) => {
-          if (session.id !== activeSessionId) return session;
-          return {
-            ...session,
-            messages: [...session.messages, assistantMessage],
-          };
-        });
-
-        const updatedSession = next.find((session) => session.id === activeSessionId);
+        const updatedSession = prev.find((session) => session.id === sessionId);
         if (updatedSession && updatedSession.title === "New session" && updatedSession.messages.length >= 2) {
           const context = updatedSession.messages
             .map((message) => `${message.role}: ${message.content}`)
             .join("\n");
-          titleMutation.mutate({ sessionId: activeSessionId, context });
+          titleMutation.mutate({ sessionId, context });
         }
 
-        return next;
+        return prev;
       });
     },
   });
@@ -120,7 +152,7 @@ export default function ChatPage() {
       )
     );
 
-    askMutation.mutate(prompt.trim());
+    askMutation.mutate({ question: prompt.trim(), sessionId: activeSessionId, messageId: uuidv4() });
   }
 
   function handleNewSession() {
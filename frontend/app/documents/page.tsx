@@ -3,7 +3,16 @@
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { ChangeEvent, FormEvent, useState } from "react";
 
-import { deleteDocument, DocumentSummary, UploadResponse, fetchDocuments, uploadDocuments } from "@/lib/api";
+import {
+  deleteDocument,
+  DocumentSummary,
+  UploadResponse,
+  fetchDocuments,
+  retryDocument,
+  uploadDocuments,
+} from "@/lib/api";
+
+const PENDING_STATUSES = new Set(["queued", "extracting", "embedding"]);
 
 export default function DocumentsPage() {
   const queryClient = useQueryClient();
@@ -13,6 +22,14 @@ export default function DocumentsPage() {
   const { data: documents = [], isLoading } = useQuery<DocumentSummary[], Error>({
     queryKey: ["documents"],
     queryFn: fetchDocuments,
+    refetchInterval: (query) =>
+      query.state.data?.some((doc) => PENDING_STATUSES.has(doc.status)) ? 2000 : false,
+  });
+
+  const retryMutation = useMutation<DocumentSummary, Error, string>({
+    mutationFn: retryDocument,
+    onSuccess: () => queryClient.invalidateQueries({ queryKey: ["documents"] }),
+    onError: (error) => setStatusMessage(error.message),
   });
 
   const deleteMutation = useMutation<void, Error, string>({
@@ -27,8 +44,13 @@ export default function DocumentsPage() {
 
   const uploadMutation = useMutation<UploadResponse, Error, File[]>({
     mutationFn: uploadDocuments,
-    onSuccess: () => {
-      setStatusMessage("Upload complete!");
+    onSuccess: (data) => {
+      const rejected = data.results.filter((result) => !result.accepted);
+      setStatusMessage(
+        rejected.length
+          ? `Queued ${data.count} file(s). Rejected: ${rejected.map((r) => `${r.filename} (${r.error})`).join(", ")}`
+          : "Upload received. Documents are being processed.",
+      );
       setSelectedFiles([]);
       queryClient.invalidateQueries({ queryKey: ["documents"] });
     },
@@ -89,6 +111,7 @@ export default function DocumentsPage() {
               <thead className="bg-slate-900 text-slate-400">
                 <tr>
                   <th className="px-4 py-3 text-left">Name</th>
+                  <th className="px-4 py-3 text-left">Status</th>
                   <th className="px-4 py-3 text-left">Chunks</th>
                   <th className="px-4 py-3 text-left">Embeddings</th>
                   <th className="px-4 py-3 text-left">Uploaded</th>
@@ -99,6 +122,20 @@ export default function DocumentsPage() {
                 {documents.map((doc) => (
                   <tr key={doc.id}>
                     <td className="px-4 py-3 font-medium text-white">{doc.filename}</td>
+                    <td className="px-4 py-3" title={doc.error ?? undefined}>
+                      {doc.status}
+                      {PENDING_STATUSES.has(doc.status) && ` (${doc.progress}%)`}
+                      {doc.status === "failed" && (
+                        <button
+                          type="button"
+                          onClick={() => retryMutation.mutate(doc.id)}
+                          className="ml-2 text-xs font-semibold text-cyan-400 hover:text-cyan-300"
+                          disabled={retryMutation.isPending}
+                        >
+                          Retry
+                        </button>
+                      )}
+                    </td>
                     <td className="px-4 py-3">{doc.chunk_count}</td>
                     <td className="px-4 py-3">{doc.embedding_count}</td>
                     <td className="px-4 py-3 text-slate-400">
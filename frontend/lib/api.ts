@@ -4,12 +4,24 @@ export type DocumentSummary = {
   content_type: string;
   chunk_count: number;
   embedding_count: number;
+  status: "queued" | "extracting" | "embedding" | "indexed" | "failed";
+  progress: number;
+  attempts: number;
+  error?: string | null;
   created_at: string;
 };
 
+export type UploadResult = {
+  filename: string;
+  accepted: boolean;
+  document?: DocumentSummary | null;
+  error?: string | null;
+};
+
 export type UploadResponse = {
   documents: DocumentSummary[];
   count: number;
+  results: UploadResult[];
 };
 
 export type SourceInfo = {
@@ -18,12 +30,14 @@ export type SourceInfo = {
   document_name: string;
   chunk_index: number;
   score?: number | null;
+  score_kind?: "distance" | "bm25" | "rrf" | "rerank" | null;
   snippet: string;
 };
 
 export type AskResponse = {
   answer: string;
   sources: SourceInfo[];
+  cached?: boolean;
 };
 
 export type TokenResponse = {
@@ -160,6 +174,13 @@ export async function uploadDocuments(files: File[]): Promise<UploadResponse> {
   return handleResponse<UploadResponse>(res);
 }
 
+export async function retryDocument(documentId: string): Promise<DocumentSummary> {
+  const res = await authFetch(`${getApiBase()}/docs/${documentId}/retry`, {
+    method: "POST",
+  });
+  return handleResponse<DocumentSummary>(res);
+}
+
 export async function deleteDocument(documentId: string): Promise<void> {
   const res = await authFetch(`${getApiBase()}/docs/${documentId}`, {
     method: "DELETE",
@@ -176,6 +197,66 @@ export async function askQuestion(question: string): Promise<AskResponse> {
   return handleResponse<AskResponse>(res);
 }
 
+export type AskStreamHandlers = {
+  onSources?: (sources: SourceInfo[]) => void;
+  onToken?: (text: string) => void;
+};
+
+// Streams /ask/stream (server-sent events); resolves with the full answer once `done` arrives.
+export async function streamQuestion(
+  question: string,
+  handlers: AskStreamHandlers = {},
+  signal?: AbortSignal,
+  chatSessionId?: string,
+): Promise<AskResponse> {
+  const res = await authFetch(`${getApiBase()}/ask/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify({ question, chat_session_id: chatSessionId }),
+    signal,
+  });
+  if (!res.ok || !res.body) {
+    const message = await res.text();
+    throw new Error(message || "Request failed");
+  }
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  const result: AskResponse = { answer: "", sources: [] };
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : {};
+      if (event === "sources") {
+        result.sources = payload.sources;
+        handlers.onSources?.(payload.sources);
+      } else if (event === "token") {
+        result.answer += payload.text;
+        handlers.onToken?.(payload.text);
+      } else if (event === "done") {
+        result.cached = payload.cached;
+        return result;
+      } else if (event === "error") {
+        throw new Error(payload.detail || "Streaming failed");
+      }
+    }
+  }
+  throw new Error("The answer stream ended unexpectedly.");
+}
+
 export async function generateSessionTitle(context: string): Promise<string> {
   const res = await authFetch(`${getApiBase()}/ask/title`, {
     method: "POST",